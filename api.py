@@ -0,0 +1,728 @@
+"""Versioned JSON API over schedules, labs, practicums and users.
+
+Every resource has the same three endpoints under ``/api/v1``:
+
+* ``GET /<resource>`` lists rows ordered by id.  ``limit`` (at most
+  ``MAX_PAGE_SIZE``) and ``after`` page through them with a cursor, and
+  ``fields=a,b`` selects only some columns.  ``/schedules`` accepts the
+  filters of the schedule list (term_id, lab_id, lecturer_id, day,
+  class_name and semester) and shows the active term by default.
+* ``GET /<resource>/<id>`` returns one row and also accepts ``fields``.
+* ``POST /<resource>/batch`` takes ``{"create": [...], "update": [...],
+  "delete": [...]}``.  The whole batch is validated first, including
+  conflicts between schedules of the batch and the existing ones; any error
+  answers 422 with every problem found and nothing is written.  Otherwise
+  deletes, updates and creates run in that order in one transaction.
+
+``/changes`` and ``/changes/stream`` serve the schedule change journal
+for clients that keep a copy of the schedules up to date, see ``journal``.
+``/jobs`` submits, follows and cancels background jobs, see ``jobs``.
+``/search`` answers typeahead queries from the full-text index, see
+``search``.  ``/occurrences`` lists the dated sessions of a date range,
+holidays, cancellations and make-up sessions applied, see ``occurrences``.
+
+Access follows the HTML routes: anyone logged in may read schedules
+(lecturers only their own), labs and practicums need admin or staff, users
+need admin, and writes need the same roles as the matching pages.  Scripts
+log in with ``POST /api/v1/login`` and keep the session cookie.
+"""
+import os
+from collections import namedtuple
+from datetime import date, timedelta
+
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context, url_for
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import check_password_hash
+
+import auth
+import jobs
+import journal
+import occurrences
+import search as search_index
+from auth import api_role_required, current_user
+from models import db, Job, Lab, Practicum, Schedule, User
+from occupancy import Entry as OccupancyEntry
+from scheduling import (CONFLICT_MESSAGES, availability as find_availability, occupancy_snapshot,
+                        reset_occupancy, schedule_filters)
+from slots import DAYS, TIME_SLOTS, day_index, iter_cells, slot_index, split_cell
+from synthetic import hash_passwords
+from terms import active_term_id, open_terms, selected_term_id
+from transactions import write_transaction
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH = 5000
+MAX_OCCURRENCE_DAYS = 62
+ROLES = ('admin', 'staff', 'lecturer')
+
+BatchError = namedtuple('BatchError', 'op index message')
+
+
+class InvalidItem(ValueError):
+    """An item of a batch cannot be written; the message is shown as is."""
+
+
+def _int(item, name, low=None, high=None):
+    value = item.get(name)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise InvalidItem(f"'{name}' harus berupa bilangan bulat")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise InvalidItem(f"'{name}' harus antara {low} dan {high}")
+    return value
+
+
+def _text(item, name, maximum):
+    value = item.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidItem(f"'{name}' wajib diisi")
+    value = value.strip()
+    if len(value) > maximum:
+        raise InvalidItem(f"'{name}' maksimal {maximum} karakter")
+    return value
+
+
+def _in(column, values):
+    return column.in_(sorted(values)) if values else column.in_([])
+
+
+class Resource:
+    """Columns, roles and validation of one model.  Subclasses implement
+    ``values`` and may hook into the batch through ``prepare``, ``check``,
+    ``check_delete`` and ``committed``."""
+
+    model = None
+    fields = ()
+    read_roles = ()
+    write_roles = ()
+
+    def query_conditions(self, user, args):
+        return []
+
+    def values(self, item, current=None):
+        """Return the column values of ``item`` merged over ``current``."""
+        raise NotImplementedError
+
+    def prepare(self, creates, updates, deletes):
+        """Load whatever the checks of this batch need in bulk."""
+        return {}
+
+    def check(self, context, values, row_id):
+        """Validate ``values`` against the table and the rest of the batch;
+        ``row_id`` is negative for rows being created."""
+
+    def check_delete(self, context, row_id):
+        pass
+
+    def before_write(self, creates, updates):
+        """Slow preparation of validated rows, done before the write lock
+        is taken."""
+
+    def committed(self, context):
+        pass
+
+
+class ScheduleResource(Resource):
+    model = Schedule
+    fields = ('id', 'term_id', 'course_id', 'lecturer_id', 'lab_id', 'day', 'slot', 'class_name',
+              'created_at')
+    read_roles = ()
+    write_roles = ('admin', 'staff')
+
+    def query_conditions(self, user, args):
+        return schedule_filters(user, args)
+
+    def values(self, item, current=None):
+        merged = dict(current or {}, **item)
+        day = day_index(merged.get('day'))
+        if day is None:
+            raise InvalidItem(f"'day' harus 0-{len(DAYS) - 1} atau nama hari")
+        slot = slot_index(merged.get('slot'))
+        if slot is None:
+            raise InvalidItem("'slot' tidak valid")
+        return {
+            # Filled in with the active term by ``check`` when left out
+            'term_id': None if merged.get('term_id') is None else _int(merged, 'term_id'),
+            'course_id': _int(merged, 'course_id'),
+            'lecturer_id': _int(merged, 'lecturer_id'),
+            'lab_id': _int(merged, 'lab_id'),
+            'day': day,
+            'slot': slot,
+            'class_name': _text(merged, 'class_name', 5),
+        }
+
+    def prepare(self, creates, updates, deletes):
+        items = creates + updates
+        ids = lambda name: {item[name] for item in items if isinstance(item.get(name), int)}
+        return {
+            'semesters': dict(db.session.execute(
+                select(Practicum.id, Practicum.semester).where(_in(Practicum.id, ids('course_id')))).all()),
+            'lecturers': set(db.session.scalars(
+                select(User.id).where(_in(User.id, ids('lecturer_id')), User.role == 'lecturer'))),
+            'labs': set(db.session.scalars(select(Lab.id).where(_in(Lab.id, ids('lab_id'))))),
+            'terms': {term.id for term in open_terms()},
+            'active_term': active_term_id(),
+            'index': occupancy_snapshot(),
+        }
+
+    def check_delete(self, context, row_id):
+        context['index'].remove(row_id)
+
+    def check(self, context, values, row_id):
+        if values['term_id'] is None:
+            values['term_id'] = context['active_term']
+        if values['term_id'] not in context['terms']:
+            raise InvalidItem(f"Semester akademik {values['term_id']} tidak ditemukan atau sudah ditutup")
+        if values['course_id'] not in context['semesters']:
+            raise InvalidItem(f"Mata praktikum {values['course_id']} tidak ditemukan")
+        if values['lecturer_id'] not in context['lecturers']:
+            raise InvalidItem(f"Dosen {values['lecturer_id']} tidak ditemukan")
+        if values['lab_id'] not in context['labs']:
+            raise InvalidItem(f"Laboratorium {values['lab_id']} tidak ditemukan")
+
+        index = context['index']
+        index.remove(row_id)
+        entry = OccupancyEntry(row_id, values['lab_id'], values['lecturer_id'],
+                               context['semesters'][values['course_id']], values['class_name'],
+                               values['day'], values['slot'], values['term_id'])
+        conflicts = index.conflicts(entry)
+        if conflicts:
+            kind, other = conflicts[0]
+            where = f'create #{-other - 1} di batch ini' if other < 0 else f'jadwal #{other}'
+            raise InvalidItem(f'{CONFLICT_MESSAGES[kind]} ({where})')
+        index.add(entry)
+
+
+class _ReferencedResource(Resource):
+    """A model that schedules point to; rows in use cannot be deleted."""
+
+    schedule_column = None
+
+    def prepare(self, creates, updates, deletes):
+        column = getattr(Schedule, self.schedule_column)
+        in_use = set(db.session.scalars(select(column).where(_in(column, set(deletes))).distinct()))
+        return {'in_use': in_use}
+
+    def check_delete(self, context, row_id):
+        if row_id in context['in_use']:
+            raise InvalidItem('Masih dipakai oleh jadwal, hapus jadwalnya terlebih dahulu')
+
+
+class LabResource(_ReferencedResource):
+    model = Lab
+    fields = ('id', 'lab_name', 'capacity')
+    read_roles = write_roles = ('admin', 'staff')
+    schedule_column = 'lab_id'
+
+    def values(self, item, current=None):
+        merged = dict(current or {}, **item)
+        return {'lab_name': _text(merged, 'lab_name', 50), 'capacity': _int(merged, 'capacity', 1, 10000)}
+
+
+class _UniqueResource(_ReferencedResource):
+    """Adds a check of a unique text column across the batch and the table."""
+
+    unique = None
+
+    def prepare(self, creates, updates, deletes):
+        context = super().prepare(creates, updates, deletes)
+        column = getattr(self.model, self.unique)
+        wanted = {item.get(self.unique) for item in creates + updates if isinstance(item.get(self.unique), str)}
+        context['taken'] = dict(db.session.execute(
+            select(column, self.model.id).where(_in(column, {value.strip() for value in wanted}))).all())
+        context['claimed'] = {}
+        return context
+
+    def check(self, context, values, row_id):
+        value = values[self.unique]
+        owner = context['claimed'].get(value, context['taken'].get(value))
+        if owner is not None and owner != row_id:
+            raise InvalidItem(f"'{self.unique}' {value} sudah dipakai")
+        context['claimed'][value] = row_id
+
+
+class PracticumResource(_UniqueResource):
+    model = Practicum
+    fields = ('id', 'code', 'practicum_name', 'semester', 'sks')
+    read_roles = write_roles = ('admin', 'staff')
+    schedule_column = 'course_id'
+    unique = 'code'
+
+    def values(self, item, current=None):
+        merged = dict(current or {}, **item)
+        return {
+            'code': _text(merged, 'code', 20),
+            'practicum_name': _text(merged, 'practicum_name', 100),
+            'semester': _int(merged, 'semester', 1, 8),
+            'sks': _int(merged, 'sks', 1, 4),
+        }
+
+    def committed(self, context):
+        # The occupancy index holds the semester of every schedule
+        reset_occupancy()
+
+
+class UserResource(_UniqueResource):
+    model = User
+    fields = ('id', 'username', 'role', 'full_name')
+    read_roles = write_roles = ('admin',)
+    schedule_column = 'lecturer_id'
+    unique = 'username'
+
+    def values(self, item, current=None):
+        merged = dict(current or {}, **item)
+        role = merged.get('role')
+        if role not in ROLES:
+            raise InvalidItem(f"'role' harus salah satu dari {', '.join(ROLES)}")
+        values = {
+            'username': _text(merged, 'username', 80),
+            'role': role,
+            'full_name': _text(merged, 'full_name', 100),
+        }
+        if current is None or 'password' in item:
+            values['password'] = _text(item, 'password', 200)
+        return values
+
+    def check_delete(self, context, row_id):
+        if row_id == current_user().id:
+            raise InvalidItem('Tidak dapat menghapus akun sendiri')
+        super().check_delete(context, row_id)
+
+    def before_write(self, creates, updates):
+        rows = [row for row in creates + updates if 'password' in row]
+        hashed = hash_passwords([row['password'] for row in rows], workers=1 if len(rows) < 8 else None)
+        for row, password in zip(rows, hashed):
+            row['password'] = password
+
+    def committed(self, context):
+        auth.forget()
+
+
+RESOURCES = {
+    'schedules': ScheduleResource(),
+    'labs': LabResource(),
+    'practicums': PracticumResource(),
+    'users': UserResource(),
+}
+
+
+def _error(message, status=400, **extra):
+    return jsonify(error=message, **extra), status
+
+
+def _serialize(row, fields):
+    data = {}
+    for name, value in zip(fields, row):
+        data[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return data
+
+
+def _selected_fields(resource):
+    """Fields asked for with ``?fields=``, or None if one is unknown."""
+    requested = request.args.get('fields')
+    if not requested:
+        return resource.fields
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    if any(name not in resource.fields for name in names):
+        return None
+    # The id is always returned, it is the cursor
+    return tuple(dict.fromkeys(['id'] + names))
+
+
+def list_rows(resource):
+    fields = _selected_fields(resource)
+    if fields is None:
+        return _error(f"Field yang tersedia: {', '.join(resource.fields)}")
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    model = resource.model
+
+    query = (select(*(getattr(model, name) for name in fields))
+             .where(*resource.query_conditions(current_user(), request.args))
+             .order_by(model.id)
+             .limit(limit + 1))
+    after = request.args.get('after', type=int)
+    if after is not None:
+        query = query.where(model.id > after)
+
+    rows = db.session.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify(
+        data=[_serialize(row, fields) for row in rows],
+        next_cursor=str(rows[-1][0]) if has_more else None,
+    )
+
+
+def get_row(resource, row_id):
+    fields = _selected_fields(resource)
+    if fields is None:
+        return _error(f"Field yang tersedia: {', '.join(resource.fields)}")
+    model = resource.model
+    row = db.session.execute(
+        select(*(getattr(model, name) for name in fields))
+        .where(model.id == row_id, *resource.query_conditions(current_user(), request.args))
+    ).first()
+    if row is None:
+        return _error('Data tidak ditemukan', 404)
+    return jsonify(data=_serialize(row, fields))
+
+
+def run_batch(resource):
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return _error('Body harus berupa objek JSON')
+    creates = payload.get('create', [])
+    updates = payload.get('update', [])
+    deletes = payload.get('delete', [])
+    if not all(isinstance(part, list) for part in (creates, updates, deletes)):
+        return _error("'create', 'update' dan 'delete' harus berupa list")
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH:
+        return _error(f'Maksimal {MAX_BATCH} operasi per batch', 413)
+    if not all(isinstance(item, dict) for item in creates + updates):
+        return _error("Setiap item 'create' dan 'update' harus berupa objek")
+    if not all(isinstance(item, int) and not isinstance(item, bool) for item in deletes):
+        return _error("'delete' harus berisi id")
+
+    update_ids = [item.get('id') for item in updates]
+    touched = {row_id for row_id in update_ids + deletes if isinstance(row_id, int)}
+    existing = _existing_rows(resource, touched)
+
+    errors = []
+    updated = []
+    for position, (row_id, item) in enumerate(zip(update_ids, updates)):
+        if row_id not in existing or row_id in deletes:
+            errors.append(BatchError('update', position, f'Id {row_id} tidak ditemukan'))
+            continue
+        try:
+            updated.append((position, dict(resource.values(item, existing[row_id]), id=row_id)))
+        except InvalidItem as e:
+            errors.append(BatchError('update', position, str(e)))
+    created = []
+    for position, item in enumerate(creates):
+        try:
+            created.append((position, resource.values(item)))
+        except InvalidItem as e:
+            errors.append(BatchError('create', position, str(e)))
+
+    check_errors, _ = _check_batch(resource, deletes, updated, created, existing)
+    errors = check_errors + errors
+    if errors:
+        return _error('Batch tidak disimpan', 422, errors=[error._asdict() for error in errors])
+
+    updated_rows = [values for _, values in updated]
+    created_rows = [values for _, values in created]
+    resource.before_write(created_rows, updated_rows)
+    model = resource.model
+
+    def write():
+        # Data may have changed since the checks above; repeat them under the lock
+        errors, context = _check_batch(resource, deletes, updated, created,
+                                       _existing_rows(resource, touched))
+        if errors:
+            return errors, context, []
+        if deletes:
+            db.session.execute(delete(model).where(_in(model.id, set(deletes))))
+        if updated_rows:
+            db.session.execute(update(model), updated_rows)
+        created_ids = []
+        if created_rows:
+            created_ids = list(db.session.scalars(insert(model).returning(model.id), created_rows))
+        return [], context, created_ids
+
+    try:
+        errors, context, created_ids = write_transaction(write)
+    except IntegrityError:
+        return _error('Data berubah saat batch disimpan dan sekarang bentrok, silakan ulangi', 409)
+    if errors:
+        return _error('Data berubah saat batch disimpan, silakan ulangi', 409,
+                      errors=[error._asdict() for error in errors])
+    resource.committed(context)
+
+    return jsonify(created=created_ids, updated=len(updated_rows), deleted=len(deletes))
+
+
+def _existing_rows(resource, ids):
+    """Current values of the rows ``ids`` that exist, by id."""
+    model = resource.model
+    if not ids:
+        return {}
+    columns = [model.id] + [getattr(model, name) for name in resource.fields if name != 'id']
+    names = [column.key for column in columns]
+    return {row[0]: dict(zip(names, row))
+            for row in db.session.execute(select(*columns).where(_in(model.id, ids)))}
+
+
+def _check_batch(resource, deletes, updated, created, existing):
+    """Check parsed ``(position, values)`` rows against the table and each
+    other; returns the errors and the context of the resource."""
+    errors = []
+    context = resource.prepare([values for _, values in created], [values for _, values in updated], deletes)
+    for position, row_id in enumerate(deletes):
+        if row_id not in existing:
+            errors.append(BatchError('delete', position, f'Id {row_id} tidak ditemukan'))
+            continue
+        try:
+            resource.check_delete(context, row_id)
+        except InvalidItem as e:
+            errors.append(BatchError('delete', position, str(e)))
+    for position, values in updated:
+        if values['id'] not in existing:
+            errors.append(BatchError('update', position, f"Id {values['id']} tidak ditemukan"))
+            continue
+        try:
+            resource.check(context, values, values['id'])
+        except InvalidItem as e:
+            errors.append(BatchError('update', position, str(e)))
+    for position, values in created:
+        try:
+            # New rows are known by a negative id until they are inserted
+            resource.check(context, values, -position - 1)
+        except InvalidItem as e:
+            errors.append(BatchError('create', position, str(e)))
+    return errors, context
+
+
+def _register(name, resource):
+    read = api_role_required(*resource.read_roles)
+    write = api_role_required(*resource.write_roles)
+    api.add_url_rule(f'/{name}', f'list_{name}', read(lambda: list_rows(resource)))
+    api.add_url_rule(f'/{name}/<int:row_id>', f'get_{name}', read(lambda row_id: get_row(resource, row_id)))
+    api.add_url_rule(f'/{name}/batch', f'batch_{name}', write(lambda: run_batch(resource)), methods=['POST'])
+
+
+for _name, _resource in RESOURCES.items():
+    _register(_name, _resource)
+
+
+@api.route('/availability')
+@api_role_required('admin', 'staff')
+def availability():
+    """Every free (lab, day, slot) for a lecturer and a class group.
+
+    The class group is ``class_name`` with ``semester``, or with the
+    semester of ``course_id``, in the term ``term_id`` or the active one.
+    ``min_capacity`` leaves out smaller labs and ``schedule_id`` names a
+    session being edited, which then does not block its own cell.  ``free``
+    is the bitmask of the free cells, where cell ``day * len(slots) + slot``
+    is bit ``1 << cell``; ``cells`` lists the same cells as ``[day, slot]``
+    pairs.
+    """
+    lecturer_id = request.args.get('lecturer_id', type=int)
+    class_name = request.args.get('class_name', '').strip()
+    semester = request.args.get('semester', type=int)
+    course_id = request.args.get('course_id', type=int)
+    if semester is None and course_id is not None:
+        semester = db.session.scalar(select(Practicum.semester).where(Practicum.id == course_id))
+    if lecturer_id is None or not class_name or semester is None:
+        return _error("'lecturer_id', 'class_name' dan 'semester' atau 'course_id' wajib diisi")
+
+    labs = find_availability(selected_term_id(request.args), lecturer_id, semester, class_name,
+                             min_capacity=request.args.get('min_capacity', 0, type=int),
+                             ignore=request.args.get('schedule_id', type=int))
+    return jsonify(
+        days=DAYS,
+        slots=TIME_SLOTS,
+        data=[{
+            'lab_id': lab.lab_id,
+            'lab_name': lab.lab_name,
+            'capacity': lab.capacity,
+            'free': lab.free,
+            'cells': [split_cell(cell) for cell in iter_cells(lab.free)],
+        } for lab in labs],
+    )
+
+
+@api.route('/search')
+@api_role_required()
+def search():
+    """Typeahead search over practicums, lecturers, labs and the schedules
+    of the term ``term_id`` (the active one by default), best match first.
+
+    ``q`` is what was typed; every word matches as a prefix.  ``kind=a,b``
+    narrows the result to some of ``schedule``, ``practicum``, ``lab`` and
+    ``lecturer``.  Lecturers only find their own schedules.
+    """
+    user = current_user()
+    kinds = [kind for kind in request.args.get('kind', '').split(',') if kind]
+    unknown = set(kinds) - set(search_index.SEARCH_KINDS)
+    if unknown:
+        return _error(f"'kind' tidak dikenal: {', '.join(sorted(unknown))}")
+    results = search_index.search(user, request.args.get('q', ''), selected_term_id(request.args), kinds,
+                                  request.args.get('limit', search_index.DEFAULT_LIMIT, type=int))
+    return jsonify(data=[search_index.describe(result, user) for result in results])
+
+
+
+@api.route('/occurrences')
+@api_role_required()
+def list_occurrences():
+    """Dated sessions from ``start`` to ``end`` inclusive, at most
+    ``MAX_OCCURRENCE_DAYS`` days, ordered by date and slot, with the
+    holidays of the range.  ``lab_id`` and ``lecturer_id`` filter them;
+    lecturers only see their own.  A make-up session has its
+    ``makeup_id`` set and the slot and lab it was moved to.
+    """
+    user = current_user()
+    try:
+        first = date.fromisoformat(request.args.get('start', ''))
+        last = date.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        return _error("'start' dan 'end' wajib diisi dengan format YYYY-MM-DD")
+    if not 0 <= (last - first).days < MAX_OCCURRENCE_DAYS:
+        return _error(f"'end' harus sama dengan atau setelah 'start', paling lama {MAX_OCCURRENCE_DAYS} hari")
+
+    conditions = []
+    lecturer_id = user.id if user.role == 'lecturer' else request.args.get('lecturer_id', type=int)
+    if lecturer_id is not None:
+        conditions.append(Schedule.lecturer_id == lecturer_id)
+    end = last + timedelta(days=1)
+    exceptions = occurrences.Exceptions.load(first, end)
+    sessions = occurrences.between(first, end, conditions, request.args.get('lab_id', type=int), exceptions)
+    return jsonify(
+        holidays=[{'date': day.isoformat(), 'note': note} for day, note in sorted(exceptions.holidays.items())],
+        data=[{
+            'date': occurrence.date.isoformat(),
+            'slot': occurrence.slot,
+            'time': TIME_SLOTS[occurrence.slot],
+            'schedule_id': occurrence.schedule.id,
+            'term_id': occurrence.schedule.term_id,
+            'code': occurrence.schedule.code,
+            'practicum_name': occurrence.schedule.practicum_name,
+            'semester': occurrence.schedule.semester,
+            'class_name': occurrence.schedule.class_name,
+            'lecturer_id': occurrence.schedule.lecturer_id,
+            'lecturer_name': occurrence.schedule.lecturer_name,
+            'lab_id': occurrence.lab_id,
+            'lab_name': occurrence.lab,
+            'makeup_id': occurrence.makeup_id,
+        } for occurrence in sessions],
+    )
+
+
+@api.route('/changes')
+@api_role_required()
+def changes():
+    """Schedule changes after ``since``; without it only the current version.
+
+    Clients first read the version, then load ``/schedules``, then keep
+    asking for the changes since the last version they got.
+    """
+    conditions = journal.change_conditions(current_user(), request.args.get('lab_id', type=int))
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify(data=[], version=journal.latest_version(), more=False)
+    if journal.is_pruned(since):
+        return _error('Perubahan sejak versi ini sudah dihapus, muat ulang semua jadwal', 410,
+                      version=journal.latest_version())
+    limit = min(max(request.args.get('limit', journal.MAX_CHANGES, type=int), 1), journal.MAX_CHANGES)
+    data, version, more = journal.changes_since(since, conditions, limit)
+    return jsonify(data=data, version=version, more=more)
+
+
+@api.route('/changes/stream')
+@api_role_required()
+def change_stream():
+    """Live feed of ``changes`` as Server-Sent Events.  Reconnecting
+    browsers resume from the Last-Event-ID header."""
+    conditions = journal.change_conditions(current_user(), request.args.get('lab_id', type=int))
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    return Response(stream_with_context(journal.event_stream(conditions, since)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@api.route('/jobs')
+@api_role_required()
+def list_jobs():
+    """The latest background jobs of the user; admins see everyone's."""
+    return jsonify(data=[jobs.describe(job) for job in jobs.recent(current_user())])
+
+
+@api.route('/jobs/<kind>', methods=['POST'])
+@api_role_required()
+def submit_job(kind):
+    """Queue a background job and answer 202 at once.
+
+    The parameters of the task are the JSON body, or the form fields of a
+    multipart request whose ``file`` is handed to the task as ``upload``.
+    """
+    task = jobs.TASKS.get(kind)
+    if task is None:
+        return _error(f"Jenis pekerjaan '{kind}' tidak dikenal", 404)
+    if current_user().role not in task.roles:
+        return _error('Anda tidak memiliki akses ke resource ini', 403)
+    upload = request.files.get('file')
+    saved = None
+    if upload is not None and upload.filename:
+        saved = jobs.save_upload(upload)
+        params = dict(request.form.items(), upload=saved, filename=upload.filename)
+    else:
+        params = request.get_json(silent=True)
+        if params is None:
+            params = {}
+        if not isinstance(params, dict):
+            return _error('Body harus berupa objek JSON')
+    try:
+        job = jobs.submit(kind, params, current_user().id, upload=saved)
+    except ValueError as e:
+        if saved:
+            os.remove(jobs.upload_path(saved))
+        return _error(str(e))
+    return jsonify(data=jobs.describe(job)), 202, {'Location': url_for('api.get_job', job_id=job.id)}
+
+
+def _visible_job(job_id):
+    job = db.session.get(Job, job_id)
+    return job if jobs.visible(job, current_user()) else None
+
+
+@api.route('/jobs/<int:job_id>')
+@api_role_required()
+def get_job(job_id):
+    job = _visible_job(job_id)
+    if job is None:
+        return _error(f'Pekerjaan {job_id} tidak ditemukan', 404)
+    return jsonify(data=jobs.describe(job))
+
+
+@api.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@api_role_required()
+def cancel_job(job_id):
+    job = _visible_job(job_id)
+    if job is None:
+        return _error(f'Pekerjaan {job_id} tidak ditemukan', 404)
+    if not jobs.cancel(job):
+        return _error('Pekerjaan sudah selesai', 409, data=jobs.describe(job))
+    return jsonify(data=jobs.describe(job))
+
+
+@api.route('/jobs/<int:job_id>/result')
+@api_role_required()
+def job_result(job_id):
+    """The result file of a finished job, such as an export."""
+    job = _visible_job(job_id)
+    if job is None:
+        return _error(f'Pekerjaan {job_id} tidak ditemukan', 404)
+    return jobs.send_result(job)
+
+
+@api.route('/login', methods=['POST'])
+def login():
+    payload = request.get_json(silent=True) or {}
+    user = User.query.filter_by(username=payload.get('username')).first()
+    if user is None or not check_password_hash(user.password, str(payload.get('password', ''))):
+        return _error('Username atau password salah', 401)
+    auth.login(user)
+    return jsonify(data={'id': user.id, 'username': user.username, 'role': user.role,
+                         'full_name': user.full_name})
+
+
+@api.route('/logout', methods=['POST'])
+def logout():
+    session.clear()
+    return jsonify(data=None)
+
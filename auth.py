@@ -0,0 +1,144 @@
+"""Authentication helpers: the current user of a request and route guards.
+
+The logged-in user is resolved once per request and kept on ``g``.  The
+lookup goes through a small per-process LRU cache with a TTL, so most page
+views do not query the user table at all.  Entries are keyed on
+``changes.reference_version``, which every commit touching the user table
+replaces in all worker processes, so a changed role or a deleted user takes
+effect on the next request everywhere.  ``forget`` drops entries of the
+current process at once.
+
+The cache holds plain ``Principal`` tuples rather than ``User`` instances,
+which cannot be shared between sessions and threads.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import flash, g, jsonify, redirect, session, url_for
+
+from changes import reference_version
+from models import db, User
+
+Principal = namedtuple('Principal', 'id username role full_name')
+
+CACHE_TTL = 300
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def load_principal(user_id):
+    """Return the ``Principal`` of ``user_id``, or None if it was deleted."""
+    now = time.monotonic()
+    # Read before the query, so a change committed meanwhile is not missed
+    version = reference_version()
+    with _lock:
+        hit = _cache.get(user_id)
+        if hit is not None and hit[0] > now and hit[1] == version:
+            _cache.move_to_end(user_id)
+            return hit[2]
+
+    row = db.session.execute(
+        db.select(User.id, User.username, User.role, User.full_name).where(User.id == user_id)
+    ).first()
+    principal = Principal(*row) if row is not None else None
+
+    if principal is not None:
+        with _lock:
+            _cache[user_id] = (now + CACHE_TTL, version, principal)
+            _cache.move_to_end(user_id)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return principal
+
+
+def forget(user_id=None):
+    """Drop the cached principal of ``user_id``, or of everyone."""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
+def login(user):
+    session.clear()
+    session['user_id'] = user.id
+    session['username'] = user.username
+    session['role'] = user.role
+    session['full_name'] = user.full_name
+    g.principal = Principal(user.id, user.username, user.role, user.full_name)
+
+
+def current_user():
+    """Return the ``Principal`` of this request, or None when logged out.
+
+    A session whose user no longer exists is cleared.  The name and role
+    kept in the session for the navigation bar are refreshed when an admin
+    changed them.
+    """
+    if 'principal' in g:
+        return g.principal
+
+    principal = None
+    user_id = session.get('user_id')
+    if user_id is not None:
+        principal = load_principal(user_id)
+        if principal is None:
+            session.clear()
+        elif (session.get('role'), session.get('full_name')) != (principal.role, principal.full_name):
+            session['username'] = principal.username
+            session['role'] = principal.role
+            session['full_name'] = principal.full_name
+    g.principal = principal
+    return principal
+
+
+def api_role_required(*roles):
+    """Like ``role_required`` for JSON endpoints: answers 401 / 403 with a
+    JSON error instead of redirecting.  Without ``roles`` any logged-in
+    user is accepted."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user = current_user()
+            if user is None:
+                return jsonify(error='Silakan login terlebih dahulu'), 401
+            if roles and user.role not in roles:
+                return jsonify(error='Anda tidak memiliki akses ke resource ini'), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _login_redirect():
+    flash('Silakan login terlebih dahulu', 'danger')
+    return redirect(url_for('auth.login'))
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_user() is None:
+            return _login_redirect()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# Decorator untuk role-based access
+def role_required(*roles):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user = current_user()
+            if user is None:
+                return _login_redirect()
+            if user.role not in roles:
+                flash('Anda tidak memiliki akses ke halaman ini', 'danger')
+                return redirect(url_for('main.dashboard'))
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,594 @@
+"""Registration week load test against a running server.
+
+Starts the application on a local port (or uses ``--url``) and lets
+virtual users arrive at ``--rate`` journeys per second, as a Poisson
+process that ramps up over ``--ramp`` seconds.  Every virtual user is an
+asyncio task with its own keep-alive connection and session cookie, and
+follows the journey of its role with random think time between steps:
+
+* ``lecturer``: log in, dashboard, own schedules, weekly grid, log out,
+* ``staff``: log in, dashboard, schedules of one lab, edit a schedule and
+  move it to another day and slot, log out,
+* ``admin``: log in, dashboard, schedule list, a search, labs, log out.
+
+Redirects are followed like a browser does.  The report gives throughput,
+latency percentiles and errors per step, and lock contention: the time
+requests waited for the SQLite write lock (the ``lock`` span of the
+``Server-Timing`` header), write transactions retried because the
+database stayed locked, and "database is locked" errors in the server
+log.
+
+The started server runs with ``PRODUCTION=1`` and ``INSTRUMENTATION=1``
+on a copy of a ``routes.py`` dataset.  ``--server-command`` starts
+something else than the threaded Werkzeug server, for example a number
+of gunicorn workers; ``{python}`` and ``{port}`` are filled in:
+
+    python benchmarks/load.py --size medium --rate 20 --duration 60
+    python benchmarks/load.py --size medium --rate 20 \\
+        --server-command "gunicorn -w 4 --threads 8 -b 127.0.0.1:{port} app:create_app()"
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SIZES = ('small', 'medium', 'large')
+ROLES = ('lecturer', 'staff', 'admin')
+DEFAULT_MIX = 'lecturer=80,staff=15,admin=5'
+SEARCH_WORDS = ('praktikum', 'basis data', 'jaringan', 'lab', 'pemrograman', 'sistem')
+DAYS = 6
+SLOTS = 5
+MAX_REDIRECTS = 5
+SERVER_START_TIMEOUT = 60
+
+_server_timing = re.compile(r'(\w+);dur=([\d.]+)')
+_numbers = re.compile(r'/\d+')
+
+
+class JourneyError(Exception):
+    """A step failed; the rest of the journey is skipped."""
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+def step_name(method, path):
+    """``GET /schedules/edit/<id>`` for ``/schedules/edit/12?x=1``."""
+    return f'{method} {_numbers.sub("/<id>", path.split("?")[0])}'
+
+
+class Stats:
+
+    def __init__(self):
+        self.times = defaultdict(list)
+        self.lock_waits = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.journeys = Counter()
+        self.outcomes = Counter()
+
+    def record(self, name, seconds, error=None, timing=None):
+        self.times[name].append(seconds * 1000)
+        if error is not None:
+            self.errors[name][error] += 1
+        if timing and 'lock' in timing:
+            self.lock_waits[name].append(timing['lock'])
+
+
+class Browser:
+    """One virtual user: a keep-alive HTTP/1.1 connection and a cookie jar."""
+
+    def __init__(self, host, port, stats, timeout):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    def _store_cookies(self, headers):
+        for name, value in headers:
+            if name != 'set-cookie':
+                continue
+            pair, _, attributes = value.partition(';')
+            key, _, cookie = pair.strip().partition('=')
+            if not cookie or 'max-age=0' in attributes.lower().replace(' ', ''):
+                self.cookies.pop(key, None)
+            else:
+                self.cookies[key] = cookie
+
+    async def _read_body(self, headers):
+        fields = dict(headers)
+        if fields.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Trailers end with an empty line
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+        if 'content-length' in fields:
+            return await self.reader.readexactly(int(fields['content-length']))
+        return await self.reader.read()
+
+    async def _exchange(self, method, target, body):
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{key}={value}' for key, value in self.cookies.items()))
+        if body is not None:
+            lines += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}']
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by the server')
+        version, status = status_line.split()[:2]
+        headers = []
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.append((name.strip().lower(), value.strip()))
+        content = await self._read_body(headers)
+        self._store_cookies(headers)
+        if version != b'HTTP/1.1' or dict(headers).get('connection', '').lower() == 'close':
+            self.close()
+        return int(status), dict(headers), content
+
+    async def _send(self, method, target, body):
+        reused = self.writer is not None
+        if not reused:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            return await self._exchange(method, target, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+        # The server closed an idle keep-alive connection; once more on a new one
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return await self._exchange(method, target, body)
+
+    async def request(self, method, target, form=None):
+        """Send a request and follow its redirects; returns the last
+        ``(status, path, body)``.  Every hop is recorded as a step, and a
+        failed one raises ``JourneyError``."""
+        body = urlencode(form).encode() if form is not None else None
+        for _ in range(MAX_REDIRECTS + 1):
+            name = step_name(method, target)
+            started = time.perf_counter()
+            try:
+                status, headers, content = await asyncio.wait_for(self._send(method, target, body),
+                                                                  self.timeout)
+            except asyncio.TimeoutError:
+                self.close()
+                self.stats.record(name, time.perf_counter() - started, 'timeout')
+                raise JourneyError(f'{name}: timeout')
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                self.close()
+                self.stats.record(name, time.perf_counter() - started, type(e).__name__)
+                raise JourneyError(f'{name}: {e}')
+            timing = {key: float(value) for key, value in
+                      _server_timing.findall(headers.get('server-timing', ''))}
+            error = f'HTTP {status}' if status >= 400 else None
+            self.stats.record(name, time.perf_counter() - started, error, timing)
+            if error is not None:
+                raise JourneyError(f'{name}: {error}')
+            if status not in (301, 302, 303, 307, 308):
+                return status, target, content
+            location = urlsplit(headers['location'])
+            target = location.path + (f'?{location.query}' if location.query else '')
+            if status in (301, 302, 303):
+                method, body = 'GET', None
+        raise JourneyError(f'{name}: too many redirects')
+
+
+# Journeys
+
+async def log_in(browser, username, password):
+    await browser.request('GET', '/login')
+    _, path, _ = await browser.request('POST', '/login', {'username': username, 'password': password})
+    if path != '/dashboard':
+        # Answered, but with the login page again
+        browser.stats.errors['POST /login']['login refused'] += 1
+        raise JourneyError(f'login {username} refused')
+
+
+async def lecturer_journey(browser, fixtures, think):
+    await log_in(browser, random.choice(fixtures['lecturers']), fixtures['lecturer_password'])
+    await think()
+    await browser.request('GET', '/schedules')
+    await think()
+    await browser.request('GET', '/schedules/grid')
+    if random.random() < 0.5:
+        await think()
+        await browser.request('GET', f'/schedules?day={random.randrange(DAYS)}')
+    await browser.request('GET', '/logout')
+
+
+async def staff_journey(browser, fixtures, think):
+    await log_in(browser, *fixtures['staff'])
+    schedule = random.choice(fixtures['schedules'])
+    await think()
+    await browser.request('GET', f'/schedules?lab_id={schedule["lab_id"]}')
+    await think()
+    await browser.request('GET', f'/schedules/edit/{schedule["id"]}')
+    await think()
+    form = {name: schedule[name] for name in ('term_id', 'course_id', 'lecturer_id', 'lab_id', 'class_name')}
+    form.update(day=random.randrange(DAYS), slot=random.randrange(SLOTS))
+    _, path, _ = await browser.request('POST', f'/schedules/edit/{schedule["id"]}', form)
+    browser.stats.outcomes['edit saved' if path == '/schedules' else 'edit refused'] += 1
+    await browser.request('GET', '/logout')
+
+
+async def admin_journey(browser, fixtures, think):
+    await log_in(browser, *fixtures['admin'])
+    await think()
+    await browser.request('GET', '/schedules')
+    await think()
+    await browser.request('GET', '/api/v1/search?' + urlencode({'q': random.choice(SEARCH_WORDS)}))
+    await think()
+    await browser.request('GET', '/labs')
+    await browser.request('GET', '/logout')
+
+
+JOURNEYS = {'lecturer': lecturer_journey, 'staff': staff_journey, 'admin': admin_journey}
+
+
+async def virtual_user(role, host, port, fixtures, stats, args):
+    async def think():
+        if args.think > 0:
+            await asyncio.sleep(random.expovariate(1 / args.think))
+
+    browser = Browser(host, port, stats, args.timeout)
+    try:
+        await JOURNEYS[role](browser, fixtures, think)
+        stats.journeys[f'{role} completed'] += 1
+    except JourneyError:
+        stats.journeys[f'{role} failed'] += 1
+    finally:
+        browser.close()
+
+
+async def fetch_json(browser, target):
+    _, _, content = await browser.request('GET', target)
+    return json.loads(content)
+
+
+async def load_fixtures(host, port, args):
+    """Lecturer accounts and schedules for the journeys, read through the
+    API as admin.  Returns the fixtures and the admin browser, still
+    logged in for reading the metrics afterwards; its requests are not
+    part of the report."""
+    admin = Browser(host, port, Stats(), args.timeout)
+    username, password = args.admin.split(':', 1)
+    await log_in(admin, username, password)
+    lecturers, after = [], None
+    while True:
+        page = await fetch_json(admin, '/api/v1/users?fields=username,role&limit=1000'
+                                + (f'&after={after}' if after else ''))
+        lecturers += [user['username'] for user in page['data'] if user['role'] == 'lecturer']
+        after = page['next_cursor']
+        if after is None:
+            break
+    fields = 'term_id,course_id,lecturer_id,lab_id,class_name'
+    schedules = (await fetch_json(admin, f'/api/v1/schedules?fields={fields}&limit=1000'))['data']
+    if not lecturers or not schedules:
+        raise SystemExit('Database tidak punya dosen atau jadwal untuk diuji')
+    fixtures = {
+        'lecturers': lecturers,
+        'lecturer_password': args.lecturer_password,
+        'schedules': schedules,
+        'staff': args.staff.split(':', 1),
+        'admin': (username, password),
+    }
+    return fixtures, admin
+
+
+async def lock_retries(admin):
+    """Sum of ``lab_lock_retries_total``, or None without instrumentation."""
+    try:
+        _, _, content = await admin.request('GET', '/metrics')
+    except JourneyError:
+        return None
+    return sum(int(line.rsplit(' ', 1)[1]) for line in content.decode().splitlines()
+               if line.startswith('lab_lock_retries_total'))
+
+
+async def run_load(host, port, args):
+    fixtures, admin = await load_fixtures(host, port, args)
+    retries_before = await lock_retries(admin)
+    stats = Stats()
+
+    roles, weights = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    loop = asyncio.get_running_loop()
+    users = set()
+    dropped = 0
+    started = loop.time()
+    # Arrivals at the full rate, thinned during the ramp
+    while True:
+        await asyncio.sleep(rng.expovariate(args.rate))
+        now = loop.time() - started
+        if now >= args.duration:
+            break
+        if args.ramp and rng.random() > now / args.ramp:
+            continue
+        if len(users) >= args.max_users:
+            dropped += 1
+            continue
+        role = rng.choices(roles, weights)[0]
+        task = asyncio.create_task(virtual_user(role, host, port, fixtures, stats, args))
+        users.add(task)
+        task.add_done_callback(users.discard)
+    arrivals_done = loop.time()
+    if users:
+        done, pending = await asyncio.wait(users, timeout=args.drain)
+        for task in pending:
+            task.cancel()
+        stats.journeys['unfinished'] += len(pending)
+    elapsed = loop.time() - started
+
+    retries_after = await lock_retries(admin)
+    admin.close()
+    retries = retries_after - retries_before if None not in (retries_before, retries_after) else None
+    return stats, elapsed, arrivals_done - started, dropped, retries
+
+
+def parse_mix(mix):
+    roles, weights = [], []
+    for part in mix.split(','):
+        role, _, weight = part.partition('=')
+        role = role.strip()
+        if role not in ROLES or not weight.strip().isdigit():
+            raise ValueError(f'--mix: {part!r}')
+        roles.append(role)
+        weights.append(int(weight))
+    if not any(weights):
+        raise ValueError('--mix: every weight is 0')
+    return roles, weights
+
+
+def summarize(stats, elapsed, arrival_seconds, dropped, retries, locked_errors):
+    requests = sum(len(times) for times in stats.times.values())
+    errors = sum(sum(counter.values()) for counter in stats.errors.values())
+    steps = {}
+    for name in sorted(stats.times):
+        times = stats.times[name]
+        waits = stats.lock_waits.get(name, [])
+        steps[name] = {
+            'count': len(times),
+            'errors': dict(stats.errors.get(name, {})),
+            'p50_ms': round(percentile(times, 50), 1),
+            'p90_ms': round(percentile(times, 90), 1),
+            'p99_ms': round(percentile(times, 99), 1),
+            'max_ms': round(max(times), 1),
+            'lock_p99_ms': round(percentile(waits, 99), 1) if waits else None,
+        }
+    waits = [wait for name_waits in stats.lock_waits.values() for wait in name_waits]
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'arrival_s': round(arrival_seconds, 2),
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0,
+        'error_rate': round(errors / requests, 4) if requests else 0,
+        'journeys': dict(stats.journeys, dropped=dropped),
+        'outcomes': dict(stats.outcomes),
+        'steps': steps,
+        'lock': {
+            'waits': len(waits),
+            'waited_over_1ms': sum(1 for wait in waits if wait > 1),
+            'total_ms': round(sum(waits), 1),
+            'p50_ms': round(percentile(waits, 50), 1) if waits else None,
+            'p99_ms': round(percentile(waits, 99), 1) if waits else None,
+            'max_ms': round(max(waits), 1) if waits else None,
+            'retries': retries,
+            'locked_errors': locked_errors,
+        },
+    }
+
+
+def print_report(results):
+    print(f'\n{results["requests"]} request dalam {results["elapsed_s"]}s: '
+          f'{results["throughput_rps"]} req/s, error {results["error_rate"] * 100:.2f}%')
+    print('Journey: ' + ', '.join(f'{key} {value}' for key, value in sorted(results['journeys'].items())))
+    if results['outcomes']:
+        print('Edit: ' + ', '.join(f'{key} {value}' for key, value in sorted(results['outcomes'].items())))
+    print(f'\n  {"step":<34}{"count":>7}{"err":>6}{"p50":>9}{"p90":>9}{"p99":>9}{"max":>9}{"lock p99":>10}')
+    for name, r in results['steps'].items():
+        lock = f'{r["lock_p99_ms"]:.1f}' if r['lock_p99_ms'] is not None else '-'
+        print(f'  {name:<34}{r["count"]:>7}{sum(r["errors"].values()):>6}{r["p50_ms"]:>9.1f}'
+              f'{r["p90_ms"]:>9.1f}{r["p99_ms"]:>9.1f}{r["max_ms"]:>9.1f}{lock:>10}')
+        for error, count in sorted(r['errors'].items()):
+            print(f'  {"":<4}{error}: {count}')
+    lock = results['lock']
+    if lock['waits']:
+        print(f'\nKunci tulis: {lock["waits"]} transaksi, {lock["waited_over_1ms"]} menunggu > 1 ms, '
+              f'p99 {lock["p99_ms"]} ms, max {lock["max_ms"]} ms, total {lock["total_ms"]} ms')
+    else:
+        print('\nKunci tulis: tidak ada transaksi tulis yang terukur')
+    # None when the server has no instrumentation or its log is not ours
+    unknown = lambda value: '-' if value is None else value
+    print(f'Transaksi diulang: {unknown(lock["retries"])}, '
+          f'error "database is locked": {unknown(lock["locked_errors"])}')
+
+
+# Server
+
+def prepare_database(size, data_dir):
+    """A fresh copy of the ``routes.py`` dataset of ``size``."""
+    import migrations
+    source = os.path.join(data_dir, f'{size}-schema{migrations.LATEST}.db')
+    if not os.path.exists(source):
+        print(f'membuat dataset {source}', flush=True)
+        subprocess.run([sys.executable, os.path.join(BENCHMARKS, 'routes.py'), '--prepare', size],
+                       env=dict(os.environ, DATABASE_URL=f'sqlite:///{source}'),
+                       check=True, stdout=subprocess.DEVNULL)
+    path = os.path.join(data_dir, f'load-{size}.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(source, path)
+    return path
+
+
+def serve(port):
+    import logging
+    from werkzeug.serving import run_simple
+    from app import create_app
+
+    # Errors are still logged, a line per request is not
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    run_simple('127.0.0.1', port, create_app(), threaded=True)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, database, log):
+    port = free_port()
+    if args.server_command:
+        command = shlex.split(args.server_command.format(python=shlex.quote(sys.executable), port=port))
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)]
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', INSTRUMENTATION='1',
+               PRODUCTION='0' if args.no_production else '1')
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'Server berhenti dengan status {server.returncode}, lihat {log.name}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f'Server tidak siap dalam {SERVER_START_TIMEOUT} detik')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rate', type=float, default=5, help='Journeys started per second.')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of arrivals.')
+    parser.add_argument('--ramp', type=float, default=10, help='Seconds to reach --rate.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Weights of the roles.')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean think time between steps in seconds.')
+    parser.add_argument('--max-users', type=int, default=500,
+                        help='Concurrent virtual users; later arrivals are dropped.')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds per request.')
+    parser.add_argument('--drain', type=float, default=60,
+                        help='Seconds to let running journeys finish after the last arrival.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', choices=SIZES, default='small', help='Dataset of routes.py to copy.')
+    parser.add_argument('--url', help='Test a server that is already running instead of starting one.')
+    parser.add_argument('--server-command', help='Command that serves the app on {port}.')
+    parser.add_argument('--no-production', action='store_true',
+                        help='Start the server without WAL mode and the production pool settings.')
+    parser.add_argument('--admin', default='admin:admin123')
+    parser.add_argument('--staff', default='labstaff:staff123')
+    parser.add_argument('--lecturer-password', default='123456')
+    parser.add_argument('--max-error-rate', type=float,
+                        help='Exit with status 1 when more requests than this fraction failed.')
+    parser.add_argument('--output', default='load-results.json')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'lab-scheduling-bench'))
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return 0
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.rate <= 0 or args.duration <= 0:
+        parser.error('--rate and --duration must be positive')
+
+    server = log = None
+    if args.url:
+        location = urlsplit(args.url)
+        host, port = location.hostname, location.port or 80
+    else:
+        os.makedirs(args.data_dir, exist_ok=True)
+        database = prepare_database(args.size, args.data_dir)
+        log = open(os.path.join(args.data_dir, f'load-{args.size}-server.log'), 'w')
+        server, port = start_server(args, database, log)
+        host = '127.0.0.1'
+        print(f'server di port {port}, database {database}', flush=True)
+
+    try:
+        stats, elapsed, arrival_seconds, dropped, retries = asyncio.run(run_load(host, port, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            log.close()
+
+    locked_errors = None
+    if log is not None:
+        with open(log.name, errors='replace') as f:
+            locked_errors = f.read().count('database is locked')
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {key: getattr(args, key) for key in
+                     ('rate', 'duration', 'ramp', 'mix', 'think', 'max_users', 'seed', 'size', 'url',
+                      'server_command', 'no_production')},
+        **summarize(stats, elapsed, arrival_seconds, dropped, retries, locked_errors),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_report(results)
+    print(f'\nHasil ditulis ke {args.output}')
+
+    if args.max_error_rate is not None and results['error_rate'] > args.max_error_rate:
+        print(f'Error {results["error_rate"] * 100:.2f}% melebihi batas {args.max_error_rate * 100:.2f}%')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""Route benchmarks against databases of several sizes.
+
+Drives the Flask test client through the dashboard, the schedule list with
+every combination of its filters, and the add / edit schedule pages.  For
+every case it records wall time percentiles, the number of SQL statements
+per request and the peak Python memory of one request (tracemalloc).
+Every timed request reads its whole body, so streamed pages are measured
+with their rendering.  It runs after a new data version, as the first
+request after a commit does: the page, statistics and grid caches miss,
+while the fragments of unchanged schedule rows stay cached.
+
+Each dataset size runs in its own process with ``DATABASE_URL`` pointing at
+a cached SQLite file built with ``synthetic.generate``.  Results are written
+as JSON; with ``--baseline`` the run fails when a case got slower, issues
+more queries or allocates more memory than ``thresholds.json`` allows.
+
+    python benchmarks/routes.py --sizes small,medium --output after.json \\
+        --baseline before.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = {
+    'small': dict(faculties=1, labs_per_faculty=10, lecturers_per_faculty=30,
+                  practicums_per_semester=6, classes=3),
+    'medium': dict(faculties=20, labs_per_faculty=20, lecturers_per_faculty=30,
+                   practicums_per_semester=8, classes=8),
+    'large': dict(faculties=125, labs_per_faculty=30, lecturers_per_faculty=40,
+                  practicums_per_semester=10, classes=10),
+}
+
+FILTERS = ('lab_id', 'day', 'class_name', 'semester')
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thresholds.json')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+# Worker: runs inside the process bound to one database
+
+def prepare_database(size):
+    from app import create_app
+    from seed import init_sample_data, setup_database
+    import synthetic
+
+    with create_app().app_context():
+        setup_database()
+        init_sample_data()
+        spec = synthetic.DatasetSpec(hash_method='pbkdf2:sha256:1000', **SIZES[size])
+        synthetic.generate(spec, log=lambda message: None)
+
+
+def free_cell(semester, class_name, lab_id, lecturer_id):
+    """A (day, slot) where the class group, the lab and the lecturer are free."""
+    from models import db, Practicum, Schedule
+    from slots import DAYS, TIME_SLOTS
+
+    taken = set(
+        db.session.query(Schedule.day, Schedule.slot)
+        .join(Practicum, Practicum.id == Schedule.course_id)
+        .filter(db.or_(
+            db.and_(Practicum.semester == semester, Schedule.class_name == class_name),
+            Schedule.lab_id == lab_id,
+            Schedule.lecturer_id == lecturer_id,
+        ))
+    )
+    for day in range(len(DAYS)):
+        for slot in range(len(TIME_SLOTS)):
+            if (day, slot) not in taken:
+                return day, slot
+    return None
+
+
+def build_cases(client, lecturer_client):
+    """Return ``(name, client, method, url, data, cleanup)`` tuples."""
+    from models import db, Lab, Practicum, Schedule, User
+
+    sample = Schedule.query.filter(Schedule.class_name.in_(['A', 'B', 'C'])).order_by(Schedule.id).first()
+    values = {
+        'lab_id': str(sample.lab_id),
+        'day': str(sample.day),
+        'class_name': sample.class_name,
+        'semester': str(sample.practicum.semester),
+    }
+
+    cases = [('dashboard', client, 'GET', '/dashboard', None, None)]
+    for count in range(len(FILTERS) + 1):
+        for combo in itertools.combinations(FILTERS, count):
+            query = '&'.join(f'{name}={values[name]}' for name in combo)
+            name = 'schedules' + (f'?{"&".join(combo)}' if combo else '')
+            cases.append((name, client, 'GET', f'/schedules?{query}' if query else '/schedules', None, None))
+    cases.append(('schedules[lecturer]', lecturer_client, 'GET', '/schedules', None, None))
+
+    cases.append(('add_schedule GET', client, 'GET', '/schedules/add', None, None))
+    practicum = db.session.get(Practicum, sample.course_id)
+    lab = Lab.query.order_by(Lab.id).first()
+    lecturer = User.query.filter_by(role='lecturer').order_by(User.id).first()
+    cell = free_cell(practicum.semester, 'A', lab.id, lecturer.id)
+    if cell is not None:
+        form = {'course_id': practicum.id, 'lecturer_id': lecturer.id, 'lab_id': lab.id,
+                'day': cell[0], 'slot': cell[1], 'class_name': 'A'}
+
+        def remove_added():
+            newest = db.session.query(db.func.max(Schedule.id)).scalar()
+            client.get(f'/schedules/delete/{newest}')
+
+        cases.append(('add_schedule POST', client, 'POST', '/schedules/add', form, remove_added))
+
+    cases.append(('edit_schedule GET', client, 'GET', f'/schedules/edit/{sample.id}', None, None))
+    unchanged = {'course_id': sample.course_id, 'lecturer_id': sample.lecturer_id, 'lab_id': sample.lab_id,
+                 'day': sample.day, 'slot': sample.slot, 'class_name': sample.class_name}
+    cases.append(('edit_schedule POST', client, 'POST', f'/schedules/edit/{sample.id}', unchanged, None))
+    return cases
+
+
+def run_worker(size, iterations, warmup, result_file):
+    from sqlalchemy import event
+    from app import create_app
+    from changes import bump_version
+    from models import db, Schedule
+
+    app = create_app()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    lecturer_client = app.test_client()
+    lecturer_client.post('/login', data={'username': 'bayu', 'password': '123456'})
+
+    with app.app_context():
+        statements = [0]
+
+        def count(*args):
+            statements[0] += 1
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        rows = Schedule.query.count()
+        cases = build_cases(client, lecturer_client)
+
+    results = {}
+    for name, case_client, method, url, data, cleanup in cases:
+        def call():
+            response = case_client.open(url, method=method, data=data)
+            # A streamed page renders while its body is read
+            response.get_data()
+            response.close()
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name}: HTTP {response.status_code}')
+            return response
+
+        def after():
+            if cleanup is not None:
+                with app.app_context():
+                    cleanup()
+
+        for _ in range(warmup):
+            call()
+            after()
+
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            bump_version()
+            statements[0] = 0
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(statements[0])
+            after()
+
+        bump_version()
+        tracemalloc.start()
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        after()
+
+        results[name] = {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p90_ms': round(percentile(timings, 90), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    with open(result_file, 'w') as f:
+        json.dump({'rows': rows, 'cases': results}, f)
+
+
+# Parent: prepares datasets, runs workers, compares with a baseline
+
+def database_path(data_dir, size):
+    import migrations
+    return os.path.join(data_dir, f'{size}-schema{migrations.LATEST}.db')
+
+
+def run_size(size, args):
+    path = database_path(args.data_dir, size)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    script = os.path.abspath(__file__)
+    if not os.path.exists(path):
+        print(f'[{size}] membuat dataset {path}', flush=True)
+        subprocess.run([sys.executable, script, '--prepare', size],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_file = f.name
+    try:
+        subprocess.run([sys.executable, script, '--worker', size, '--result-file', result_file,
+                        '--iterations', str(args.iterations), '--warmup', str(args.warmup)],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(result_file) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_file)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, thresholds):
+    """Return a list of regression messages."""
+    default = thresholds.get('default', {})
+    regressions = []
+    for size, measured in results['sizes'].items():
+        before_cases = baseline.get('sizes', {}).get(size, {}).get('cases', {})
+        for name, after in measured['cases'].items():
+            before = before_cases.get(name)
+            if before is None:
+                continue
+            limits = dict(default, **thresholds.get('cases', {}).get(name, {}))
+            slower = after['p50_ms'] - before['p50_ms']
+            if (after['p50_ms'] > before['p50_ms'] * limits.get('max_time_ratio', 1.5)
+                    and slower > limits.get('min_time_delta_ms', 5)):
+                regressions.append(f'[{size}] {name}: p50 {before["p50_ms"]} -> {after["p50_ms"]} ms')
+            if after['queries'] > before['queries'] + limits.get('max_extra_queries', 0):
+                regressions.append(f'[{size}] {name}: queries {before["queries"]} -> {after["queries"]}')
+            if after['peak_kib'] > max(before['peak_kib'], 1) * limits.get('max_memory_ratio', 2.0):
+                regressions.append(f'[{size}] {name}: peak {before["peak_kib"]} -> {after["peak_kib"]} KiB')
+    return regressions
+
+
+def print_table(results):
+    for size, measured in results['sizes'].items():
+        print(f'\n{size} ({measured["rows"]} jadwal)')
+        print(f'  {"case":<46}{"p50":>9}{"p90":>9}{"p99":>9}{"sql":>5}{"peak KiB":>10}')
+        for name, r in measured['cases'].items():
+            print(f'  {name:<46}{r["p50_ms"]:>9.2f}{r["p90_ms"]:>9.2f}{r["p99_ms"]:>9.2f}'
+                  f'{r["queries"]:>5}{r["peak_kib"]:>10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='small,medium', help=f'Comma separated, from {", ".join(SIZES)}.')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--baseline', help='Results of an earlier run to compare against.')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'lab-scheduling-bench'))
+    parser.add_argument('--prepare', choices=SIZES, help=argparse.SUPPRESS)
+    parser.add_argument('--worker', choices=SIZES, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare_database(args.prepare)
+        return 0
+    if args.worker:
+        run_worker(args.worker, args.iterations, args.warmup, args.result_file)
+        return 0
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f'unknown size: {", ".join(unknown)}')
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'iterations': args.iterations,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'sizes': {size: run_size(size, args) for size in sizes},
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_table(results)
+    print(f'\nHasil ditulis ke {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+        regressions = compare(results, baseline, thresholds)
+        if regressions:
+            print('\nRegresi:')
+            for message in regressions:
+                print(f'  {message}')
+            return 1
+        print(f'Tidak ada regresi dibanding {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
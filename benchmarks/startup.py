@@ -0,0 +1,195 @@
+"""Cold start benchmark: how long a new worker process takes to serve.
+
+Every run is a fresh Python process that times, in order, ``import app``,
+``create_app()``, the first request (the login page), a second request
+for comparison, and the first dashboard after logging in.  The parent
+also times the whole process, interpreter start and exit included.  The
+database is a small SQLite file with the sample data, built once with
+the ``seed`` commands.
+
+Results are written as JSON; with ``--baseline`` the run fails when a
+median got slower than the ``startup`` limits of ``thresholds.json``
+allow.
+
+    python benchmarks/startup.py --runs 10 --output after.json \\
+        --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+METRICS = ('import_ms', 'create_app_ms', 'first_request_ms', 'warm_request_ms', 'first_page_ms', 'process_ms')
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thresholds.json')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+# Worker: one cold start, nothing but the standard library imported yet
+
+def prepare_database():
+    from app import create_app
+    from seed import init_sample_data, setup_database
+
+    with create_app().app_context():
+        setup_database()
+        init_sample_data(hash_method='pbkdf2:sha256:1000')
+
+
+def run_worker(result_file):
+    def timed(step):
+        started = time.perf_counter()
+        value = step()
+        return value, round((time.perf_counter() - started) * 1000, 3)
+
+    app_module, import_ms = timed(lambda: __import__('app'))
+    application, create_app_ms = timed(app_module.create_app)
+    client = application.test_client()
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+        return response
+
+    _, first_request_ms = timed(lambda: get('/login'))
+    _, warm_request_ms = timed(lambda: get('/login'))
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    _, first_page_ms = timed(lambda: get('/dashboard'))
+
+    with open(result_file, 'w') as f:
+        json.dump({'import_ms': import_ms, 'create_app_ms': create_app_ms,
+                   'first_request_ms': first_request_ms, 'warm_request_ms': warm_request_ms,
+                   'first_page_ms': first_page_ms}, f)
+
+
+# Parent: prepares the database, starts the workers, compares with a baseline
+
+def database_path(data_dir):
+    import migrations
+    return os.path.join(data_dir, f'startup-schema{migrations.LATEST}.db')
+
+
+def run_once(env):
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_file = f.name
+    try:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', '--result-file', result_file],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        process_ms = round((time.perf_counter() - started) * 1000, 3)
+        with open(result_file) as f:
+            return dict(json.load(f), process_ms=process_ms)
+    finally:
+        os.remove(result_file)
+
+
+def summarize(samples):
+    return {metric: {'p50_ms': percentile([s[metric] for s in samples], 50),
+                     'p90_ms': percentile([s[metric] for s in samples], 90),
+                     'max_ms': max(s[metric] for s in samples)}
+            for metric in METRICS}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, thresholds):
+    """Return a list of regression messages."""
+    limits = thresholds.get('startup', {})
+    regressions = []
+    for metric, after in results['metrics'].items():
+        before = baseline.get('metrics', {}).get(metric)
+        if before is None:
+            continue
+        slower = after['p50_ms'] - before['p50_ms']
+        if (after['p50_ms'] > before['p50_ms'] * limits.get('max_time_ratio', 1.3)
+                and slower > limits.get('min_time_delta_ms', 20)):
+            regressions.append(f'{metric}: p50 {before["p50_ms"]} -> {after["p50_ms"]} ms')
+    return regressions
+
+
+def print_table(results):
+    print(f'\n{results["runs"]} cold start')
+    print(f'  {"metric":<20}{"p50":>10}{"p90":>10}{"max":>10}')
+    for metric, r in results['metrics'].items():
+        print(f'  {metric:<20}{r["p50_ms"]:>10.1f}{r["p90_ms"]:>10.1f}{r["max_ms"]:>10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--output', default='startup-results.json')
+    parser.add_argument('--baseline', help='Results of an earlier run to compare against.')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'lab-scheduling-bench'))
+    parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare_database()
+        return 0
+    if args.worker:
+        run_worker(args.result_file)
+        return 0
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = database_path(args.data_dir)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    if not os.path.exists(path):
+        print(f'membuat database {path}', flush=True)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--prepare'],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+
+    # One run first so every measured run finds the .pyc files and a warm page cache
+    run_once(env)
+    samples = [run_once(env) for _ in range(args.runs)]
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'runs': args.runs,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'metrics': summarize(samples),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_table(results)
+    print(f'\nHasil ditulis ke {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+        regressions = compare(results, baseline, thresholds)
+        if regressions:
+            print('\nRegresi:')
+            for message in regressions:
+                print(f'  {message}')
+            return 1
+        print(f'Tidak ada regresi dibanding {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
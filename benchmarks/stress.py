@@ -0,0 +1,181 @@
+"""Concurrent booking stress test.
+
+Starts ``--workers`` processes, each with its own Flask test client and
+database connections, like the workers of a WSGI server.  In every round
+all of them wait on a barrier and then post ``/schedules/add`` for the same
+day and slot, each with a booking that clashes with all the others on one
+resource:
+
+* ``lab``: same lab, different lecturers and class groups,
+* ``lecturer``: same lecturer, different labs and class groups,
+* ``group``: same class group, different labs and lecturers.  No unique
+  index covers class groups, so only the atomic check prevents this one.
+
+A round passes when exactly one booking was stored and no request failed.
+The script exits with status 1 otherwise.
+
+    python benchmarks/stress.py --workers 8 --rounds 20
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ('lab', 'lecturer', 'group')
+PASSWORD = 'stress123'
+
+
+def contender(scenario, fixture, index):
+    """Form of worker ``index``; shares only the contended resource."""
+    pick = lambda resource: 0 if scenario == resource else index
+    return {
+        'course_id': fixture['practicum'],
+        'lab_id': fixture['labs'][pick('lab')],
+        'lecturer_id': fixture['lecturers'][pick('lecturer')],
+        'class_name': fixture['classes'][pick('group')],
+    }
+
+
+def prepare(workers):
+    """Create the admin and, per scenario, labs, lecturers and class names
+    that nothing else uses.  Returns the fixture ids by scenario."""
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from models import db, Lab, Practicum, User
+    from seed import setup_database
+
+    app = create_app()
+    with app.app_context():
+        setup_database()
+        password = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+        db.session.add(User(username='stress-admin', password=password, role='admin', full_name='Stress'))
+        practicum = Practicum(code='STRESS', practicum_name='Stress', semester=1, sks=1)
+        db.session.add(practicum)
+        fixtures = {}
+        for scenario in SCENARIOS:
+            labs = [Lab(lab_name=f'{scenario}-{index}', capacity=30) for index in range(workers)]
+            lecturers = [User(username=f'{scenario}-{index}', password=password, role='lecturer',
+                              full_name=f'{scenario} {index}') for index in range(workers)]
+            db.session.add_all(labs + lecturers)
+            db.session.flush()
+            fixtures[scenario] = {
+                'practicum': practicum.id,
+                'labs': [lab.id for lab in labs],
+                'lecturers': [lecturer.id for lecturer in lecturers],
+                # Class names are at most 5 characters
+                'classes': [f'{scenario[0].upper()}{index}' for index in range(workers)],
+            }
+        db.session.commit()
+        # Do not hand open connections to the worker processes
+        db.engine.dispose()
+    return fixtures
+
+
+def worker(index, fixtures, rounds, barrier, results):
+    from app import create_app
+
+    client = create_app().test_client()
+    client.post('/login', data={'username': 'stress-admin', 'password': PASSWORD})
+    for scenario in SCENARIOS:
+        form = contender(scenario, fixtures[scenario], index)
+        for number in range(rounds):
+            day, slot = divmod(number, 5)
+            barrier.wait()
+            started = time.perf_counter()
+            response = client.post('/schedules/add', data=dict(form, day=day, slot=slot))
+            elapsed = time.perf_counter() - started
+            if response.status_code != 302:
+                outcome = f'HTTP {response.status_code}'
+            elif response.headers['Location'].endswith('/schedules'):
+                outcome = 'booked'
+            else:
+                outcome = 'refused'
+            results.put((scenario, number, index, outcome, elapsed))
+
+
+def count_bookings(fixtures, rounds):
+    """Bookings stored per (scenario, round)."""
+    from app import create_app
+    from models import db, Schedule
+
+    counts = {}
+    with create_app().app_context():
+        for scenario, fixture in fixtures.items():
+            shared = {'lab': Schedule.lab_id == fixture['labs'][0],
+                      'lecturer': Schedule.lecturer_id == fixture['lecturers'][0],
+                      'group': Schedule.class_name == fixture['classes'][0]}[scenario]
+            for number in range(rounds):
+                day, slot = divmod(number, 5)
+                counts[scenario, number] = db.session.query(Schedule).filter(
+                    shared, Schedule.day == day, Schedule.slot == slot).count()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=10, help='Rounds per scenario, at most 30.')
+    parser.add_argument('--no-production', action='store_true',
+                        help='Run without WAL mode and the production pool settings.')
+    parser.add_argument('--database', help='SQLite file to use (default: a new temporary file).')
+    args = parser.parse_args()
+    if not 1 <= args.rounds <= 30:
+        parser.error('--rounds must be between 1 and 30')
+
+    path = args.database or os.path.join(tempfile.mkdtemp(prefix='lab-scheduling-stress-'), 'stress.db')
+    if os.path.exists(path):
+        parser.error(f'{path} already exists')
+    # Set before the app is imported, here and in the spawned workers
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['PRODUCTION'] = '0' if args.no_production else '1'
+
+    fixtures = prepare(args.workers)
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(index, fixtures, args.rounds, barrier, results))
+                 for index in range(args.workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in range(len(SCENARIOS) * args.rounds * args.workers)]
+    for process in processes:
+        process.join()
+    total = time.perf_counter() - started
+
+    counts = count_bookings(fixtures, args.rounds)
+    failures = []
+    print(f'{args.workers} worker, {args.rounds} ronde per skenario, database {path}')
+    print(f'{"skenario":<10} {"booked":>7} {"refused":>8} {"error":>6} {"p50 ms":>8} {"max ms":>8}')
+    for scenario in SCENARIOS:
+        rows = [outcome for outcome in outcomes if outcome[0] == scenario]
+        times = sorted(row[4] * 1000 for row in rows)
+        tally = {kind: sum(1 for row in rows if row[3] == kind) for kind in ('booked', 'refused')}
+        errors = [row for row in rows if row[3] not in tally]
+        print(f'{scenario:<10} {tally["booked"]:>7} {tally["refused"]:>8} {len(errors):>6} '
+              f'{times[len(times) // 2]:>8.1f} {times[-1]:>8.1f}')
+        for row in errors:
+            failures.append(f'{scenario} ronde {row[1]} worker {row[2]}: {row[3]}')
+        for number in range(args.rounds):
+            winners = sum(1 for row in rows if row[1] == number and row[3] == 'booked')
+            stored = counts[scenario, number]
+            if winners != 1 or stored != 1:
+                failures.append(f'{scenario} ronde {number}: {winners} berhasil, {stored} tersimpan')
+    print(f'Total {total:.1f}s')
+
+    if failures:
+        print('\nGagal:')
+        for message in failures:
+            print(f'  {message}')
+        return 1
+    print('Setiap ronde tepat satu pemesanan berhasil')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
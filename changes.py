@@ -0,0 +1,136 @@
+"""Commit hooks for code that caches data derived from the database.
+
+Every flush and every ORM bulk statement records the names of the tables
+it touched on the session.  When the session commits, the callbacks
+registered with ``on_commit`` receive that set of names; a rollback
+discards it.
+
+Commits touching ``VERSIONED_TABLES`` also write a new data version token
+to a file in the instance folder.  Caches key their entries on
+``data_version()`` so a change made by another worker process invalidates
+them too.  Reading the version costs an ``os.stat``; the file is only read
+again after it was replaced.
+"""
+import os
+import threading
+import time
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_callbacks = []
+
+
+def on_commit(callback):
+    """Register ``callback(tables)``; usable as a decorator."""
+    _callbacks.append(callback)
+    return callback
+
+
+def _touched(session):
+    return session.info.setdefault('touched_tables', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    touched = _touched(session)
+    for instance in chain(session.new, session.dirty, session.deleted):
+        table = getattr(instance, '__table__', None)
+        if table is not None:
+            touched.add(table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _touched(orm_execute_state.session).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify(session):
+    tables = session.info.pop('touched_tables', None)
+    if not tables:
+        return
+    for callback in _callbacks:
+        callback(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('touched_tables', None)
+
+
+VERSIONED_TABLES = {'schedule', 'lab', 'practicum', 'user', 'time_slot', 'term'}
+
+# The rows a schedule page shows next to each schedule: names of labs,
+# practicums and lecturers.  They have a version token of their own, so
+# fragments of single schedules survive commits that only touch schedules.
+REFERENCE_TABLES = VERSIONED_TABLES - {'schedule'}
+
+_version_path = None
+_reference_path = None
+_versions = {}
+
+
+def init_app(app):
+    global _version_path, _reference_path
+    _version_path = (app.config.get('DATA_VERSION_FILE')
+                     or os.path.join(app.instance_path, 'data.version'))
+    _reference_path = os.path.join(os.path.dirname(_version_path), 'reference.version')
+    os.makedirs(os.path.dirname(_version_path), exist_ok=True)
+
+
+def _read(path):
+    if path is None:
+        return '0'
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return '0'
+    # os.replace gives the file a new inode on every bump
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached_signature, token = _versions.get(path, (None, '0'))
+    if signature != cached_signature:
+        with open(path) as f:
+            token = f.read().strip() or '0'
+        _versions[path] = (signature, token)
+    return token
+
+
+def _write(path):
+    token = f'{time.time_ns():x}-{os.getpid():x}-{threading.get_ident():x}'
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as f:
+        f.write(token)
+    os.replace(temporary, path)
+
+
+def data_version():
+    """Return the current data version token, '0' before the first bump."""
+    return _read(_version_path)
+
+
+def reference_version():
+    """Like ``data_version`` for commits touching ``REFERENCE_TABLES``."""
+    return _read(_reference_path)
+
+
+def bump_version():
+    """Write a new version token.  Tokens are unique per process and
+    thread, so two workers bumping at once never write the same one."""
+    _write(_version_path)
+
+
+@on_commit
+def _bump(tables):
+    if _version_path is None:
+        return
+    if tables & VERSIONED_TABLES:
+        bump_version()
+    if tables & REFERENCE_TABLES:
+        _write(_reference_path)
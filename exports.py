@@ -0,0 +1,309 @@
+"""Streaming schedule exports as CSV, XLSX and iCalendar.
+
+Every exporter is a generator of ``bytes`` chunks fed by ``iter_rows``,
+which reads plain column tuples from the database in batches of
+``BATCH_SIZE``.  Nothing holds more than one batch and one output chunk,
+so memory use does not grow with the number of schedules.
+
+The CSV has the columns of ``schedule_import.COLUMNS`` first, so an
+export can be imported again.  The XLSX writer produces a minimal
+SpreadsheetML package straight into a streaming zip file instead of going
+through openpyxl, which would build the sheet in memory or a temporary
+file before the first byte could be sent.  The iCalendar feed expands
+every weekly session into one dated event per week of the term, without
+holidays and cancelled sessions and with make-up sessions.
+"""
+import csv
+import io
+import zipfile
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select
+
+from models import db, Lab, Practicum, Schedule, ScheduleArchive, User
+from occurrences import Exceptions
+from schedule_import import COLUMNS as IMPORT_COLUMNS
+from slots import DAYS, TIME_SLOTS
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+ExportRow = namedtuple('ExportRow', 'id code practicum_name semester class_name lecturer '
+                                    'lecturer_name lab day slot')
+
+HEADER = IMPORT_COLUMNS + ('practicum_name', 'semester', 'lecturer_name')
+
+TIMEZONE = 'Asia/Jakarta'
+CALENDAR_DOMAIN = 'penjadwalan-lab'
+
+
+def iter_rows(conditions):
+    """Yield an ``ExportRow`` for every schedule matching ``conditions``,
+    ordered by day, slot and id."""
+    query = (
+        select(Schedule.id, Practicum.code, Practicum.practicum_name, Practicum.semester,
+               Schedule.class_name, User.username, User.full_name, Lab.lab_name,
+               Schedule.day, Schedule.slot)
+        .join(Practicum, Practicum.id == Schedule.course_id)
+        .join(User, User.id == Schedule.lecturer_id)
+        .join(Lab, Lab.id == Schedule.lab_id)
+        .where(*conditions)
+        .order_by(Schedule.day, Schedule.slot, Schedule.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for row in db.session.execute(query):
+        yield ExportRow(*row)
+
+
+def iter_archive_rows(conditions):
+    """Like ``iter_rows`` for the schedules of an archived term, with
+    ``conditions`` on ``ScheduleArchive``."""
+    query = (
+        select(ScheduleArchive.id, ScheduleArchive.code, ScheduleArchive.practicum_name,
+               ScheduleArchive.semester, ScheduleArchive.class_name, ScheduleArchive.lecturer_username,
+               ScheduleArchive.lecturer_name, ScheduleArchive.lab_name, ScheduleArchive.day,
+               ScheduleArchive.slot)
+        .where(*conditions)
+        .order_by(ScheduleArchive.day, ScheduleArchive.slot, ScheduleArchive.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for row in db.session.execute(query):
+        yield ExportRow(*row)
+
+
+def _buffered(pieces):
+    """Join small ``str`` pieces into ``bytes`` chunks of about CHUNK_SIZE."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+# CSV
+
+def _csv_lines(rows):
+    line = io.StringIO()
+    writer = csv.writer(line)
+
+    def render(values):
+        line.seek(0)
+        line.truncate()
+        writer.writerow(values)
+        return line.getvalue()
+
+    yield '\ufeff' + render(HEADER)
+    for row in rows:
+        yield render((row.code, row.class_name, row.lecturer, row.lab, DAYS[row.day],
+                      TIME_SLOTS[row.slot], row.practicum_name, row.semester, row.lecturer_name))
+
+
+def csv_stream(rows):
+    return _buffered(_csv_lines(rows))
+
+
+# XLSX
+
+class _Sink:
+    """Write-only file object for zipfile; ``drain`` hands out what was
+    written so far."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Jadwal" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, int):
+        return f'<c t="n"><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _sheet_pieces(rows):
+    yield ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+           '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    yield '<row>' + ''.join(_xlsx_cell(name) for name in HEADER) + '</row>'
+    for row in rows:
+        yield '<row>' + ''.join(_xlsx_cell(value) for value in (
+            row.code, row.class_name, row.lecturer, row.lab, DAYS[row.day], TIME_SLOTS[row.slot],
+            row.practicum_name, row.semester, row.lecturer_name)) + '</row>'
+    yield '</sheetData></worksheet>'
+
+
+def xlsx_stream(rows):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as package:
+        for name, content in XLSX_PARTS.items():
+            package.writestr(name, content)
+        yield sink.drain()
+        with package.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            for chunk in _buffered(_sheet_pieces(rows)):
+                sheet.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
+
+
+# iCalendar
+
+def _ics_text(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _ics_line(line):
+    """Fold a content line at 75 octets as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    # Continuation lines start with a space, so they carry one octet less
+    while len(encoded) > (74 if parts else 75):
+        cut = 74 if parts else 75
+        # Do not split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _ics_times(slot):
+    return tuple(value.replace(':', '') + '00' for value in TIME_SLOTS[slot].split('-'))
+
+
+def _ics_details(row, lab, summary_suffix=''):
+    return ''.join(_ics_line(line) for line in (
+        f'SUMMARY:{_ics_text(f"{row.practicum_name} ({row.semester}{row.class_name}){summary_suffix}")}',
+        f'LOCATION:{_ics_text(lab)}',
+        f'DESCRIPTION:{_ics_text(f"{row.code} - Dosen: {row.lecturer_name}")}',
+        'END:VEVENT',
+    ))
+
+
+def _ics_lines(rows, term_start, weeks, name, exceptions):
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    # Weeks start on the Monday of the week term_start falls in
+    monday = term_start - timedelta(days=term_start.weekday())
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//{CALENDAR_DOMAIN}//Jadwal Praktikum//ID',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_ics_text(name)}',
+        f'X-WR-TIMEZONE:{TIMEZONE}',
+        'BEGIN:VTIMEZONE',
+        f'TZID:{TIMEZONE}',
+        'BEGIN:STANDARD',
+        'DTSTART:19700101T000000',
+        'TZOFFSETFROM:+0700',
+        'TZOFFSETTO:+0700',
+        'TZNAME:WIB',
+        'END:STANDARD',
+        'END:VTIMEZONE',
+    ]
+    for line in header:
+        yield _ics_line(line)
+
+    if exceptions is None:
+        exceptions = Exceptions()
+    cancelled = exceptions.cancelled
+    weekly = [[monday + timedelta(days=7 * week + day) for week in range(weeks)] for day in range(len(DAYS))]
+    dates = [[(value, value.strftime('%Y%m%d')) for value in values
+              if value >= term_start and value not in exceptions.holidays]
+             for values in weekly]
+    for row in rows:
+        start_time, end_time = _ics_times(row.slot)
+        # Only the date changes between the weekly events of a session
+        details = _ics_details(row, row.lab)
+        for value, day in dates[row.day]:
+            if cancelled and (row.id, value) in cancelled:
+                continue
+            yield (f'BEGIN:VEVENT\r\n'
+                   f'UID:{row.id}-{day}@{CALENDAR_DOMAIN}\r\n'
+                   f'DTSTAMP:{stamp}\r\n'
+                   f'DTSTART;TZID={TIMEZONE}:{day}T{start_time}\r\n'
+                   f'DTEND;TZID={TIMEZONE}:{day}T{end_time}\r\n'
+                   f'{details}')
+        for makeup in exceptions.makeups.get(row.id, ()):
+            day = makeup.date.strftime('%Y%m%d')
+            makeup_start, makeup_end = _ics_times(makeup.slot)
+            yield (f'BEGIN:VEVENT\r\n'
+                   f'UID:{row.id}-{day}-{makeup.id}@{CALENDAR_DOMAIN}\r\n'
+                   f'DTSTAMP:{stamp}\r\n'
+                   f'DTSTART;TZID={TIMEZONE}:{day}T{makeup_start}\r\n'
+                   f'DTEND;TZID={TIMEZONE}:{day}T{makeup_end}\r\n'
+                   f'{_ics_details(row, makeup.lab, " - pengganti")}')
+    yield _ics_line('END:VCALENDAR')
+
+
+def ics_stream(rows, term_start, weeks, name='Jadwal Praktikum', exceptions=None):
+    """Stream an iCalendar file with one event per session and week of the
+    term that starts on ``term_start`` and lasts ``weeks`` weeks.  With
+    ``Exceptions``, holidays and cancelled sessions are left out
+    and make-up sessions added."""
+    return _buffered(_ics_lines(rows, term_start, weeks, name, exceptions))
+
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', csv_stream),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', xlsx_stream),
+}
@@ -0,0 +1,98 @@
+"""Weekly timetable grid: days as rows and one block of slot columns per lab.
+
+``timetable_grid`` fills a dense day x (lab, slot) matrix from a single
+query that outer joins the labs with their filtered schedules, with the
+practicum and the lecturer eager loaded.  Cells hold plain ``GridCell``
+tuples rather than ORM instances, so a grid can be kept in the memo and
+shared between requests.  Entries are keyed on ``changes.data_version()``
+and therefore never outlive a schedule change.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import joinedload
+
+from changes import data_version
+from models import db, Lab, Schedule
+from slots import DAYS, TIME_SLOTS
+
+GridCell = namedtuple('GridCell', 'schedule_id code practicum_name group lecturer_name')
+GridLab = namedtuple('GridLab', 'id lab_name capacity')
+
+MAX_ENTRIES = 32
+
+_lock = threading.Lock()
+_grids = OrderedDict()
+
+
+class TimetableGrid:
+    """``rows[day]`` is a flat list with one entry per (lab, slot), lab-major
+    in the order of ``labs``; free cells are None."""
+
+    def __init__(self, labs, rows, sessions):
+        self.labs = labs
+        self.rows = rows
+        self.sessions = sessions
+
+    def cell(self, day, lab_position, slot):
+        return self.rows[day][lab_position * len(TIME_SLOTS) + slot]
+
+
+def _build(conditions, include_empty_labs):
+    query = (
+        select(Lab, Schedule)
+        .outerjoin(Schedule, and_(Schedule.lab_id == Lab.id, *conditions))
+        .options(joinedload(Schedule.practicum), joinedload(Schedule.lecturer))
+        .order_by(Lab.lab_name, Lab.id)
+    )
+    if not include_empty_labs:
+        query = query.where(Schedule.id.is_not(None))
+
+    width = len(TIME_SLOTS)
+    labs = []
+    positions = {}
+    placed = []
+    for lab, schedule in db.session.execute(query):
+        position = positions.get(lab.id)
+        if position is None:
+            position = positions[lab.id] = len(labs)
+            labs.append(GridLab(lab.id, lab.lab_name, lab.capacity))
+        if schedule is None:
+            continue
+        practicum = schedule.practicum
+        placed.append((schedule.day, position * width + schedule.slot, GridCell(
+            schedule.id,
+            practicum.code if practicum else '-',
+            practicum.practicum_name if practicum else '-',
+            f'{practicum.semester if practicum else ""}{schedule.class_name}',
+            schedule.lecturer.full_name if schedule.lecturer else '-',
+        )))
+
+    rows = [[None] * (len(labs) * width) for _ in DAYS]
+    for day, index, cell in placed:
+        rows[day][index] = cell
+    return TimetableGrid(labs, rows, len(placed))
+
+
+def timetable_grid(key, conditions, include_empty_labs=True):
+    """Return the grid of the schedules matching ``conditions``.
+
+    ``key`` must identify ``conditions`` (role scope and filter values).
+    Labs without a matching schedule are kept only when
+    ``include_empty_labs`` is set.
+    """
+    key = (data_version(), key, include_empty_labs)
+    with _lock:
+        grid = _grids.get(key)
+        if grid is not None:
+            _grids.move_to_end(key)
+            return grid
+
+    grid = _build(conditions, include_empty_labs)
+
+    with _lock:
+        _grids[key] = grid
+        while len(_grids) > MAX_ENTRIES:
+            _grids.popitem(last=False)
+    return grid
@@ -0,0 +1,233 @@
+"""Opt-in request and SQL instrumentation.
+
+Enabled with ``INSTRUMENTATION = True`` in the app config (environment
+variable ``INSTRUMENTATION=1``).  When it is on, every request records:
+
+* the number of SQL statements and the time spent executing them,
+* the time spent rendering templates,
+* named spans such as password hashing (``with span('hash'): ...``) and
+  the wait for the SQLite write lock (``lock``),
+* the total time,
+
+and returns them in a ``Server-Timing`` header.  A streamed response
+renders its templates while the body is sent, after the headers, so it
+gets no header; its histograms are recorded once the body was sent.
+Statements slower than
+``SLOW_QUERY_MS`` are logged with their parameters.  Per-endpoint
+histograms are kept in memory and rendered in the Prometheus text format
+by ``render_metrics``.
+
+When it is off no event listener or request hook is registered at all and
+``span`` returns immediately, so the cost is one flag check per span.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, as in the default Prometheus client buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+MAX_LOGGED_PARAMETERS = 500
+
+_enabled = False
+_slow_query_seconds = 0.2
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _observe(name, endpoint, value):
+    with _lock:
+        histogram = _histograms.get((name, endpoint))
+        if histogram is None:
+            histogram = _histograms[(name, endpoint)] = Histogram()
+        histogram.observe(value)
+
+
+def _increment(name, endpoint, amount=1):
+    with _lock:
+        _counters[(name, endpoint)] = _counters.get((name, endpoint), 0) + amount
+
+
+def _timings():
+    """Per-request accumulators, or None outside a request."""
+    if not has_request_context():
+        return None
+    timings = g.get('_timings')
+    if timings is None:
+        timings = g._timings = {'queries': 0, 'db': 0.0, 'render': 0.0, 'spans': {}}
+    return timings
+
+
+@contextmanager
+def span(name):
+    """Time a block of code as ``name`` in the Server-Timing header."""
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings()
+        if timings is not None:
+            spans = timings['spans']
+            spans[name] = spans.get(name, 0.0) + time.perf_counter() - started
+
+
+def count(name, amount=1):
+    """Add ``amount`` to the counter ``name`` of the current endpoint."""
+    if _enabled:
+        _increment(name, request.endpoint if has_request_context() else None, amount)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    timings = _timings()
+    if timings is not None:
+        timings['queries'] += 1
+        timings['db'] += elapsed
+    if elapsed >= _slow_query_seconds:
+        endpoint = request.endpoint if has_request_context() else None
+        _increment('slow_queries', endpoint)
+        logger.warning('Slow query (%.1f ms, endpoint %s): %s; parameters: %.*r',
+                       elapsed * 1000, endpoint, statement, MAX_LOGGED_PARAMETERS, parameters)
+
+
+def _before_render(sender, template, context, **extra):
+    g._render_start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = g.pop('_render_start', None)
+    timings = _timings()
+    if started is not None and timings is not None:
+        timings['render'] += time.perf_counter() - started
+
+
+def _start_request():
+    g._request_start = time.perf_counter()
+
+
+def _record(endpoint, timings, started):
+    total = time.perf_counter() - started
+    _observe('request', endpoint, total)
+    _observe('db', endpoint, timings['db'])
+    _observe('render', endpoint, timings['render'])
+    _increment('queries', endpoint, timings['queries'])
+    return total
+
+
+def _finish_request(response):
+    started = g.get('_request_start')
+    if started is None:
+        return response
+    timings = _timings()
+    endpoint = request.endpoint or 'unknown'
+    if response.is_streamed:
+        # The queries and templates of the body still add to ``timings``
+        response.call_on_close(lambda: _record(endpoint, timings, started))
+        return response
+    total = _record(endpoint, timings, started)
+
+    metrics = [f'db;dur={timings["db"] * 1000:.1f};desc="{timings["queries"]} queries"',
+               f'render;dur={timings["render"] * 1000:.1f}']
+    metrics.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings['spans'].items())
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    response.headers.add('Server-Timing', ', '.join(metrics))
+    return response
+
+
+def init_app(app):
+    """Register the hooks when ``INSTRUMENTATION`` is set in ``app.config``."""
+    global _enabled, _slow_query_seconds
+    if not app.config.get('INSTRUMENTATION'):
+        return
+    _enabled = True
+    _slow_query_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def enabled():
+    return _enabled
+
+
+def _format_labels(endpoint, **extra):
+    labels = {'endpoint': endpoint or 'none', **extra}
+    return ','.join(f'{key}="{value}"' for key, value in labels.items())
+
+
+HISTOGRAM_HELP = {
+    'request': 'Total request time',
+    'db': 'Time spent executing SQL statements per request',
+    'render': 'Time spent rendering templates per request',
+}
+COUNTER_HELP = {
+    'queries': 'SQL statements executed',
+    'slow_queries': 'SQL statements slower than SLOW_QUERY_MS',
+    'lock_retries': 'Write transactions tried again because the database was locked',
+}
+
+
+def render_metrics():
+    """Return the collected metrics in the Prometheus text format."""
+    with _lock:
+        histograms = {key: (list(h.buckets), h.sum, h.count) for key, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name, help_text in HISTOGRAM_HELP.items():
+        metric = f'lab_{name}_duration_seconds'
+        lines.append(f'# HELP {metric} {help_text}.')
+        lines.append(f'# TYPE {metric} histogram')
+        for (kind, endpoint), (buckets, total, count) in sorted(histograms.items()):
+            if kind != name:
+                continue
+            cumulative = 0
+            for bound, hits in zip(BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'{metric}_bucket{{{_format_labels(endpoint, le=bound)}}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{_format_labels(endpoint, le="+Inf")}}} {count}')
+            lines.append(f'{metric}_sum{{{_format_labels(endpoint)}}} {total:.6f}')
+            lines.append(f'{metric}_count{{{_format_labels(endpoint)}}} {count}')
+    for name, help_text in COUNTER_HELP.items():
+        metric = f'lab_{name}_total'
+        lines.append(f'# HELP {metric} {help_text}.')
+        lines.append(f'# TYPE {metric} counter')
+        for (kind, endpoint), value in sorted(counters.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            if kind == name:
+                lines.append(f'{metric}{{{_format_labels(endpoint)}}} {value}')
+    return '\n'.join(lines) + '\n'
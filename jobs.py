@@ -0,0 +1,367 @@
+"""Background jobs for work too slow to do inside a request.
+
+A job is a row of the ``job`` table plus a call of a function registered
+with ``task``.  ``submit`` stores the row and hands its id to a small
+thread pool, so the request returns at once.  The job then runs in its own
+app context with its own database session.  Status, parameters and results
+are kept in the table and survive a restart.  ``recover`` runs once per
+process: it queues again the jobs that were still waiting and marks as
+failed the jobs whose process is gone.
+
+Progress and cancel requests go through small files in the jobs folder
+instead of the table.  An import holds the SQLite write lock until it
+commits, so the job could not write progress rows of its own, and a cancel
+request would have to wait for that lock.  Every worker process can read
+the files, the same way ``changes`` shares the data version.
+"""
+import inspect
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import abort, send_file
+from sqlalchemy import delete, select, update
+
+from models import db, Job
+from transactions import write_transaction
+
+FINISHED = ('done', 'failed', 'cancelled')
+PROGRESS_INTERVAL = 0.5
+
+UPLOAD_NAME = re.compile(r'upload-[0-9a-f]{32}\.[a-z0-9]{1,5}')
+
+Task = namedtuple('Task', 'name function roles title')
+
+TASKS = {}
+
+_app = None
+_directory = None
+_executor = None
+_lock = threading.Lock()
+_recovered = False
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``JobContext.check`` after a cancel request."""
+
+
+def task(name, title, roles=('admin', 'staff')):
+    """Register ``function(context, **params)`` as the task ``name`` that
+    ``roles`` may submit; usable as a decorator."""
+    def register(function):
+        TASKS[name] = Task(name, function, roles, title)
+        return function
+    return register
+
+
+def init_app(app):
+    global _app, _directory
+    _app = app
+    _directory = app.config.get('JOB_DIRECTORY') or os.path.join(app.instance_path, 'jobs')
+    os.makedirs(_directory, exist_ok=True)
+    app.before_request(_recover_once)
+
+
+def path(name):
+    return os.path.join(_directory, name)
+
+
+def _progress_path(job_id):
+    return path(f'{job_id}.progress')
+
+
+def _cancel_path(job_id):
+    return path(f'{job_id}.cancel')
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_app.config.get('JOB_WORKERS', 2),
+                                           thread_name_prefix='job')
+        return _executor
+
+
+class JobContext:
+    """Handed to a task: reports progress and notices cancel requests.
+
+    Progress is written at most every ``PROGRESS_INTERVAL`` seconds, and
+    the cancel file is looked for at the same moments.  ``user_id`` is
+    whoever submitted the job; tasks act with their rights.
+    """
+
+    def __init__(self, job_id, user_id):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.result_file = None
+        self._written = 0.0
+
+    def progress(self, done, total=None, message=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message[:200]
+        now = time.monotonic()
+        if now - self._written >= PROGRESS_INTERVAL:
+            self._written = now
+            _write_json(_progress_path(self.job_id), self.state())
+            self.check()
+
+    def track(self, items, message, total=None):
+        """Yield ``items`` and report how many went through."""
+        count = 0
+        for count, item in enumerate(items, start=1):
+            self.progress(count, total, f'{count} {message}')
+            yield item
+        self.progress(count, total, f'{count} {message}')
+
+    def check(self):
+        if os.path.exists(_cancel_path(self.job_id)):
+            raise JobCancelled()
+
+    def state(self):
+        return {'done': self.done, 'total': self.total, 'message': self.message}
+
+    def result_path(self, extension):
+        """Path of the result file of the job, which the job writes."""
+        self.result_file = f'{self.job_id}-{uuid.uuid4().hex[:8]}.{extension}'
+        return path(self.result_file)
+
+
+def _write_json(target, data):
+    # Replaced in one step, so readers never see half a file
+    temporary = f'{target}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(temporary, target)
+
+
+def save_upload(upload):
+    """Keep an uploaded file for a job; returns the name to pass to the
+    task, which finds it again with ``upload_path``."""
+    name = f'upload-{uuid.uuid4().hex}{os.path.splitext(upload.filename)[1].lower()}'
+    upload.save(path(name))
+    return name
+
+
+def upload_path(name):
+    # Parameters may come from the API; never let them name another file
+    if not UPLOAD_NAME.fullmatch(name or ''):
+        raise ValueError('File upload tidak valid')
+    return path(name)
+
+
+def check_params(name, params):
+    """Raise ValueError when the task ``name`` does not exist or does not
+    take ``params``."""
+    if name not in TASKS:
+        raise ValueError(f"Jenis pekerjaan '{name}' tidak dikenal")
+    try:
+        inspect.signature(TASKS[name].function).bind(None, **params)
+    except TypeError as e:
+        raise ValueError(f'Parameter tidak valid: {e}')
+
+
+def submit(name, params, user_id, upload=None):
+    """Queue the task ``name`` with the JSON-serialisable ``params``;
+    returns the new job.  ``upload`` is the name from ``save_upload`` of a
+    file the job reads; it is deleted once the job has finished or is
+    cancelled."""
+    check_params(name, params)
+    job = Job(kind=name, params=params, created_by=user_id, status='queued', upload_file=upload)
+    db.session.add(job)
+    db.session.commit()
+    _pool().submit(_run, job.id)
+    return job
+
+
+def _claim(job_id):
+    # Only one thread of one process gets the job, and not after a cancel
+    claimed = db.session.execute(
+        update(Job).where(Job.id == job_id, Job.status == 'queued')
+        .values(status='running', started_at=datetime.utcnow(), worker_pid=os.getpid())
+    ).rowcount
+    return claimed == 1
+
+
+def _remove_files(*names):
+    for name in names:
+        if name and os.path.exists(path(name)):
+            os.remove(path(name))
+
+
+def _finish(job_id, context, status, result=None, error=None):
+    def write():
+        job = db.session.get(Job, job_id)
+        job.upload_file, upload = None, job.upload_file
+        job.status = status
+        job.result = result
+        job.error = error
+        job.result_file = context.result_file
+        job.progress = context.done
+        job.total = context.total
+        job.message = 'Dibatalkan' if status == 'cancelled' else context.message
+        job.finished_at = datetime.utcnow()
+        return upload
+    upload = write_transaction(write)
+    for leftover in (_progress_path(job_id), _cancel_path(job_id)):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    _remove_files(upload)
+    if status != 'done':
+        _remove_files(context.result_file)
+
+
+def _run(job_id):
+    with _app.app_context():
+        if not write_transaction(lambda: _claim(job_id)):
+            return
+        job = db.session.get(Job, job_id)
+        kind, params = job.kind, dict(job.params)
+        context = JobContext(job_id, job.created_by)
+        db.session.rollback()
+        try:
+            result = TASKS[kind].function(context, **params)
+        except JobCancelled:
+            db.session.rollback()
+            _finish(job_id, context, 'cancelled')
+        except Exception as e:
+            db.session.rollback()
+            _app.logger.exception('job %s (%s) failed', job_id, kind)
+            _finish(job_id, context, 'failed', error=str(e) or type(e).__name__)
+        else:
+            _finish(job_id, context, 'done', result=result)
+
+
+def cancel(job):
+    """Cancel ``job``: a queued job at once, a running one at its next
+    progress report.  Returns False when it had already finished."""
+    if job.status == 'queued':
+        upload = job.upload_file
+        cancelled = write_transaction(lambda: db.session.execute(
+            update(Job).where(Job.id == job.id, Job.status == 'queued')
+            .values(status='cancelled', message='Dibatalkan', finished_at=datetime.utcnow(), upload_file=None)
+        ).rowcount)
+        if cancelled:
+            # The task never runs, so nobody else reads the upload
+            _remove_files(upload)
+            return True
+        db.session.refresh(job)
+    if job.status == 'running':
+        open(_cancel_path(job.id), 'w').close()
+        return True
+    return False
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover():
+    """Fail the running jobs whose process has died and queue the waiting
+    ones again.  Other processes may do the same; ``_claim`` makes sure
+    a job runs once."""
+    stale = [job.id for job in db.session.scalars(select(Job).where(Job.status == 'running'))
+             if job.worker_pid is None or not _alive(job.worker_pid)]
+    if stale:
+        write_transaction(lambda: db.session.execute(
+            update(Job).where(Job.id.in_(stale), Job.status == 'running')
+            .values(status='failed', error='Server dimulai ulang saat pekerjaan berjalan',
+                    finished_at=datetime.utcnow())
+        ))
+    for job_id in db.session.scalars(select(Job.id).where(Job.status == 'queued').order_by(Job.id)):
+        _pool().submit(_run, job_id)
+
+
+def _recover_once():
+    global _recovered
+    if _recovered:
+        return
+    with _lock:
+        if _recovered:
+            return
+        _recovered = True
+    recover()
+
+
+def live_progress(job):
+    """``(done, total, message)`` of ``job``, fresh from the progress file
+    while it runs."""
+    if job.status == 'running':
+        try:
+            with open(_progress_path(job.id)) as handle:
+                state = json.load(handle)
+            return state['done'], state['total'], state['message']
+        except (OSError, ValueError, KeyError):
+            pass
+    return job.progress, job.total, job.message
+
+
+def send_result(job):
+    """Download response for the result file of ``job``."""
+    if job.status != 'done' or not job.result_file or not os.path.exists(path(job.result_file)):
+        abort(404)
+    result = job.result or {}
+    return send_file(path(job.result_file), mimetype=result.get('mimetype'), as_attachment=True,
+                     download_name=result.get('filename', job.result_file))
+
+
+def visible(job, user):
+    return job is not None and (user.role == 'admin' or job.created_by == user.id)
+
+
+def describe(job):
+    """JSON-ready state of ``job``."""
+    done, total, message = live_progress(job)
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'title': TASKS[job.kind].title if job.kind in TASKS else job.kind,
+        'status': job.status,
+        'finished': job.status in FINISHED,
+        'progress': done,
+        'total': total,
+        'percent': round(100 * done / total) if total else None,
+        'message': message,
+        'result': job.result,
+        'error': job.error,
+        'has_file': bool(job.result_file),
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def recent(user, limit=50):
+    query = select(Job).order_by(Job.id.desc()).limit(limit)
+    if user.role != 'admin':
+        query = query.where(Job.created_by == user.id)
+    return db.session.scalars(query).all()
+
+
+def prune(before):
+    """Delete finished jobs created before ``before`` and their files;
+    returns how many were deleted."""
+    old = db.session.scalars(select(Job).where(Job.status.in_(FINISHED), Job.created_at < before)).all()
+    for job in old:
+        _remove_files(job.result_file, job.upload_file)
+    db.session.execute(delete(Job).where(Job.id.in_([job.id for job in old])))
+    db.session.commit()
+    return len(old)
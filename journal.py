@@ -0,0 +1,173 @@
+"""Reading the schedule change journal and waiting for new entries.
+
+``schedule_change`` is filled by triggers (see ``migrations``), so its ids
+grow in commit order: SQLite lets one writer at a time hold the database,
+and a writer's rows only become visible when it commits.  A client that
+has seen every change up to id ``n`` therefore only needs ``id > n``.
+
+``wait_for_change`` lets a live feed sleep without touching the database.
+Commits in this process wake it at once through ``changes.on_commit``;
+commits of other worker processes are noticed by polling
+``changes.data_version()``, which costs an ``os.stat``, every
+``POLL_INTERVAL`` seconds.
+"""
+import json
+import threading
+import time
+
+from sqlalchemy import delete, func, or_, select
+
+from changes import data_version, on_commit
+from models import db, ScheduleChange
+
+POLL_INTERVAL = 1.0
+HEARTBEAT = 15
+RETRY_MS = 5000
+MAX_CHANGES = 1000
+
+_condition = threading.Condition()
+
+
+@on_commit
+def _wake(tables):
+    if 'schedule' in tables:
+        with _condition:
+            _condition.notify_all()
+
+
+def latest_version():
+    return db.session.scalar(select(func.max(ScheduleChange.id))) or 0
+
+
+def row_versions(schedule_ids):
+    """Map schedule ids to the id of their latest journal row, the version
+    the schedule last changed at.  Schedules whose rows were all pruned
+    are left out."""
+    if not schedule_ids:
+        return {}
+    return dict(db.session.execute(
+        select(ScheduleChange.schedule_id, func.max(ScheduleChange.id))
+        .where(ScheduleChange.schedule_id.in_(list(schedule_ids)))
+        .group_by(ScheduleChange.schedule_id)
+    ).all())
+
+
+def is_pruned(version):
+    """Whether changes after ``version`` were already pruned, so a client
+    at that version has to load everything again."""
+    oldest = db.session.scalar(select(func.min(ScheduleChange.id)))
+    return oldest is not None and version < oldest - 1
+
+
+def change_conditions(user, lab_id=None):
+    """Limit the journal to what ``user`` may see, and to one lab."""
+    conditions = []
+    if user.role == 'lecturer':
+        conditions.append(or_(ScheduleChange.lecturer_id == user.id,
+                              ScheduleChange.old_lecturer_id == user.id))
+    if lab_id:
+        conditions.append(or_(ScheduleChange.lab_id == lab_id, ScheduleChange.old_lab_id == lab_id))
+    return conditions
+
+
+def _serialize(change):
+    schedule = None
+    if change.op != 'delete':
+        schedule = {
+            'id': change.schedule_id,
+            'term_id': change.term_id,
+            'course_id': change.course_id,
+            'lecturer_id': change.lecturer_id,
+            'lab_id': change.lab_id,
+            'day': change.day,
+            'slot': change.slot,
+            'class_name': change.class_name,
+        }
+    return {
+        'version': change.id,
+        'op': change.op,
+        'schedule_id': change.schedule_id,
+        'schedule': schedule,
+        'changed_at': change.changed_at.isoformat(),
+    }
+
+
+def changes_since(version, conditions, limit=MAX_CHANGES):
+    """Return ``(changes, version, more)`` for the journal after ``version``.
+
+    The returned version is the one to ask from next time.  It moves past
+    rows hidden by ``conditions`` as well, so a filtered client does not
+    scan them again.
+    """
+    latest = latest_version()
+    rows = db.session.scalars(
+        select(ScheduleChange)
+        .where(ScheduleChange.id > version, ScheduleChange.id <= latest, *conditions)
+        .order_by(ScheduleChange.id)
+        .limit(limit + 1)
+    ).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if more:
+        latest = rows[-1].id
+    return [_serialize(row) for row in rows], max(latest, version), more
+
+
+def prune(before):
+    """Delete journal rows older than ``before``; the newest row is kept so
+    versions keep counting from it.  Returns the number of rows deleted."""
+    newest = latest_version()
+    result = db.session.execute(
+        delete(ScheduleChange).where(ScheduleChange.changed_at < before, ScheduleChange.id < newest)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def wait_for_change(token, timeout):
+    """Block until ``data_version()`` is no longer ``token`` or ``timeout``
+    seconds passed, and return the current token."""
+    deadline = time.monotonic() + timeout
+    while True:
+        current = data_version()
+        remaining = deadline - time.monotonic()
+        if current != token or remaining <= 0:
+            return current
+        with _condition:
+            _condition.wait(min(POLL_INTERVAL, remaining))
+
+
+def _event(name, data, event_id=None):
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+def event_stream(conditions, since=None):
+    """Yield Server-Sent Events for the journal after ``since``, forever.
+
+    Without ``since`` only new changes are sent.  A client that is too far
+    behind gets a ``reset`` event and must load the schedules again.
+    Between changes a comment line is sent every ``HEARTBEAT`` seconds so
+    proxies keep the connection open and dead clients are noticed.
+    """
+    yield f'retry: {RETRY_MS}\n\n'
+    token = data_version()
+    if since is None:
+        since = latest_version()
+    elif is_pruned(since):
+        since = latest_version()
+        yield _event('reset', {'version': since})
+    version = since
+
+    while True:
+        changes, version, more = changes_since(version, conditions)
+        # Do not keep a read transaction open while the client idles
+        db.session.close()
+        for change in changes:
+            yield _event('change', change, change['version'])
+        if more:
+            continue
+        current = wait_for_change(token, HEARTBEAT)
+        if current == token:
+            yield ': ping\n\n'
+        token = current
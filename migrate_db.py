@@ -1,28 +1,26 @@
-import sqlite3
+import argparse
 import os
+import sys
 
-db_path = r'c:\Users\pol\Documents\GitHub\penjadwalan2\instance\database.db'
+import migrations
 
-if not os.path.exists(db_path):
-    print(f"Database not found at {db_path}")
-    exit(1)
+default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'database.db')
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
+parser = argparse.ArgumentParser(description='Upgrade a database file to the latest schema version.')
+parser.add_argument('path', nargs='?', default=default_path, help='SQLite database file')
+args = parser.parse_args()
+
+if not os.path.exists(args.path):
+    print(f"Database not found at {args.path}")
+    sys.exit(1)
 
 try:
-    # 1. Rename table course to practicum
-    print("Renaming table 'course' to 'practicum'...")
-    cursor.execute("ALTER TABLE course RENAME TO practicum;")
-    
-    # 2. Rename column course_name to practicum_name
-    print("Renaming column 'course_name' to 'practicum_name'...")
-    cursor.execute("ALTER TABLE practicum RENAME COLUMN course_name TO practicum_name;")
-    
-    conn.commit()
-    print("Migration successful!")
-except sqlite3.Error as e:
+    applied = migrations.upgrade(args.path)
+except Exception as e:
     print(f"An error occurred: {e}")
-    conn.rollback()
-finally:
-    conn.close()
+    sys.exit(1)
+
+if applied:
+    print("Migration successful!")
+else:
+    print(f"Database already at version {migrations.LATEST}")
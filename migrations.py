@@ -0,0 +1,479 @@
+"""Schema migrations for existing SQLite databases.
+
+The schema version is stored in ``PRAGMA user_version``.  ``upgrade`` runs
+every migration above the stored version in order, each one in its own
+transaction, so running it again is a no-op.  A database that has none of
+the application tables yet is stamped with the latest version right away,
+because ``db.create_all()`` builds the current schema for it.
+"""
+import sqlite3
+from datetime import date
+
+from slots import DAYS, TIME_SLOTS
+
+APP_TABLES = {'user', 'lab', 'course', 'practicum', 'schedule', 'term'}
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def rename_course_to_practicum(conn, log):
+    """Rename table course to practicum and course_name to practicum_name."""
+    tables = _tables(conn)
+    if 'course' in tables and 'practicum' not in tables:
+        conn.execute('ALTER TABLE course RENAME TO practicum')
+    if 'course_name' in _columns(conn, 'practicum'):
+        conn.execute('ALTER TABLE practicum RENAME COLUMN course_name TO practicum_name')
+
+
+def normalize_day_slot(conn, log):
+    """Store schedule day and time slot as integers with unique indexes.
+
+    Rows whose day or time slot is not recognised, and rows that double
+    book a lab or a lecturer (the later row by id loses), cannot satisfy
+    the new constraints.  They are moved to ``schedule_quarantine`` instead
+    of being dropped so staff can re-enter them.
+    """
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS time_slot ('
+        ' id SMALLINT NOT NULL PRIMARY KEY,'
+        ' label VARCHAR(20) NOT NULL UNIQUE,'
+        ' start_time VARCHAR(5) NOT NULL,'
+        ' end_time VARCHAR(5) NOT NULL)'
+    )
+    conn.executemany(
+        'INSERT OR IGNORE INTO time_slot (id, label, start_time, end_time) VALUES (?, ?, ?, ?)',
+        [(index, label, *label.split('-')) for index, label in enumerate(TIME_SLOTS)]
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_practicum_semester ON practicum (semester)')
+
+    if 'slot' in _columns(conn, 'schedule'):
+        return
+
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS schedule_quarantine ('
+        ' id INTEGER NOT NULL PRIMARY KEY,'
+        ' course_id INTEGER, lecturer_id INTEGER, lab_id INTEGER,'
+        ' day VARCHAR(10), time_slot VARCHAR(20), class_name VARCHAR(5),'
+        ' created_at DATETIME, reason VARCHAR(20) NOT NULL)'
+    )
+
+    day_of = {name: index for index, name in enumerate(DAYS)}
+    slot_of = {label: index for index, label in enumerate(TIME_SLOTS)}
+    taken = set()
+    rejected = []
+    for schedule_id, lab_id, lecturer_id, day, time_slot in conn.execute(
+            'SELECT id, lab_id, lecturer_id, day, time_slot FROM schedule ORDER BY id'):
+        if day not in day_of or time_slot not in slot_of:
+            rejected.append((schedule_id, 'invalid'))
+            continue
+        cell = (day_of[day], slot_of[time_slot])
+        if ('lab', lab_id) + cell in taken:
+            rejected.append((schedule_id, 'lab'))
+            continue
+        if ('lecturer', lecturer_id) + cell in taken:
+            rejected.append((schedule_id, 'lecturer'))
+            continue
+        taken.add(('lab', lab_id) + cell)
+        taken.add(('lecturer', lecturer_id) + cell)
+
+    conn.executemany(
+        'INSERT INTO schedule_quarantine'
+        ' SELECT id, course_id, lecturer_id, lab_id, day, time_slot, class_name, created_at, ?'
+        ' FROM schedule WHERE id = ?',
+        [(reason, schedule_id) for schedule_id, reason in rejected]
+    )
+    conn.executemany('DELETE FROM schedule WHERE id = ?', [(schedule_id,) for schedule_id, _ in rejected])
+    for schedule_id, reason in rejected:
+        log(f'  jadwal #{schedule_id} dipindahkan ke schedule_quarantine ({reason})')
+
+    conn.execute(
+        'CREATE TABLE schedule_new ('
+        ' id INTEGER NOT NULL,'
+        ' course_id INTEGER NOT NULL,'
+        ' lecturer_id INTEGER NOT NULL,'
+        ' lab_id INTEGER NOT NULL,'
+        ' day SMALLINT NOT NULL,'
+        ' slot SMALLINT NOT NULL,'
+        ' class_name VARCHAR(5) NOT NULL,'
+        ' created_at DATETIME,'
+        ' PRIMARY KEY (id),'
+        f' CONSTRAINT ck_schedule_day CHECK (day >= 0 AND day < {len(DAYS)}),'
+        ' FOREIGN KEY(course_id) REFERENCES practicum (id),'
+        ' FOREIGN KEY(lecturer_id) REFERENCES user (id),'
+        ' FOREIGN KEY(lab_id) REFERENCES lab (id),'
+        ' FOREIGN KEY(slot) REFERENCES time_slot (id))'
+    )
+    day_case = ' '.join(f"WHEN '{name}' THEN {index}" for name, index in day_of.items())
+    conn.execute(
+        'INSERT INTO schedule_new (id, course_id, lecturer_id, lab_id, day, slot, class_name, created_at)'
+        f' SELECT s.id, s.course_id, s.lecturer_id, s.lab_id, CASE s.day {day_case} END, t.id,'
+        ' s.class_name, s.created_at'
+        ' FROM schedule s JOIN time_slot t ON t.label = s.time_slot'
+    )
+    conn.execute('DROP TABLE schedule')
+    conn.execute('ALTER TABLE schedule_new RENAME TO schedule')
+    conn.execute('CREATE UNIQUE INDEX ux_schedule_lab_slot ON schedule (lab_id, day, slot)')
+    conn.execute('CREATE UNIQUE INDEX ux_schedule_lecturer_slot ON schedule (lecturer_id, day, slot)')
+    conn.execute('CREATE INDEX ix_schedule_day_slot ON schedule (day, slot, id)')
+    conn.execute('CREATE INDEX ix_schedule_course ON schedule (course_id)')
+    conn.execute('CREATE INDEX ix_schedule_class ON schedule (class_name, day, slot)')
+
+
+# Columns of schedule_change copied from the new row, as of migration 3
+_JOURNAL_COLUMNS_V3 = ('course_id', 'lecturer_id', 'lab_id', 'day', 'slot', 'class_name')
+_JOURNAL_COLUMNS = _JOURNAL_COLUMNS_V3 + ('term_id',)
+
+
+def _journal_triggers(columns):
+    listed = ', '.join(columns)
+    new = ', '.join(f'NEW.{column}' for column in columns)
+    return [
+        'CREATE TRIGGER IF NOT EXISTS tr_schedule_journal_insert AFTER INSERT ON schedule BEGIN'
+        f" INSERT INTO schedule_change (schedule_id, op, {listed}) VALUES (NEW.id, 'insert', {new}); END",
+        'CREATE TRIGGER IF NOT EXISTS tr_schedule_journal_update AFTER UPDATE ON schedule'
+        ' WHEN ' + ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in columns) +
+        f' BEGIN INSERT INTO schedule_change (schedule_id, op, {listed}, old_lecturer_id, old_lab_id)'
+        f" VALUES (NEW.id, 'update', {new}, OLD.lecturer_id, OLD.lab_id); END",
+        'CREATE TRIGGER IF NOT EXISTS tr_schedule_journal_delete AFTER DELETE ON schedule BEGIN'
+        ' INSERT INTO schedule_change (schedule_id, op, old_lecturer_id, old_lab_id)'
+        " VALUES (OLD.id, 'delete', OLD.lecturer_id, OLD.lab_id); END",
+    ]
+
+
+# Shared with models.py, which runs them when create_all builds the tables
+SCHEDULE_JOURNAL_TRIGGERS = _journal_triggers(_JOURNAL_COLUMNS)
+
+SCHEDULE_ARCHIVE_TRIGGERS = [
+    f'CREATE TRIGGER IF NOT EXISTS tr_schedule_archive_{op.lower()} BEFORE {op} ON schedule_archive BEGIN'
+    " SELECT RAISE(ABORT, 'schedule_archive is read-only'); END"
+    for op in ('UPDATE', 'DELETE')
+]
+
+
+def add_schedule_journal(conn, log):
+    """Journal every schedule insert, update and delete in schedule_change.
+
+    Triggers write the journal row, so it is part of the same transaction as
+    the change whether it came from the ORM, a bulk statement or raw SQL.
+    """
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS schedule_change ('
+        ' id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,'
+        ' schedule_id INTEGER NOT NULL,'
+        ' op VARCHAR(6) NOT NULL,'
+        ' course_id INTEGER, lecturer_id INTEGER, lab_id INTEGER,'
+        ' day SMALLINT, slot SMALLINT, class_name VARCHAR(5),'
+        ' old_lecturer_id INTEGER, old_lab_id INTEGER,'
+        ' changed_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL)'
+    )
+    for statement in _journal_triggers(_JOURNAL_COLUMNS_V3):
+        conn.execute(statement)
+
+
+def default_term_name(today):
+    """Name of the academic term ``today`` falls in: the odd (Ganjil) term
+    runs from August to January, the even (Genap) one from February."""
+    year = today.year if today.month >= 8 else today.year - 1
+    half = 'Ganjil' if today.month >= 8 or today.month == 1 else 'Genap'
+    return f'{half} {year}-{year + 1}'
+
+
+def add_terms(conn, log):
+    """Scope every schedule to an academic term and add the archive table.
+
+    Existing schedules go to one active term named after today's date.  The
+    schedule indexes are rebuilt with the term as leading column, so the
+    queries of one term do not read the rows of the others.
+    """
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS term ('
+        ' id INTEGER NOT NULL PRIMARY KEY,'
+        ' name VARCHAR(50) NOT NULL UNIQUE,'
+        ' start_date DATE,'
+        ' weeks INTEGER NOT NULL,'
+        ' status VARCHAR(10) NOT NULL,'
+        ' archived_at DATETIME)'
+    )
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_term_active ON term (status) WHERE status = 'active'")
+    name = default_term_name(date.today())
+    conn.execute("INSERT INTO term (name, weeks, status) VALUES (?, 16, 'active')", (name,))
+    term_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    log(f'  semua jadwal dimasukkan ke semester {name}')
+
+    conn.execute(
+        'CREATE TABLE schedule_new ('
+        ' id INTEGER NOT NULL,'
+        ' term_id INTEGER NOT NULL,'
+        ' course_id INTEGER NOT NULL,'
+        ' lecturer_id INTEGER NOT NULL,'
+        ' lab_id INTEGER NOT NULL,'
+        ' day SMALLINT NOT NULL,'
+        ' slot SMALLINT NOT NULL,'
+        ' class_name VARCHAR(5) NOT NULL,'
+        ' created_at DATETIME,'
+        ' PRIMARY KEY (id),'
+        f' CONSTRAINT ck_schedule_day CHECK (day >= 0 AND day < {len(DAYS)}),'
+        ' FOREIGN KEY(term_id) REFERENCES term (id),'
+        ' FOREIGN KEY(course_id) REFERENCES practicum (id),'
+        ' FOREIGN KEY(lecturer_id) REFERENCES user (id),'
+        ' FOREIGN KEY(lab_id) REFERENCES lab (id),'
+        ' FOREIGN KEY(slot) REFERENCES time_slot (id))'
+    )
+    conn.execute(
+        'INSERT INTO schedule_new (id, term_id, course_id, lecturer_id, lab_id, day, slot, class_name, created_at)'
+        ' SELECT id, ?, course_id, lecturer_id, lab_id, day, slot, class_name, created_at FROM schedule',
+        (term_id,)
+    )
+    # Dropping the table drops its indexes and journal triggers as well
+    conn.execute('DROP TABLE schedule')
+    conn.execute('ALTER TABLE schedule_new RENAME TO schedule')
+    conn.execute('CREATE UNIQUE INDEX ux_schedule_lab_slot ON schedule (term_id, lab_id, day, slot)')
+    conn.execute('CREATE UNIQUE INDEX ux_schedule_lecturer_slot ON schedule (term_id, lecturer_id, day, slot)')
+    conn.execute('CREATE INDEX ix_schedule_day_slot ON schedule (term_id, day, slot, id)')
+    conn.execute('CREATE INDEX ix_schedule_course ON schedule (course_id)')
+    conn.execute('CREATE INDEX ix_schedule_class ON schedule (term_id, class_name, day, slot)')
+
+    conn.execute('ALTER TABLE schedule_change ADD COLUMN term_id INTEGER')
+    for statement in SCHEDULE_JOURNAL_TRIGGERS:
+        conn.execute(statement)
+
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS schedule_archive ('
+        ' term_id INTEGER NOT NULL,'
+        ' id INTEGER NOT NULL,'
+        ' course_id INTEGER NOT NULL,'
+        ' code VARCHAR(20) NOT NULL,'
+        ' practicum_name VARCHAR(100) NOT NULL,'
+        ' semester INTEGER NOT NULL,'
+        ' lecturer_id INTEGER NOT NULL,'
+        ' lecturer_username VARCHAR(80) NOT NULL,'
+        ' lecturer_name VARCHAR(100) NOT NULL,'
+        ' lab_id INTEGER NOT NULL,'
+        ' lab_name VARCHAR(50) NOT NULL,'
+        ' day SMALLINT NOT NULL,'
+        ' slot SMALLINT NOT NULL,'
+        ' class_name VARCHAR(5) NOT NULL,'
+        ' PRIMARY KEY (term_id, id)) WITHOUT ROWID'
+    )
+    for statement in SCHEDULE_ARCHIVE_TRIGGERS:
+        conn.execute(statement)
+
+
+# Full-text search, see search.py.  Documents of every kind share one FTS5
+# table.  Each kind has its own block of rowids, ``kind_base + id``, so a
+# query can keep to some kinds with a rowid range; schedules come last.
+SEARCH_KINDS = ('practicum', 'lecturer', 'lab', 'schedule')
+SEARCH_KIND_STRIDE = 1 << 40
+
+_SEARCH_COLUMNS = 'rowid, title, detail, scope'
+
+
+def search_kind_base(kind):
+    return SEARCH_KINDS.index(kind) * SEARCH_KIND_STRIDE
+
+
+def _search_documents(kind, where):
+    """SELECT of the search documents of ``kind`` whose rows match ``where``."""
+    base = search_kind_base(kind)
+    if kind == 'schedule':
+        day_name = 'CASE s.day ' + ' '.join(f"WHEN {index} THEN '{name}'" for index, name in enumerate(DAYS)) + ' END'
+        # scope holds the term and lecturer as tokens, so filtering on them
+        # is part of the full-text query
+        return (
+            f"SELECT s.id + {base}, p.code || ' ' || p.practicum_name,"
+            f" u.full_name || ' ' || l.lab_name || ' ' || {day_name} || ' ' || p.semester || s.class_name,"
+            " 't' || s.term_id || ' l' || s.lecturer_id"
+            ' FROM schedule s JOIN practicum p ON p.id = s.course_id'
+            ' JOIN "user" u ON u.id = s.lecturer_id JOIN lab l ON l.id = s.lab_id'
+            f' WHERE {where}'
+        )
+    if kind == 'practicum':
+        return (f"SELECT id + {base}, code || ' ' || practicum_name, 'Semester ' || semester, ''"
+                f' FROM practicum WHERE {where}')
+    if kind == 'lab':
+        return f"SELECT id + {base}, lab_name, '', '' FROM lab WHERE {where}"
+    return (f"SELECT id + {base}, full_name, username, ''"
+            f' FROM "user" WHERE role = \'lecturer\' AND {where}')
+
+
+def _reindex(kind, where, rows):
+    """Trigger body that writes the documents of ``kind`` again; ``rows``
+    selects the old ones."""
+    return (f'DELETE FROM search_index WHERE {rows};'
+            f' INSERT INTO search_index ({_SEARCH_COLUMNS}) {_search_documents(kind, where)};')
+
+
+def _search_triggers():
+    schedules = f'rowid IN (SELECT id + {search_kind_base("schedule")} FROM schedule WHERE {{}} = OLD.id)'
+    schedules_of = {
+        'practicum': ('s.course_id = NEW.id', schedules.format('course_id')),
+        'lab': ('s.lab_id = NEW.id', schedules.format('lab_id')),
+        'lecturer': ('s.lecturer_id = NEW.id', schedules.format('lecturer_id')),
+    }
+    sources = {
+        'schedule': ('schedule', 'course_id, lecturer_id, lab_id, day, class_name, term_id', 's.id = NEW.id'),
+        'practicum': ('practicum', 'code, practicum_name, semester', 'id = NEW.id'),
+        'lab': ('lab', 'lab_name', 'id = NEW.id'),
+        'lecturer': ('"user"', 'username, full_name, role', 'id = NEW.id'),
+    }
+    statements = []
+    for kind in SEARCH_KINDS:
+        table, columns, where = sources[kind]
+        name = table.strip('"')
+        own = f'rowid = OLD.id + {search_kind_base(kind)}'
+        insert = f'INSERT INTO search_index ({_SEARCH_COLUMNS}) {_search_documents(kind, where)};'
+        update = _reindex(kind, where, own)
+        delete = f'DELETE FROM search_index WHERE {own};'
+        if kind in schedules_of:
+            # Schedule documents show the names of their practicum, lab and lecturer
+            cascade_where, cascade_rows = schedules_of[kind]
+            update += ' ' + _reindex('schedule', cascade_where, cascade_rows)
+            delete += f' DELETE FROM search_index WHERE {cascade_rows};'
+        statements += [
+            f'CREATE TRIGGER IF NOT EXISTS tr_search_{name}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+            f'CREATE TRIGGER IF NOT EXISTS tr_search_{name}_update AFTER UPDATE OF {columns} ON {table}'
+            f' BEGIN {update} END',
+            f'CREATE TRIGGER IF NOT EXISTS tr_search_{name}_delete AFTER DELETE ON {table} BEGIN {delete} END',
+        ]
+    return statements
+
+
+# Shared with models.py like the journal triggers
+SEARCH_INDEX_STATEMENTS = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(title, detail, scope,'
+    " tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6')",
+] + _search_triggers()
+
+# Fill an empty index from the tables
+SEARCH_INDEX_FILL = [f'INSERT INTO search_index ({_SEARCH_COLUMNS}) {_search_documents(kind, "1")}'
+                     for kind in SEARCH_KINDS]
+
+
+def index_schedule_change_by_schedule(conn, log):
+    """Index schedule_change by schedule, for the latest version of a row."""
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_schedule_change_schedule ON schedule_change (schedule_id, id)')
+
+
+def add_search_index(conn, log):
+    """Add the full-text search index over practicums, lecturers, labs and schedules."""
+    for statement in SEARCH_INDEX_STATEMENTS:
+        conn.execute(statement)
+    conn.execute('DELETE FROM search_index')
+    for statement in SEARCH_INDEX_FILL:
+        conn.execute(statement)
+
+
+# Dated calendar, see occurrences.py.  Exceptions of a schedule go with it,
+# including when its term is archived.
+CALENDAR_EXCEPTION_KINDS = ('holiday', 'cancel', 'makeup')
+
+CALENDAR_EXCEPTION_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS tr_calendar_exception_schedule_delete AFTER DELETE ON schedule BEGIN'
+    ' DELETE FROM calendar_exception WHERE schedule_id = OLD.id; END'
+]
+
+
+def add_calendar_exceptions(conn, log):
+    """Add holidays, cancelled sessions and make-up sessions for the dated calendar."""
+    kinds = ', '.join(f"'{kind}'" for kind in CALENDAR_EXCEPTION_KINDS)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS calendar_exception ('
+        ' id INTEGER NOT NULL PRIMARY KEY,'
+        ' kind VARCHAR(8) NOT NULL,'
+        ' date DATE NOT NULL,'
+        ' schedule_id INTEGER,'
+        ' slot SMALLINT,'
+        ' lab_id INTEGER,'
+        ' note VARCHAR(200),'
+        ' created_by INTEGER,'
+        ' created_at DATETIME,'
+        f' CONSTRAINT ck_calendar_exception_kind CHECK (kind IN ({kinds})),'
+        " CONSTRAINT ck_calendar_exception_schedule CHECK ((kind = 'holiday') = (schedule_id IS NULL)),"
+        ' FOREIGN KEY(schedule_id) REFERENCES schedule (id),'
+        ' FOREIGN KEY(slot) REFERENCES time_slot (id),'
+        ' FOREIGN KEY(lab_id) REFERENCES lab (id),'
+        ' FOREIGN KEY(created_by) REFERENCES user (id))'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_calendar_exception_date ON calendar_exception (date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_calendar_exception_schedule'
+                 ' ON calendar_exception (schedule_id, date)')
+    for statement in CALENDAR_EXCEPTION_TRIGGERS:
+        conn.execute(statement)
+
+
+def add_jobs(conn, log):
+    """Add the table of background jobs."""
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS job ('
+        ' id INTEGER NOT NULL PRIMARY KEY,'
+        ' kind VARCHAR(30) NOT NULL,'
+        ' status VARCHAR(10) NOT NULL,'
+        ' params JSON NOT NULL,'
+        ' result JSON,'
+        ' result_file VARCHAR(100),'
+        ' upload_file VARCHAR(100),'
+        ' error TEXT,'
+        ' progress INTEGER NOT NULL,'
+        ' total INTEGER,'
+        ' message VARCHAR(200),'
+        ' worker_pid INTEGER,'
+        ' created_by INTEGER,'
+        ' created_at DATETIME NOT NULL,'
+        ' started_at DATETIME,'
+        ' finished_at DATETIME,'
+        ' FOREIGN KEY(created_by) REFERENCES user (id))'
+    )
+    # Databases built by create_all have the table, but maybe not this column yet
+    if 'upload_file' not in _columns(conn, 'job'):
+        conn.execute('ALTER TABLE job ADD COLUMN upload_file VARCHAR(100)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_job_created_by ON job (created_by, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_job_status ON job (status)')
+
+
+MIGRATIONS = [
+    rename_course_to_practicum,
+    normalize_day_slot,
+    add_schedule_journal,
+    add_terms,
+    index_schedule_change_by_schedule,
+    add_search_index,
+    add_calendar_exceptions,
+    add_jobs,
+]
+
+LATEST = len(MIGRATIONS)
+
+
+def upgrade(path, log=print):
+    """Bring the SQLite database at ``path`` to the latest schema version.
+
+    Returns the list of migration numbers that were applied.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if not _tables(conn) & APP_TABLES:
+            conn.execute(f'PRAGMA user_version = {LATEST}')
+            return []
+
+        applied = []
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            log(f'Migrasi {number}: {migration.__doc__.splitlines()[0]}')
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                migration(conn, log)
+                conn.execute(f'PRAGMA user_version = {number}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(number)
+        return applied
+    finally:
+        conn.close()
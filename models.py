@@ -0,0 +1,213 @@
+"""Database models of the scheduling application."""
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+
+from migrations import (CALENDAR_EXCEPTION_KINDS, CALENDAR_EXCEPTION_TRIGGERS, SCHEDULE_ARCHIVE_TRIGGERS,
+                        SCHEDULE_JOURNAL_TRIGGERS, SEARCH_INDEX_STATEMENTS)
+from slots import DAYS, TIME_SLOTS
+
+db = SQLAlchemy()
+
+# Database Models
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password = db.Column(db.String(120), nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # admin, staff, lecturer
+    full_name = db.Column(db.String(100), nullable=False)
+    
+    # Relasi dengan schedule
+    schedules = db.relationship('Schedule', backref='lecturer', lazy=True)
+
+class Lab(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    lab_name = db.Column(db.String(50), nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    
+    # Relasi dengan schedule
+    schedules = db.relationship('Schedule', backref='laboratory', lazy=True)
+
+class Practicum(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)
+    practicum_name = db.Column(db.String(100), nullable=False)
+    semester = db.Column(db.Integer, nullable=False, index=True)  # 1-8
+    sks = db.Column(db.Integer, nullable=False)  # 1-4
+    
+    # Relasi dengan schedule
+    schedules = db.relationship('Schedule', backref='practicum', lazy=True)
+
+class TimeSlot(db.Model):
+    # id is the slot index used by Schedule.slot, 0 = Sesi 1
+    id = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    label = db.Column(db.String(20), unique=True, nullable=False)  # 08:00-09:40
+    start_time = db.Column(db.String(5), nullable=False)
+    end_time = db.Column(db.String(5), nullable=False)
+
+class Term(db.Model):
+    """Academic term.  ``planned`` and ``active`` terms take new schedules
+    and only one term is active at a time; schedule queries default to it.
+    A ``closed`` term is over and waits for ``flask archive-term``, which
+    moves its schedules to ``ScheduleArchive`` and marks it ``archived``."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)  # Ganjil 2025-2026
+    start_date = db.Column(db.Date)  # None: TERM_START or this week
+    weeks = db.Column(db.Integer, nullable=False, default=16)
+    status = db.Column(db.String(10), nullable=False, default='planned')  # planned, active, closed, archived
+    archived_at = db.Column(db.DateTime)
+
+    schedules = db.relationship('Schedule', backref='term', lazy=True)
+
+    __table_args__ = (
+        db.Index('ux_term_active', 'status', unique=True, sqlite_where=db.text("status = 'active'")),
+    )
+
+    @property
+    def is_open(self):
+        return self.status in ('planned', 'active')
+
+class Schedule(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    term_id = db.Column(db.Integer, db.ForeignKey('term.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('practicum.id'), nullable=False)
+    lecturer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    lab_id = db.Column(db.Integer, db.ForeignKey('lab.id'), nullable=False)
+    day = db.Column(db.SmallInteger, nullable=False)  # 0 = Senin ... 5 = Sabtu
+    slot = db.Column(db.SmallInteger, db.ForeignKey('time_slot.id'), nullable=False)
+    class_name = db.Column(db.String(5), nullable=False)  # A, B, C
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # The database itself refuses double bookings of a lab or a lecturer.
+        # Every index but the foreign key one leads with the term, so the
+        # queries of one term never read the rows of another.
+        db.Index('ux_schedule_lab_slot', 'term_id', 'lab_id', 'day', 'slot', unique=True),
+        db.Index('ux_schedule_lecturer_slot', 'term_id', 'lecturer_id', 'day', 'slot', unique=True),
+        # List order and keyset pagination, and the schedules() filters
+        db.Index('ix_schedule_day_slot', 'term_id', 'day', 'slot', 'id'),
+        db.Index('ix_schedule_course', 'course_id'),
+        db.Index('ix_schedule_class', 'term_id', 'class_name', 'day', 'slot'),
+        db.CheckConstraint(f'day >= 0 AND day < {len(DAYS)}', name='ck_schedule_day'),
+    )
+    
+    @property
+    def day_name(self):
+        return DAYS[self.day]
+    
+    @property
+    def time_slot(self):
+        return TIME_SLOTS[self.slot]
+
+
+class ScheduleChange(db.Model):
+    """Append-only journal of schedule changes, filled by triggers on the
+    schedule table.  The id is the version number clients sync from; a
+    delete keeps only the old lab and lecturer, so filtered feeds still see
+    a session leave them."""
+    __tablename__ = 'schedule_change'
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(6), nullable=False)  # insert, update, delete
+    course_id = db.Column(db.Integer)
+    lecturer_id = db.Column(db.Integer)
+    lab_id = db.Column(db.Integer)
+    day = db.Column(db.SmallInteger)
+    slot = db.Column(db.SmallInteger)
+    class_name = db.Column(db.String(5))
+    term_id = db.Column(db.Integer)
+    old_lecturer_id = db.Column(db.Integer)
+    old_lab_id = db.Column(db.Integer)
+    changed_at = db.Column(db.DateTime, nullable=False, server_default=db.func.current_timestamp())
+
+    __table_args__ = (
+        # Latest version of each schedule, for the fragment cache of the list
+        db.Index('ix_schedule_change_schedule', 'schedule_id', 'id'),
+        # Ids are never reused after old rows are pruned
+        {'sqlite_autoincrement': True},
+    )
+
+
+class ScheduleArchive(db.Model):
+    """Schedules of archived terms, one row per session with the names it
+    had at the time, so history survives later changes to labs, users and
+    practicums.  Triggers make the table read-only once written."""
+    __tablename__ = 'schedule_archive'
+    term_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # id the schedule had
+    course_id = db.Column(db.Integer, nullable=False)
+    code = db.Column(db.String(20), nullable=False)
+    practicum_name = db.Column(db.String(100), nullable=False)
+    semester = db.Column(db.Integer, nullable=False)
+    lecturer_id = db.Column(db.Integer, nullable=False)
+    lecturer_username = db.Column(db.String(80), nullable=False)
+    lecturer_name = db.Column(db.String(100), nullable=False)
+    lab_id = db.Column(db.Integer, nullable=False)
+    lab_name = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.SmallInteger, nullable=False)
+    slot = db.Column(db.SmallInteger, nullable=False)
+    class_name = db.Column(db.String(5), nullable=False)
+
+    # Clustered on (term_id, id): no separate rowid b-tree
+    __table_args__ = {'sqlite_with_rowid': False}
+
+
+class CalendarException(db.Model):
+    """A date on which the weekly schedules do not simply repeat: a
+    ``holiday`` without any session, a ``cancel`` of the session of one
+    schedule, or a ``makeup`` session of one schedule, in its own slot and
+    lab unless ``slot`` and ``lab_id`` say otherwise.  See ``occurrences``."""
+    __tablename__ = 'calendar_exception'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(8), nullable=False)  # holiday, cancel, makeup
+    date = db.Column(db.Date, nullable=False)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('schedule.id'))
+    slot = db.Column(db.SmallInteger, db.ForeignKey('time_slot.id'))
+    lab_id = db.Column(db.Integer, db.ForeignKey('lab.id'))
+    note = db.Column(db.String(200))
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Date range queries of the calendar, and the exceptions of a schedule
+        db.Index('ix_calendar_exception_date', 'date'),
+        db.Index('ix_calendar_exception_schedule', 'schedule_id', 'date'),
+        db.CheckConstraint(f"kind IN ({', '.join(repr(kind) for kind in CALENDAR_EXCEPTION_KINDS)})",
+                           name='ck_calendar_exception_kind'),
+        db.CheckConstraint("(kind = 'holiday') = (schedule_id IS NULL)", name='ck_calendar_exception_schedule'),
+    )
+
+
+class Job(db.Model):
+    """Background job run by ``jobs``.  ``params`` are the keyword arguments
+    of the task and ``result`` what it returned; a result file, such as an
+    export, lies in the jobs folder under ``result_file``, and an uploaded
+    file the job reads, such as an import, under ``upload_file``."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running, done, failed, cancelled
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    result = db.Column(db.JSON)
+    result_file = db.Column(db.String(100))
+    upload_file = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    message = db.Column(db.String(200))
+    worker_pid = db.Column(db.Integer)  # process running the job
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_job_created_by', 'created_by', 'id'),
+        db.Index('ix_job_status', 'status'),
+    )
+
+
+# After all tables, since the triggers need both schedule and schedule_change
+for _statement in (SCHEDULE_JOURNAL_TRIGGERS + SCHEDULE_ARCHIVE_TRIGGERS + SEARCH_INDEX_STATEMENTS
+                   + CALENDAR_EXCEPTION_TRIGGERS):
+    event.listen(db.metadata, 'after_create', DDL(_statement))
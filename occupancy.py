@@ -0,0 +1,120 @@
+"""In-memory occupancy index for schedule conflict checks.
+
+Each schedule occupies three keys in one (day, slot) of its term:
+
+* ``('lab', term_id, lab_id, day, slot)``
+* ``('lecturer', term_id, lecturer_id, day, slot)``
+* ``('group', term_id, semester, class_name, day, slot)``
+
+The index maps every key to the ids of the schedules holding it, so a
+conflict check is three dictionary lookups instead of database queries.
+Keys map to sets rather than single ids so that legacy data which already
+contains clashes can still be loaded and audited.
+"""
+from collections import namedtuple
+
+from slots import cell_of
+
+Entry = namedtuple('Entry', 'id lab_id lecturer_id semester class_name day slot term_id')
+
+Conflict = namedtuple('Conflict', 'kind key schedule_ids')
+
+KINDS = ('lab', 'lecturer', 'group')
+
+
+def resource_keys(entry):
+    """The lab, the lecturer and the class group of ``entry`` in its term."""
+    return (
+        ('lab', entry.term_id, entry.lab_id),
+        ('lecturer', entry.term_id, entry.lecturer_id),
+        ('group', entry.term_id, entry.semester, entry.class_name),
+    )
+
+
+def entry_keys(entry):
+    return tuple(key + (entry.day, entry.slot) for key in resource_keys(entry))
+
+
+class OccupancyIndex:
+    """Besides the keys, keeps a bitmask of busy cells (see ``slots``) per
+    resource, so free times are found with a few integer operations."""
+
+    def __init__(self, entries=()):
+        self._keys = {}
+        self._entries = {}
+        self._masks = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, schedule_id):
+        return schedule_id in self._entries
+
+    def copy(self):
+        """Independent index with the same entries, for trying out a batch
+        of changes before any of them is written."""
+        return OccupancyIndex(self._entries.values())
+
+    def add(self, entry):
+        if entry.id in self._entries:
+            self.remove(entry.id)
+        self._entries[entry.id] = entry
+        bit = 1 << cell_of(entry.day, entry.slot)
+        for resource, key in zip(resource_keys(entry), entry_keys(entry)):
+            self._keys.setdefault(key, set()).add(entry.id)
+            self._masks[resource] = self._masks.get(resource, 0) | bit
+
+    def remove(self, schedule_id):
+        entry = self._entries.pop(schedule_id, None)
+        if entry is None:
+            return
+        bit = 1 << cell_of(entry.day, entry.slot)
+        for resource, key in zip(resource_keys(entry), entry_keys(entry)):
+            holders = self._keys[key]
+            holders.discard(schedule_id)
+            if not holders:
+                del self._keys[key]
+                mask = self._masks[resource] & ~bit
+                if mask:
+                    self._masks[resource] = mask
+                else:
+                    del self._masks[resource]
+
+    def busy(self, resource, ignore=None):
+        """Bitmask of the cells where ``resource`` (see ``resource_keys``)
+        is taken, not counting schedule ``ignore``."""
+        mask = self._masks.get(resource, 0)
+        entry = self._entries.get(ignore)
+        if entry is not None and resource in resource_keys(entry):
+            key = resource + (entry.day, entry.slot)
+            if self._keys.get(key) == {ignore}:
+                mask &= ~(1 << cell_of(entry.day, entry.slot))
+        return mask
+
+    def conflicts(self, entry):
+        """Return ``(kind, schedule_id)`` for every schedule clashing with
+        ``entry``; ``entry.id`` itself is ignored so edits can be checked."""
+        found = []
+        for kind, key in zip(KINDS, entry_keys(entry)):
+            for schedule_id in sorted(self._keys.get(key, ())):
+                if schedule_id != entry.id:
+                    found.append((kind, schedule_id))
+        return found
+
+
+def audit(entries):
+    """Scan ``entries`` once and return every key held by more than one
+    schedule, as ``Conflict`` tuples ordered by kind and first schedule id."""
+    holders = {}
+    for entry in entries:
+        for key in entry_keys(entry):
+            holders.setdefault(key, []).append(entry.id)
+    found = [
+        Conflict(key[0], key, ids)
+        for key, ids in holders.items()
+        if len(ids) > 1
+    ]
+    found.sort(key=lambda c: (KINDS.index(c.kind), c.schedule_ids[0]))
+    return found
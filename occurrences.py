@@ -0,0 +1,189 @@
+"""Dated occurrences of the weekly schedules.
+
+A schedule row is a weekly pattern, a day and a slot for a whole term.
+A term runs for ``Term.weeks`` weeks from ``term_start``, counted from the
+Monday of its first week, and every schedule takes place on its day of
+each of those weeks, except
+
+* on a holiday, when nothing takes place,
+* on a date its session was cancelled,
+
+while a make-up session adds a date, possibly in another slot and lab.
+These are the rows of ``CalendarException``.
+
+Occurrences are never stored.  ``between`` answers a date range with one
+query per term for the schedules of the weekdays in the range, through the
+term-first indexes of the schedule table, and one query for the
+exceptions of the range through their date index.  It then yields the
+occurrences date by date.  Only the weekly rows of the range and the
+occurrences of one day are held in memory, so a whole term streams
+without building the list of all its sessions.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db, CalendarException, Lab, Practicum, Schedule, Term, User
+from slots import DAYS
+
+BATCH_SIZE = 1000
+
+ScheduleRow = namedtuple('ScheduleRow', 'id term_id code practicum_name semester class_name lecturer_id '
+                                        'lecturer_name lab_id lab day slot')
+
+# ``makeup_id`` is the id of the make-up exception, None for the weekly session
+Occurrence = namedtuple('Occurrence', 'date slot lab_id lab schedule makeup_id')
+
+Makeup = namedtuple('Makeup', 'id schedule_id date slot lab_id lab note')
+
+
+def monday_of(day):
+    return day - timedelta(days=day.weekday())
+
+
+def term_start(term):
+    """First day of ``term``: its start date, else ``TERM_START``, else the
+    Monday of this week."""
+    if term is not None and term.start_date:
+        return term.start_date
+    try:
+        return date.fromisoformat(current_app.config['TERM_START'])
+    except (TypeError, ValueError):
+        return monday_of(date.today())
+
+
+def term_span(start, weeks):
+    """``(first, end)`` of a term of ``weeks`` weeks from ``start``; ``end``
+    is the day after the last one."""
+    return start, monday_of(start) + timedelta(weeks=weeks)
+
+
+class Exceptions:
+    """The holidays, cancellations and make-up sessions of a date range."""
+
+    def __init__(self):
+        self.holidays = {}
+        self.cancelled = set()
+        self.makeups = defaultdict(list)
+
+    @classmethod
+    def load(cls, first, end):
+        """Exceptions from ``first`` up to the day before ``end``."""
+        exceptions = cls()
+        lab_id = func.coalesce(CalendarException.lab_id, Schedule.lab_id)
+        rows = db.session.execute(
+            select(CalendarException.id, CalendarException.kind, CalendarException.date,
+                   CalendarException.schedule_id, CalendarException.note,
+                   func.coalesce(CalendarException.slot, Schedule.slot), lab_id, Lab.lab_name)
+            .outerjoin(Schedule, Schedule.id == CalendarException.schedule_id)
+            .outerjoin(Lab, Lab.id == lab_id)
+            .where(CalendarException.date >= first, CalendarException.date < end)
+        )
+        for exception_id, kind, day, schedule_id, note, slot, lab_id, lab in rows:
+            if kind == 'holiday':
+                exceptions.holidays[day] = note
+            elif kind == 'cancel':
+                exceptions.cancelled.add((schedule_id, day))
+            else:
+                exceptions.makeups[schedule_id].append(Makeup(exception_id, schedule_id, day, slot,
+                                                              lab_id, lab, note))
+        return exceptions
+
+
+def iter_schedule_rows(conditions):
+    """Yield a ``ScheduleRow`` for every schedule matching ``conditions``,
+    ordered by day, slot and id."""
+    query = (
+        select(Schedule.id, Schedule.term_id, Practicum.code, Practicum.practicum_name, Practicum.semester,
+               Schedule.class_name, Schedule.lecturer_id, User.full_name, Schedule.lab_id, Lab.lab_name,
+               Schedule.day, Schedule.slot)
+        .join(Practicum, Practicum.id == Schedule.course_id)
+        .join(User, User.id == Schedule.lecturer_id)
+        .join(Lab, Lab.id == Schedule.lab_id)
+        .where(*conditions)
+        .order_by(Schedule.day, Schedule.slot, Schedule.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for row in db.session.execute(query):
+        yield ScheduleRow(*row)
+
+
+def _weekdays(first, end):
+    days = {(first + timedelta(days=offset)).weekday() for offset in range(min((end - first).days, 7))}
+    return sorted(day for day in days if day < len(DAYS))
+
+
+def between(first, end, conditions=(), lab_id=None, exceptions=None):
+    """Yield an ``Occurrence`` for every session from ``first`` up to the
+    day before ``end``, ordered by date, slot and schedule id.
+
+    ``conditions`` on ``Schedule`` choose the schedules, for example those
+    of one lecturer; ``lab_id`` keeps the sessions held in one lab, make-up
+    sessions moved there from another lab included.  Terms that are
+    archived have no schedules left and yield nothing.
+    """
+    if exceptions is None:
+        exceptions = Exceptions.load(first, end)
+
+    spans = []
+    weekly = {}
+    for term in db.session.scalars(select(Term).where(Term.status != 'archived').order_by(Term.id)):
+        term_first, term_end = term_span(term_start(term), term.weeks)
+        low, high = max(first, term_first), min(end, term_end)
+        if low >= high:
+            continue
+        days = _weekdays(low, high)
+        term_conditions = [Schedule.term_id == term.id, Schedule.day.in_(days), *conditions]
+        if lab_id is not None:
+            term_conditions.append(Schedule.lab_id == lab_id)
+        by_day = defaultdict(list)
+        for row in iter_schedule_rows(term_conditions):
+            by_day[row.day].append(row)
+        spans.append((term.id, low, high))
+        weekly[term.id] = by_day
+
+    # Make-up sessions by date, with the schedules they belong to
+    makeups = defaultdict(list)
+    if exceptions.makeups:
+        for row in iter_schedule_rows([Schedule.id.in_(list(exceptions.makeups)), *conditions]):
+            for makeup in exceptions.makeups[row.id]:
+                if lab_id is None or makeup.lab_id == lab_id:
+                    makeups[makeup.date].append(Occurrence(makeup.date, makeup.slot, makeup.lab_id, makeup.lab,
+                                                           row, makeup.id))
+
+    cancelled = exceptions.cancelled
+    day = first
+    while day < end:
+        rows = []
+        if day not in exceptions.holidays:
+            for term_id, low, high in spans:
+                if low <= day < high:
+                    rows.extend(weekly[term_id].get(day.weekday(), ()))
+            if cancelled:
+                rows = [row for row in rows if (row.id, day) not in cancelled]
+        occurrences = [Occurrence(day, row.slot, row.lab_id, row.lab, row, None) for row in rows]
+        extra = makeups.get(day)
+        if extra is not None or len(spans) > 1:
+            # Only then can the rows of the day be out of order
+            occurrences.extend(extra or ())
+            occurrences.sort(key=lambda occurrence: (occurrence.slot, occurrence.schedule.id))
+        yield from occurrences
+        day += timedelta(days=1)
+
+
+def clashes(day, slot, lab_id, lecturer_id, semester, class_name):
+    """Kinds of ``scheduling.CONFLICT_MESSAGES`` that a session on ``day`` in
+    ``slot`` would clash with: a session in the same lab, of the same
+    lecturer or of the same class group."""
+    end = day + timedelta(days=1)
+    exceptions = Exceptions.load(day, end)
+    candidates = {
+        'lab': between(day, end, lab_id=lab_id, exceptions=exceptions),
+        'lecturer': between(day, end, [Schedule.lecturer_id == lecturer_id], exceptions=exceptions),
+        'group': between(day, end, [Practicum.semester == semester, Schedule.class_name == class_name],
+                         exceptions=exceptions),
+    }
+    return [kind for kind, sessions in candidates.items()
+            if any(occurrence.slot == slot for occurrence in sessions)]
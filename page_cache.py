@@ -0,0 +1,98 @@
+"""Versioned HTTP caching for the schedule pages.
+
+Views decorated with ``cached_page`` get a strong ETag derived from
+(data version, role, user id, endpoint, view args, query args); the data
+version changes on every commit that touches the schedule, lab, practicum,
+user or term tables, in any worker process (see ``changes``).
+
+A request whose ``If-None-Match`` matches gets a 304 straight away.
+Otherwise a body rendered earlier under the same key is served, and only
+on a miss does the view run.  A streamed body is kept once it was sent in
+full; a client that disconnects early leaves nothing behind.  Neither path queries the database while the
+principal of the user is cached (see ``auth``).
+
+Requests with pending flash messages bypass the cache in both directions,
+because the page would show, or swallow, a one-off message.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request, session
+
+from auth import current_user
+from changes import VERSIONED_TABLES, data_version, on_commit
+
+MAX_ENTRIES = 256
+
+_lock = threading.Lock()
+_pages = OrderedDict()
+
+
+def clear():
+    with _lock:
+        _pages.clear()
+
+
+@on_commit
+def _invalidate(tables):
+    # Keys of older versions can never hit again; free their memory now
+    if tables & VERSIONED_TABLES:
+        clear()
+
+
+def _store(key, body):
+    with _lock:
+        _pages[key] = body
+        while len(_pages) > MAX_ENTRIES:
+            _pages.popitem(last=False)
+
+
+def _store_when_sent(key, chunks):
+    """Pass a streamed body through and keep it once it was sent in full."""
+    body = []
+    try:
+        for chunk in chunks:
+            body.append(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+    _store(key, b''.join(body))
+
+
+def cached_page(view):
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        user = current_user()
+        if user is None or '_flashes' in session:
+            return view(*args, **kwargs)
+
+        key = (data_version(), user.role, user.id, request.endpoint,
+               tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+        etag = hashlib.sha1(repr(key).encode()).hexdigest()
+
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            with _lock:
+                body = _pages.get(key)
+                if body is not None:
+                    _pages.move_to_end(key)
+            if body is not None:
+                response = make_response(body)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or '_flashes' in session:
+                    return response
+                if response.is_streamed:
+                    response.response = _store_when_sent(key, response.response)
+                else:
+                    _store(key, response.get_data())
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
@@ -0,0 +1,255 @@
+"""Minimal-change repair of the weekly timetable after a disruption.
+
+A ``Disruption`` closes cells of labs (maintenance) and of lecturers
+(unavailability).  Sessions held in a closed cell are displaced and must
+move; every other session should stay where it is.
+
+The repair works on the same per-resource bitsets as ``timetable``.  Each
+displaced session, most constrained first, is moved to the free cell that
+changes least (same time in another lab, then the same lab on another
+slot, and so on).  When no cell is free it tries ejection chains: take
+the lab of another session at a time the displaced one's lecturer and
+class group are free, and move that session instead, directly or, within
+``max_chain``, by ejecting again.  The number of sessions moved besides
+the displaced ones is what the search minimises, so shorter chains are
+always tried first.  Nothing outside the chains is touched,
+which keeps a repair of a full-term dataset to a fraction of a second.
+
+Like ``timetable`` the module has no database access; ``views/planning.py``
+loads the sessions and applies the result (``apply_repair``).
+"""
+import heapq
+from dataclasses import dataclass, field
+
+from slots import ALL_CELLS, cell_of, iter_cells, split_cell
+
+# Ejections tried per displaced session before it is reported unplaced
+NODE_BUDGET = 2000
+# Cells held by other sessions considered at each step of a chain
+EJECTIONS = 50
+
+
+@dataclass(frozen=True)
+class Session:
+    id: int
+    course_id: int
+    semester: int
+    class_name: str
+    lecturer_id: int
+    lab_id: int
+    day: int
+    slot: int
+    # Smallest lab the session may move to
+    min_capacity: int = 0
+
+    @property
+    def group(self):
+        return (self.semester, self.class_name)
+
+    @property
+    def cell(self):
+        return cell_of(self.day, self.slot)
+
+
+@dataclass
+class Disruption:
+    """Closed cells as bitmasks (see ``slots``) per lab and per lecturer."""
+    labs: dict = field(default_factory=dict)
+    lecturers: dict = field(default_factory=dict)
+
+    def displaces(self, session):
+        bit = 1 << session.cell
+        return bool((self.labs.get(session.lab_id, 0) | self.lecturers.get(session.lecturer_id, 0)) & bit)
+
+
+@dataclass(frozen=True)
+class Move:
+    session: Session
+    lab_id: int
+    day: int
+    slot: int
+    # True for the sessions the disruption displaced, False for knock-on moves
+    displaced: bool = True
+
+
+@dataclass
+class RepairResult:
+    moves: list
+    unplaced: list = field(default_factory=list)
+
+    @property
+    def complete(self):
+        return not self.unplaced
+
+    @property
+    def knock_on(self):
+        return sum(1 for move in self.moves if not move.displaced)
+
+
+class _State:
+
+    def __init__(self, sessions, labs, disruption):
+        self.disruption = disruption
+        # Smallest lab first, so the best-fitting lab wins ties
+        self.labs = sorted(labs, key=lambda lab: (lab[1], lab[0]))
+        self.capacity = dict(labs)
+        self.lab_busy = {lab_id: 0 for lab_id, _ in labs}
+        self.lecturer_busy = {}
+        self.group_busy = {}
+        # (kind, resource, cell) -> session id
+        self.owners = {}
+        # session id -> (session, lab_id, cell) where it currently sits
+        self.position = {}
+        for session in sessions:
+            self.place(session, session.lab_id, session.cell)
+
+    def _keys(self, session, lab_id, cell):
+        return (('lab', lab_id, cell), ('lecturer', session.lecturer_id, cell),
+                ('group', session.group, cell))
+
+    def place(self, session, lab_id, cell):
+        bit = 1 << cell
+        self.lab_busy[lab_id] = self.lab_busy.get(lab_id, 0) | bit
+        self.lecturer_busy[session.lecturer_id] = self.lecturer_busy.get(session.lecturer_id, 0) | bit
+        self.group_busy[session.group] = self.group_busy.get(session.group, 0) | bit
+        for key in self._keys(session, lab_id, cell):
+            self.owners[key] = session.id
+        self.position[session.id] = (session, lab_id, cell)
+
+    def lift(self, session_id):
+        session, lab_id, cell = self.position.pop(session_id)
+        bit = ~(1 << cell)
+        for key in self._keys(session, lab_id, cell):
+            if self.owners.get(key) == session_id:
+                del self.owners[key]
+                kind, resource, _ = key
+                busy = {'lab': self.lab_busy, 'lecturer': self.lecturer_busy, 'group': self.group_busy}[kind]
+                busy[resource] &= bit
+        return session, lab_id, cell
+
+    def open_cells(self, session):
+        """Cells where the session's lecturer and group are free and open."""
+        return (ALL_CELLS
+                & ~self.lecturer_busy.get(session.lecturer_id, 0)
+                & ~self.group_busy.get(session.group, 0)
+                & ~self.disruption.lecturers.get(session.lecturer_id, 0))
+
+    def eligible_labs(self, session):
+        return [lab_id for lab_id, capacity in self.labs if capacity >= session.min_capacity]
+
+    def change(self, session, lab_id, cell):
+        """How far (lab, cell) is from where the session was, smaller is better."""
+        day, slot = split_cell(cell)
+        same_lab = lab_id == session.lab_id
+        if cell == session.cell:
+            rank = 0
+        elif same_lab and day == session.day:
+            rank = 1
+        elif same_lab:
+            rank = 2
+        elif day == session.day:
+            rank = 3
+        else:
+            rank = 4
+        return (rank, abs(day - session.day), abs(slot - session.slot),
+                self.capacity[lab_id] - self.capacity.get(session.lab_id, 0) if not same_lab else 0)
+
+    def free_spot(self, session):
+        """The best ``(lab_id, cell)`` that is free for the session, or None."""
+        open_cells = self.open_cells(session)
+        best = None
+        for lab_id in self.eligible_labs(session):
+            free = open_cells & ~self.lab_busy.get(lab_id, 0) & ~self.disruption.labs.get(lab_id, 0)
+            for cell in iter_cells(free):
+                option = (self.change(session, lab_id, cell), lab_id, cell)
+                if best is None or option < best:
+                    best = option
+        return best and best[1:]
+
+    def ejections(self, session):
+        """Up to ``EJECTIONS`` ``(lab_id, cell, other)`` where the session
+        could go if session ``other`` gave up its lab, best first."""
+        open_cells = self.open_cells(session)
+        found = []
+        for lab_id in self.eligible_labs(session):
+            taken = open_cells & self.lab_busy.get(lab_id, 0) & ~self.disruption.labs.get(lab_id, 0)
+            for cell in iter_cells(taken):
+                other = self.owners.get(('lab', lab_id, cell))
+                if other is not None:
+                    found.append((self.change(session, lab_id, cell), lab_id, cell, other))
+        return [item[1:] for item in heapq.nsmallest(EJECTIONS, found)]
+
+    def relocate(self, session, depth, frozen, budget, moves):
+        """Place the lifted ``session`` moving at most ``depth`` others.
+
+        ``frozen`` sessions may not be ejected.  On success ``moves`` gets
+        the chain and True is returned; otherwise the state is unchanged.
+        """
+        spot = self.free_spot(session)
+        if spot:
+            self.place(session, *spot)
+            moves.append((session,) + spot)
+            return True
+        if depth == 0:
+            return False
+        for lab_id, cell, other in self.ejections(session):
+            if other in frozen:
+                continue
+            budget[0] -= 1
+            if budget[0] < 0:
+                return False
+            ejected = self.lift(other)
+            self.place(session, lab_id, cell)
+            chain = []
+            if self.relocate(ejected[0], depth - 1, frozen | {session.id, other}, budget, chain):
+                moves.append((session, lab_id, cell))
+                moves.extend(chain)
+                return True
+            self.lift(session.id)
+            self.place(*ejected)
+        return False
+
+
+def repair(sessions, labs, disruption, max_chain=2, budget=NODE_BUDGET):
+    """Move the sessions ``disruption`` displaces to open, conflict-free
+    cells, moving as few other sessions as possible.
+
+    ``labs`` is an iterable of ``(lab_id, capacity)`` pairs.  Ejection
+    chains move at most ``max_chain`` other sessions per displaced one.
+    """
+    labs = list(labs)
+    sessions = list(sessions)
+    displaced = [session for session in sessions if disruption.displaces(session)]
+    state = _State([session for session in sessions if not disruption.displaces(session)],
+                   labs, disruption)
+
+    def room(session):
+        return sum(bin(state.open_cells(session) & ~disruption.labs.get(lab_id, 0)
+                       & ~state.lab_busy[lab_id]).count('1')
+                   for lab_id in state.eligible_labs(session))
+
+    final = {}
+    unplaced = []
+    frozen = frozenset(session.id for session in displaced)
+    for session in sorted(displaced, key=lambda s: (room(s), s.id)):
+        remaining = [budget]
+        for depth in range(max_chain + 1):
+            moves = []
+            if state.relocate(session, depth, frozen, remaining, moves):
+                for moved, lab_id, cell in moves:
+                    final[moved.id] = (moved, lab_id, cell)
+                break
+        else:
+            # It stays where it is until someone moves it by hand
+            state.place(session, session.lab_id, session.cell)
+            unplaced.append(session)
+
+    displaced_ids = {session.id for session in displaced}
+    result = []
+    for session, lab_id, cell in final.values():
+        if (lab_id, cell) == (session.lab_id, session.cell):
+            continue
+        day, slot = split_cell(cell)
+        result.append(Move(session, lab_id, day, slot, session.id in displaced_ids))
+    result.sort(key=lambda move: (not move.displaced, move.session.day, move.session.slot, move.session.id))
+    return RepairResult(result, unplaced)
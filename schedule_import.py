@@ -0,0 +1,202 @@
+"""Bulk schedule import from CSV, XLSX and JSONL files.
+
+Rows are streamed from the file, resolved through lookup maps that the
+caller preloads (course code, lecturer username, lab name) and checked
+against an ``OccupancyIndex`` that already holds the existing schedules.
+Accepted rows are added to the same index, so clashes between rows of the
+file are caught as well.
+
+Valid rows are handed to ``insert_chunk`` in batches while the file is
+being read; the caller runs everything inside one transaction and rolls
+back when ``ImportResult.errors`` is not empty.  Only the current batch and
+the first ``MAX_REPORTED_ERRORS`` errors are kept in memory.
+
+Every file needs a header with the columns in ``COLUMNS``.  XLSX support
+needs the optional ``openpyxl`` package.
+"""
+import codecs
+import csv
+import json
+import os
+
+from occupancy import Entry
+from slots import day_index, slot_index
+
+COLUMNS = ('code', 'class_name', 'lecturer', 'lab', 'day', 'time_slot')
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+
+FORMATS = ('.csv', '.xlsx', '.jsonl')
+
+CONFLICT_LABELS = {'lab': 'laboratorium', 'lecturer': 'dosen', 'group': 'kelas'}
+
+
+class ImportFormatError(Exception):
+    """The file cannot be read as a schedule import at all."""
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _check_header(header):
+    missing = [column for column in COLUMNS if column not in header]
+    if missing:
+        raise ImportFormatError(f'Kolom wajib tidak ada: {", ".join(missing)}')
+
+
+def _csv_rows(stream):
+    reader = csv.reader(codecs.iterdecode(stream, 'utf-8-sig'))
+    header = [_clean(name).lower() for name in next(reader, [])]
+    _check_header(header)
+    for line, values in enumerate(reader, start=2):
+        if any(values):
+            yield line, dict(zip(header, values))
+
+
+def _jsonl_rows(stream):
+    for line, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            yield line, None
+            continue
+        if not isinstance(record, dict):
+            yield line, None
+            continue
+        yield line, {key.lower(): value for key, value in record.items()}
+
+
+def _xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError('Import XLSX membutuhkan paket openpyxl')
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFormatError('File XLSX tidak dapat dibaca')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_clean(name).lower() for name in next(rows, ())]
+        _check_header(header)
+        for line, values in enumerate(rows, start=2):
+            if any(value is not None for value in values):
+                yield line, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, filename):
+    """Yield ``(line_number, record)`` pairs from a binary ``stream``.
+
+    ``record`` is None for lines that could not be parsed.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return _csv_rows(stream)
+    if extension == '.jsonl':
+        return _jsonl_rows(stream)
+    if extension == '.xlsx':
+        return _xlsx_rows(stream)
+    raise ImportFormatError(f'Format file harus salah satu dari {", ".join(FORMATS)}')
+
+
+def import_rows(rows, courses, lecturers, labs, class_names, index, insert_chunk, term_id,
+                chunk_size=CHUNK_SIZE):
+    """Validate ``rows`` and pass valid ones to ``insert_chunk`` in batches.
+
+    Every row becomes a schedule of the term ``term_id``.  ``courses``
+    maps a course code to ``(course_id, semester)``, ``lecturers`` a
+    username to a user id and ``labs`` a lab name to a lab id.  Once a row
+    fails, nothing more is inserted but the remaining rows are still
+    validated so the report is complete.
+    """
+    result = ImportResult()
+    chunk = []
+
+    for line, record in rows:
+        if record is None:
+            result.add_error(line, 'Baris tidak dapat dibaca')
+            continue
+        values = {column: _clean(record.get(column)) for column in COLUMNS}
+
+        problems = []
+        course = courses.get(values['code'])
+        if course is None:
+            problems.append(f"Kode mata praktikum '{values['code']}' tidak ditemukan")
+        lecturer_id = lecturers.get(values['lecturer'])
+        if lecturer_id is None:
+            problems.append(f"Dosen '{values['lecturer']}' tidak ditemukan")
+        lab_id = labs.get(values['lab'])
+        if lab_id is None:
+            problems.append(f"Laboratorium '{values['lab']}' tidak ditemukan")
+        day = day_index(values['day'])
+        if day is None:
+            problems.append(f"Hari '{values['day']}' tidak valid")
+        slot = slot_index(values['time_slot'])
+        if slot is None:
+            problems.append(f"Slot waktu '{values['time_slot']}' tidak valid")
+        if values['class_name'] not in class_names:
+            problems.append(f"Kelas '{values['class_name']}' tidak valid")
+        if problems:
+            result.add_error(line, '; '.join(problems))
+            continue
+
+        course_id, semester = course
+        # Rows of the file get negative ids so clashes can name the line
+        entry = Entry(-line, lab_id, lecturer_id, semester, values['class_name'], day, slot, term_id)
+        conflicts = index.conflicts(entry)
+        if conflicts:
+            result.add_error(line, '; '.join(
+                f'Bentrok {CONFLICT_LABELS[kind]} dengan '
+                + (f'baris {-other}' if other < 0 else f'jadwal #{other}')
+                for kind, other in conflicts
+            ))
+            continue
+        index.add(entry)
+
+        if not result.ok:
+            continue
+        chunk.append({
+            'term_id': term_id,
+            'course_id': course_id,
+            'lecturer_id': lecturer_id,
+            'lab_id': lab_id,
+            'day': day,
+            'slot': slot,
+            'class_name': values['class_name'],
+        })
+        if len(chunk) >= chunk_size:
+            insert_chunk(chunk)
+            result.inserted += len(chunk)
+            chunk = []
+
+    if chunk and result.ok:
+        insert_chunk(chunk)
+        result.inserted += len(chunk)
+    return result
@@ -0,0 +1,168 @@
+"""Schedule queries shared by the HTML routes and the JSON API.
+
+Holds the filter translation of the schedule list and the process-wide
+occupancy index used for conflict checks.  The index is built lazily with
+one query and remembers the change journal version it reflects.  Every use
+first applies the journal entries written since, by any process, so inside
+``transactions.write_transaction`` a check against it is exact.  Changing
+the semester of a practicum does not go through the journal.  Such a
+commit writes a new ``changes.reference_version``, which every process
+shares, and an index built under an older reference version is rebuilt.
+``reset_occupancy`` drops the index of the current process at once.
+"""
+import threading
+from collections import namedtuple
+
+from sqlalchemy import func, select
+
+from changes import reference_version
+from models import db, Lab, Practicum, Schedule, ScheduleChange
+from occupancy import Entry as OccupancyEntry, OccupancyIndex
+from slots import ALL_CELLS, day_index
+from terms import selected_term_id
+
+CLASS_NAMES = ['A', 'B', 'C']
+
+CONFLICT_MESSAGES = {
+    'lab': 'Jadwal bentrok dengan jadwal yang sudah ada!',
+    'lecturer': 'Dosen sudah memiliki jadwal di waktu yang sama!',
+    'group': 'Kelas sudah memiliki jadwal di waktu yang sama!',
+}
+
+Availability = namedtuple('Availability', 'lab_id lab_name capacity free')
+
+# Replaying more journal entries than this is slower than a rebuild
+REBUILD_AFTER = 5000
+
+_lock = threading.Lock()
+_occupancy = None
+_occupancy_version = 0
+_occupancy_reference = None
+
+
+def occupancy_entries():
+    """Yield an occupancy ``Entry`` for every schedule with a single query."""
+    rows = db.session.query(
+        Schedule.id, Schedule.lab_id, Schedule.lecturer_id, Practicum.semester,
+        Schedule.class_name, Schedule.day, Schedule.slot, Schedule.term_id
+    ).outerjoin(Practicum)
+    for row in rows:
+        yield OccupancyEntry(*row)
+
+
+def _journal_entries(version):
+    rows = db.session.execute(
+        select(ScheduleChange.op, ScheduleChange.schedule_id, ScheduleChange.lab_id,
+               ScheduleChange.lecturer_id, Practicum.semester, ScheduleChange.class_name,
+               ScheduleChange.day, ScheduleChange.slot, ScheduleChange.term_id)
+        .outerjoin(Practicum, Practicum.id == ScheduleChange.course_id)
+        .where(ScheduleChange.id > version)
+        .order_by(ScheduleChange.id)
+    )
+    for op, *values in rows:
+        yield op, OccupancyEntry(*values)
+
+
+def _refresh():
+    """Bring the index up to the latest journal version; hold ``_lock``."""
+    global _occupancy, _occupancy_version, _occupancy_reference
+    latest = db.session.scalar(select(func.max(ScheduleChange.id))) or 0
+    reference = reference_version()
+    if (_occupancy is None or reference != _occupancy_reference
+            or latest - _occupancy_version > REBUILD_AFTER):
+        # Rows committed after ``latest`` was read are replayed next time,
+        # which adds them again and does no harm
+        _occupancy = OccupancyIndex(occupancy_entries())
+        _occupancy_reference = reference
+    elif latest > _occupancy_version:
+        for op, entry in _journal_entries(_occupancy_version):
+            if op == 'delete':
+                _occupancy.remove(entry.id)
+            else:
+                _occupancy.add(entry)
+    _occupancy_version = latest
+    return _occupancy
+
+
+def find_conflicts(entry):
+    """Return ``(kind, schedule_id)`` for every schedule clashing with
+    ``entry``, see ``OccupancyIndex.conflicts``."""
+    with _lock:
+        return _refresh().conflicts(entry)
+
+
+def index_conflict(entry, error):
+    """The ``CONFLICT_MESSAGES`` kind behind the unique index ``error``
+    raised while writing ``entry``.  The schedule that won the race is
+    committed by now, so the index finds it; the violated index name in the
+    error is the fallback."""
+    conflicts = find_conflicts(entry)
+    if conflicts:
+        return conflicts[0][0]
+    return 'lecturer' if 'lecturer_id' in str(error.orig) else 'lab'
+
+
+def occupancy_snapshot():
+    """Return an up to date copy of the index that the caller may change."""
+    with _lock:
+        return _refresh().copy()
+
+
+def availability(term_id, lecturer_id, semester, class_name, min_capacity=0, ignore=None):
+    """Return an ``Availability`` for every lab with at least
+    ``min_capacity`` seats and a cell of term ``term_id`` where the lab, the
+    lecturer and the class group are all free.  ``free`` is the bitmask of those cells, see
+    ``slots``.  Schedule ``ignore`` does not count, so an edited session
+    can stay where it is."""
+    labs = db.session.execute(
+        select(Lab.id, Lab.lab_name, Lab.capacity)
+        .where(Lab.capacity >= min_capacity)
+        .order_by(Lab.lab_name, Lab.id)
+    ).all()
+    result = []
+    with _lock:
+        index = _refresh()
+        blocked = (index.busy(('lecturer', term_id, lecturer_id), ignore)
+                   | index.busy(('group', term_id, semester, class_name), ignore))
+        for lab_id, lab_name, capacity in labs:
+            free = ALL_CELLS & ~(blocked | index.busy(('lab', term_id, lab_id), ignore))
+            if free:
+                result.append(Availability(lab_id, lab_name, capacity, free))
+    return result
+
+
+def reset_occupancy():
+    """Drop the index after changes the journal does not record; it is
+    rebuilt on next use."""
+    global _occupancy
+    with _lock:
+        _occupancy = None
+
+
+def schedule_filters(user, args, model=Schedule):
+    """Translate the role and the request args into filter conditions.
+
+    Without ``term_id`` in ``args`` only the active term is shown.
+    ``model`` may also be ``ScheduleArchive``, which has the same columns
+    and holds the semester itself.
+    """
+    conditions = [model.term_id == selected_term_id(args)]
+    if user.role == 'lecturer':
+        conditions.append(model.lecturer_id == user.id)
+    if args.get('lab_id'):
+        conditions.append(model.lab_id == args.get('lab_id', type=int))
+    if args.get('lecturer_id'):
+        conditions.append(model.lecturer_id == args.get('lecturer_id', type=int))
+    if args.get('day'):
+        conditions.append(model.day == day_index(args['day']))
+    if args.get('class_name'):
+        conditions.append(model.class_name == args['class_name'])
+    if args.get('semester'):
+        semester = args.get('semester', type=int)
+        if model is Schedule:
+            conditions.append(Schedule.course_id.in_(
+                db.session.query(Practicum.id).filter(Practicum.semester == semester)
+            ))
+        else:
+            conditions.append(model.semester == semester)
+    return conditions
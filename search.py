@@ -0,0 +1,187 @@
+"""Full-text search over practicums, lecturers, labs and schedules.
+
+Everything searchable lives in the SQLite FTS5 table ``search_index``, one
+document per row: a title (code and name) and a detail line (for a
+schedule the lecturer, lab, day and class group).  Triggers on the source
+tables keep it up to date in the same transaction as every insert, update
+and delete, from the pages, the API, imports and the generator alike; a
+renamed practicum, lab or lecturer rewrites the documents of its
+schedules.  See ``migrations.SEARCH_INDEX_STATEMENTS``.
+
+The tokenizer folds case and drops diacritics, so ``sutiyono`` finds
+``Sutiyóno``, and the words of a query are prefixes (``bas dat sut``).
+The index keeps the prefixes of two to six characters, so a typeahead
+query reads one doclist per word instead of merging those of every word
+with that prefix.
+
+Ranking does not use bm25: its weights need the number of documents of
+every word, which costs as much as reading all matches, and a word like
+``lab`` matches every schedule of a term.  Instead the first
+``CANDIDATES`` matches of each kind are scored here, a word found in the
+title weighing ``TITLE_WEIGHT`` times one found in the detail line, and
+shorter titles first.  Practicums, lecturers and labs come before
+schedules.  The term and lecturer of a schedule are tokens of the
+``scope`` column, so those filters are part of the full-text query too.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+from flask import url_for
+from sqlalchemy import insert, text
+
+from migrations import SEARCH_INDEX_FILL, SEARCH_KIND_STRIDE, SEARCH_KINDS, search_kind_base
+from models import db
+
+Result = namedtuple('Result', 'kind id title detail')
+
+MIN_QUERY = 2
+MAX_WORDS = 8
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+CANDIDATES = 200
+TITLE_WEIGHT = 10
+# Longest prefix in the index, see migrations.SEARCH_INDEX_STATEMENTS
+PREFIX_INDEX = 6
+
+# Rows per INSERT statement of insert_rows; SQLAlchemy makes batches
+# smaller when they would need more parameters than SQLite accepts
+INSERT_BATCH = 5000
+
+# Kinds each role may search; lecturers only find their own schedules
+ROLE_KINDS = {
+    'admin': SEARCH_KINDS,
+    'staff': SEARCH_KINDS,
+    'lecturer': ('schedule',),
+}
+
+_words = re.compile(r'[^\W_]+')
+
+
+def fold(value):
+    """Lower case without diacritics, like the tokenizer of the index."""
+    if value.isascii():
+        return value.lower()
+    decomposed = unicodedata.normalize('NFKD', value.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def query_words(query):
+    """The words of ``query`` that are searched for, or [] when it is too
+    short to search.  Single letters (the M of "M.Kom") would match
+    nearly everything and are left out."""
+    words = [word for word in _words.findall(fold(query)) if len(word) >= MIN_QUERY]
+    return words[:MAX_WORDS]
+
+
+def match_expression(words):
+    """FTS5 query for ``words`` on the title and detail columns, quoted so
+    FTS5 syntax in the input is taken literally.
+
+    Words are prefixes, except that a word longer than ``PREFIX_INDEX``
+    characters before the last one is taken as typed in full: the index
+    has no prefixes that long, and a prefix query without one merges the
+    matches of every word it starts.
+    """
+    terms = [f'"{word}"' if len(word) > PREFIX_INDEX and position < len(words) - 1 else f'"{word}"*'
+             for position, word in enumerate(words)]
+    return '{title detail} : (' + ' '.join(terms) + ')'
+
+
+def _score(words, title, detail):
+    title_words = _words.findall(fold(title))
+    score = 0
+    for word in words:
+        if word in title_words:
+            score += TITLE_WEIGHT + 1
+        elif any(title_word.startswith(word) for title_word in title_words):
+            score += TITLE_WEIGHT
+        else:
+            score += 1
+    return score
+
+
+def _candidates(expression, condition=''):
+    return db.session.execute(text(
+        f'SELECT rowid, title, detail FROM search_index WHERE search_index MATCH :expression{condition}'
+        ' LIMIT :candidates'
+    ), {'expression': expression, 'candidates': CANDIDATES}).all()
+
+
+def _best(words, rows, limit):
+    ranked = sorted(rows, key=lambda row: (-_score(words, row.title, row.detail), len(row.title), row.rowid))
+    return [Result(SEARCH_KINDS[row.rowid // SEARCH_KIND_STRIDE], row.rowid % SEARCH_KIND_STRIDE,
+                   row.title, row.detail)
+            for row in ranked[:limit]]
+
+
+def search(user, query, term_id, kinds=None, limit=DEFAULT_LIMIT):
+    """The best matches of ``query`` that ``user`` may see.
+
+    Schedules come from the term ``term_id`` only.  ``kinds`` narrows the
+    result to some of ``SEARCH_KINDS``.
+    """
+    words = query_words(query)
+    allowed = [kind for kind in ROLE_KINDS.get(user.role, ()) if not kinds or kind in kinds]
+    if not words or not allowed:
+        return []
+    limit = min(max(limit, 1), MAX_LIMIT)
+    expression = match_expression(words)
+
+    rows = []
+    for kind in allowed:
+        if kind != 'schedule':
+            # One query per kind, so many matching practicums cannot crowd out the labs
+            base = search_kind_base(kind)
+            rows += _candidates(expression, f' AND rowid >= {base} AND rowid < {base + SEARCH_KIND_STRIDE}')
+    results = _best(words, rows, limit)
+
+    if 'schedule' in allowed and len(results) < limit and term_id is not None:
+        scope = f'scope : "t{int(term_id)}"'
+        if user.role == 'lecturer':
+            scope += f' AND scope : "l{int(user.id)}"'
+        results += _best(words, _candidates(f'{expression} AND {scope}'), limit - len(results))
+    return results
+
+
+def describe(result, user):
+    """JSON-ready ``result`` with the page it leads ``user`` to."""
+    if result.kind == 'schedule':
+        if user.role in ('admin', 'staff'):
+            url = url_for('schedules.edit_schedule', id=result.id)
+        else:
+            url = url_for('schedules.schedules')
+    elif result.kind == 'practicum':
+        url = url_for('courses.edit_course', id=result.id)
+    elif result.kind == 'lab':
+        url = url_for('labs.edit_lab', id=result.id)
+    else:
+        url = url_for('schedules.timetable_grid', lecturer_id=result.id)
+    return {'kind': result.kind, 'id': result.id, 'title': result.title, 'detail': result.detail, 'url': url}
+
+
+def insert_rows(model, rows):
+    """Insert many ``rows`` of a table with search triggers.
+
+    SQLite opens a statement savepoint for a statement that fires
+    triggers, and FTS5 writes out its pending changes at every savepoint.
+    A plain executemany runs a statement per row and so writes an index
+    segment per row; with RETURNING SQLAlchemy sends the rows as
+    multi-row INSERT statements instead ("insertmanyvalues"), of
+    ``INSERT_BATCH`` rows each.
+    """
+    if rows:
+        statement = insert(model).returning(model.id).execution_options(insertmanyvalues_page_size=INSERT_BATCH)
+        db.session.execute(statement, rows)
+
+
+def rebuild():
+    """Write the whole index again from the tables; returns the number of
+    documents."""
+    db.session.execute(text('DELETE FROM search_index'))
+    for statement in SEARCH_INDEX_FILL:
+        db.session.execute(text(statement))
+    db.session.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+    count = db.session.scalar(text('SELECT count(*) FROM search_index'))
+    db.session.commit()
+    return count
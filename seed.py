@@ -0,0 +1,313 @@
+"""Schema setup, sample data and synthetic datasets.
+
+Nothing here runs when the application starts.  A new installation runs
+``flask --app app db-upgrade`` once to create or upgrade the schema and
+``flask --app app seed`` to load the sample data; both do nothing when
+there is nothing to do, so deployment scripts can run them every time.
+"""
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+import jobs
+import migrations
+import synthetic
+import terms
+from models import db, Lab, Practicum, Schedule, TimeSlot, User
+from occupancy import Entry as OccupancyEntry, OccupancyIndex
+from scheduling import reset_occupancy
+from slots import TIME_SLOTS, day_index, slot_index
+
+
+def init_app(app):
+    for command in (db_upgrade_command, seed_command, generate_dataset_command):
+        app.cli.add_command(command)
+
+
+# Database setup
+def init_time_slots():
+    """Make sure the time_slot table holds the 100-minute slot pattern."""
+    existing = {slot_id for (slot_id,) in db.session.query(TimeSlot.id)}
+    for index, label in enumerate(TIME_SLOTS):
+        if index not in existing:
+            start_time, end_time = label.split('-')
+            db.session.add(TimeSlot(id=index, label=label, start_time=start_time, end_time=end_time))
+    db.session.commit()
+
+
+def setup_database():
+    """Upgrade an existing database file, then create any missing tables."""
+    for number in migrations.upgrade(db.engine.url.database):
+        print(f'Migrasi {number} selesai')
+    db.create_all()
+    init_time_slots()
+    terms.ensure_active_term(current_app.config['TERM_WEEKS'])
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """Apply pending schema migrations to the configured database."""
+    setup_database()
+    click.echo(f'Skema database versi {migrations.LATEST}')
+
+
+# Initialize database with sample data
+def init_sample_data(hash_method='scrypt'):
+    """Load the sample data into an empty database; returns whether it did."""
+    # Cek apakah sudah ada data
+    if User.query.first() is None:
+        # Create default admin
+        admin = User(
+            username='admin',
+            password=generate_password_hash('admin123', method=hash_method),
+            role='admin',
+            full_name='Administrator'
+        )
+        db.session.add(admin)
+        
+        # Create sample staff
+        staff = User(
+            username='labstaff',
+            password=generate_password_hash('staff123', method=hash_method),
+            role='staff',
+            full_name='Laboratory Staff'
+        )
+        db.session.add(staff)
+        
+        # Create Lecturers
+        lecturers = [
+            {'username': 'bayu', 'name': 'Mohammad Bayu A, S.Kom, M.Kom'},
+            {'username': 'sutiyono', 'name': 'Sutiyono, ST, M.Kom'},
+            {'username': 'khilda', 'name': 'Khilda Nistrina, S.Pd., M.Sc'},
+            {'username': 'ahmad', 'name': 'Ahmad Faojan M, S.Kom'},
+            {'username': 'rosmalina', 'name': 'Rosmalina, ST., M.Kom'},
+            {'username': 'denny', 'name': 'Denny Rusdianto, ST., M.Kom'},
+            {'username': 'cecep', 'name': 'Cecep Suwanda, S.Si., M.Kom'},
+        ]
+        
+        lecturer_objs = {}
+        for l in lecturers:
+            user = User(
+                username=l['username'],
+                password=generate_password_hash('123456', method=hash_method),
+                role='lecturer',
+                full_name=l['name']
+            )
+            db.session.add(user)
+            lecturer_objs[l['username']] = user
+        
+        db.session.commit() # Commit to get IDs
+
+        # Create Laboratories
+        labs = [
+            Lab(lab_name='Lab Komputer 1', capacity=30),
+            Lab(lab_name='Lab Komputer 2', capacity=30),
+        ]
+        db.session.add_all(labs)
+        db.session.commit()
+        
+        lab1 = labs[0]
+        lab2 = labs[1]
+
+        # Create Practicums
+        # Format: (Code, Name, Semester, SKS)
+        courses_data = [
+            ('TIF301', 'Praktikum Sistem Multimedia', 3, 3),
+            ('TIF302', 'Praktikum Pengantar Pemograman Game', 3, 3),
+            ('TIF501', 'Praktikum Pembelajaran Mesin', 5, 3),
+            ('TIF502', 'Praktikum Pemograman Visual', 5, 3),
+            ('TIF503', 'Praktikum Sistem Operasi dan Jaringan Komputer', 5, 3),
+            ('TIF701', 'Praktikum IoT', 7, 3),
+            ('TIF504', 'Praktikum Pemodelan dan Simulasi', 5, 3),
+            ('TIF101', 'Praktikum Statistik & Probabilitas', 1, 3),
+            ('TIF303', 'Praktikum GitHub', 3, 2),
+            ('TIF304', 'Praktikum Sistem Basis Data', 3, 3),
+            ('TIF305', 'Praktikum Aplikasi Dasar Komputer', 3, 3),
+            ('TIF702', 'Praktikum Sistem Informasi Geografis', 7, 3),
+            ('TIF306', 'Praktikum Analisis dan Perancangan SI', 3, 3),
+            ('TIF102', 'Praktikum Algoritma dan Pemrograman 1', 1, 3),
+            ('TIF103', 'Praktikum Data Analisis Dasar', 1, 3),
+            ('TIF505', 'Praktikum Pengelolaan Proyek SI', 5, 3),
+            ('TIF104', 'Praktikum Akuntansi', 1, 3),
+            ('TIF307', 'Praktikum Bahasa Pemograman Tingkat Rendah', 3, 3),
+        ]
+        
+        course_objs = {}
+        for code, name, sem, sks in courses_data:
+            course = Practicum(code=code, practicum_name=name, semester=sem, sks=sks)
+            db.session.add(course)
+            course_objs[name] = course # Map by name for easy lookup
+        
+        db.session.commit()
+
+        # Helper to get course by partial name pattern if needed, but we used exact names above
+        def get_course(name):
+            return course_objs.get(name)
+
+        # Helper to create schedule; rows that clash with an earlier row are
+        # skipped because the database refuses double bookings
+        seeded = OccupancyIndex()
+        term_id = terms.active_term_id()
+        def create_sched(lab, day, time, course_name, lecturer_user, class_name):
+            course = get_course(course_name)
+            lecturer = lecturer_objs[lecturer_user]
+            if course and lecturer:
+                entry = OccupancyEntry(len(seeded) + 1, lab.id, lecturer.id, course.semester,
+                                       class_name, day_index(day), slot_index(time), term_id)
+                if seeded.conflicts(entry):
+                    print(f'Jadwal dilewati karena bentrok: {day} {time} {course_name} ({lecturer_user})')
+                    return
+                seeded.add(entry)
+                sched = Schedule(
+                    term_id=term_id,
+                    course_id=course.id,
+                    lecturer_id=lecturer.id,
+                    lab_id=lab.id,
+                    day=entry.day,
+                    slot=entry.slot,
+                    class_name=class_name
+                )
+                db.session.add(sched)
+
+        # --- LAB 1 SCHEDULES ---
+        # Senin
+        create_sched(lab1, 'Senin', '08:00-09:40', 'Praktikum Sistem Multimedia', 'bayu', 'B') # 3B inferred
+        create_sched(lab1, 'Senin', '10:00-11:40', 'Praktikum Sistem Multimedia', 'bayu', 'A') # 3A inferred
+        create_sched(lab1, 'Senin', '13:00-14:40', 'Praktikum Pengantar Pemograman Game', 'sutiyono', 'A') # 3A
+        create_sched(lab1, 'Senin', '15:00-16:40', 'Praktikum Pengantar Pemograman Game', 'sutiyono', 'B') # 3B
+        create_sched(lab1, 'Senin', '17:00-18:40', 'Praktikum Sistem Multimedia', 'bayu', 'C') # 3C
+        
+        # Selasa
+        create_sched(lab1, 'Selasa', '08:00-09:40', 'Praktikum Pembelajaran Mesin', 'bayu', 'A')
+        create_sched(lab1, 'Selasa', '13:00-14:40', 'Praktikum Pembelajaran Mesin', 'bayu', 'B')
+        create_sched(lab1, 'Selasa', '15:00-16:40', 'Praktikum Pemograman Visual', 'khilda', 'A') # 5PAGI
+        create_sched(lab1, 'Selasa', '17:00-18:40', 'Praktikum Sistem Operasi dan Jaringan Komputer', 'ahmad', 'C') 
+        
+        # Rabu
+        create_sched(lab1, 'Rabu', '10:00-11:40', 'Praktikum IoT', 'sutiyono', 'A')
+        create_sched(lab1, 'Rabu', '13:00-14:40', 'Praktikum IoT', 'sutiyono', 'B')
+        create_sched(lab1, 'Rabu', '17:00-18:40', 'Praktikum IoT', 'sutiyono', 'C')
+        # 19:00 Pemodelan dan Simulasi (Bayu) 5C - skipped or mapped to 17:00 if allowed (but 17:00 taken). Skipped.
+        
+        # Jumat
+        create_sched(lab1, 'Jumat', '08:00-09:40', 'Praktikum GitHub', 'sutiyono', 'A') # ?PAGI
+        create_sched(lab1, 'Jumat', '10:00-11:40', 'Praktikum Sistem Basis Data', 'sutiyono', 'A') # 5PAGI
+        create_sched(lab1, 'Jumat', '15:00-16:40', 'Praktikum Aplikasi Dasar Komputer', 'denny', 'A') # 3PAGI
+        create_sched(lab1, 'Jumat', '17:00-18:40', 'Praktikum Sistem Informasi Geografis', 'ahmad', 'C')
+        
+        # Sabtu
+        create_sched(lab1, 'Sabtu', '08:00-09:40', 'Praktikum Aplikasi Dasar Komputer', 'denny', 'A') # 3SORE (A)
+        create_sched(lab1, 'Sabtu', '10:00-11:40', 'Praktikum Pemodelan dan Simulasi', 'bayu', 'A') # 5A
+        create_sched(lab1, 'Sabtu', '13:00-14:40', 'Praktikum Analisis dan Perancangan SI', 'denny', 'A') # 3PAGI
+        create_sched(lab1, 'Sabtu', '17:00-18:40', 'Praktikum Analisis dan Perancangan SI', 'denny', 'C') # 3SORE
+        
+        # --- LAB 2 SCHEDULES ---
+        # Senin
+        create_sched(lab2, 'Senin', '08:00-09:40', 'Praktikum Data Analisis Dasar', 'sutiyono', 'B') # 1B
+        create_sched(lab2, 'Senin', '10:00-11:40', 'Praktikum Aplikasi Dasar Komputer', 'sutiyono', 'B') # 1B
+        create_sched(lab2, 'Senin', '13:00-14:40', 'Praktikum GitHub', 'sutiyono', 'B') # 7B
+        create_sched(lab2, 'Senin', '15:00-16:40', 'Praktikum Data Analisis Dasar', 'sutiyono', 'A') # 1A
+        create_sched(lab2, 'Senin', '17:00-18:40', 'Praktikum Aplikasi Dasar Komputer', 'sutiyono', 'C') # 1C
+        
+        # Selasa
+        create_sched(lab2, 'Selasa', '08:00-09:40', 'Praktikum Sistem Basis Data', 'sutiyono', 'A') # 5A
+        create_sched(lab2, 'Selasa', '10:00-11:40', 'Praktikum Pengelolaan Proyek SI', 'rosmalina', 'A') # 7PAGI
+        create_sched(lab2, 'Selasa', '13:00-14:40', 'Praktikum Sistem Basis Data', 'sutiyono', 'B') # 5B
+        create_sched(lab2, 'Selasa', '15:00-16:40', 'Praktikum Aplikasi Dasar Komputer', 'sutiyono', 'A') # 1A
+        create_sched(lab2, 'Selasa', '17:00-18:40', 'Praktikum Sistem Basis Data', 'sutiyono', 'C') # 5C
+        
+        # Rabu
+        create_sched(lab2, 'Rabu', '08:00-09:40', 'Praktikum GitHub', 'sutiyono', 'A') # 7A
+        create_sched(lab2, 'Rabu', '10:00-11:40', 'Praktikum Statistik & Probabilitas', 'rosmalina', 'A') # 1PAGI
+        create_sched(lab2, 'Rabu', '13:00-14:40', 'Praktikum Analisis Data', 'sutiyono', 'A') # ?PAGI
+        create_sched(lab2, 'Rabu', '15:00-16:40', 'Praktikum Akuntansi', 'khilda', 'A') # 3PAGI
+        
+        # Kamis
+        create_sched(lab2, 'Kamis', '08:00-09:40', 'Praktikum Algoritma dan Pemrograman 1', 'cecep', 'A') # 1PAGI
+        create_sched(lab2, 'Kamis', '10:00-11:40', 'Praktikum Algoritma dan Pemrograman 1', 'ahmad', 'A') # 1A
+        create_sched(lab2, 'Kamis', '13:00-14:40', 'Praktikum Algoritma dan Pemrograman 1', 'ahmad', 'B') # 1B
+        create_sched(lab2, 'Kamis', '15:00-16:40', 'Praktikum Sistem Operasi dan Jaringan Komputer', 'sutiyono', 'A') # 5PAGI
+        create_sched(lab2, 'Kamis', '17:00-18:40', 'Praktikum Algoritma dan Pemrograman 1', 'ahmad', 'C') # 1C
+        
+        # Jumat
+        create_sched(lab2, 'Jumat', '08:00-09:40', 'Praktikum Sistem Informasi Geografis', 'ahmad', 'A') # 7A
+        create_sched(lab2, 'Jumat', '10:00-11:40', 'Praktikum Sistem Informasi Geografis', 'ahmad', 'B') # 7B
+        create_sched(lab2, 'Jumat', '17:00-18:40', 'Praktikum Sistem Basis Data', 'sutiyono', 'C') # ?SORE ?? Duplicate? Image has Basis Data at 17:00
+        
+        # Sabtu
+        create_sched(lab2, 'Sabtu', '08:00-09:40', 'Praktikum Sistem Operasi dan Jaringan Komputer', 'ahmad', 'A') # ?
+        create_sched(lab2, 'Sabtu', '10:00-11:40', 'Praktikum Sistem Operasi dan Jaringan Komputer', 'ahmad', 'B') # 5B
+        create_sched(lab2, 'Sabtu', '13:00-14:40', 'Praktikum Bahasa Pemograman Tingkat Rendah', 'ahmad', 'B') # ?
+        create_sched(lab2, 'Sabtu', '15:00-16:40', 'Praktikum Bahasa Pemograman Tingkat Rendah', 'ahmad', 'C') # 5B?
+
+        db.session.commit()
+        print('Database berhasil diinisialisasi dengan data real dari gambar!')
+        return True
+    return False
+
+
+@click.command('seed')
+@click.option('--hash-method', default='scrypt', show_default=True,
+              help="Werkzeug hash method, e.g. 'pbkdf2:sha256:1000' for throwaway test databases.")
+@with_appcontext
+def seed_command(hash_method):
+    """Set up the schema, then load the sample users, labs, practicums and
+    schedules when the database is empty."""
+    setup_database()
+    if not init_sample_data(hash_method):
+        click.echo('Database sudah berisi data, data sampel tidak dimuat')
+
+
+# Synthetic datasets
+
+@click.command('generate-dataset')
+@click.option('--faculties', default=4, show_default=True)
+@click.option('--labs', 'labs_per_faculty', default=10, show_default=True, help='Labs per faculty.')
+@click.option('--lecturers', 'lecturers_per_faculty', default=30, show_default=True, help='Lecturers per faculty.')
+@click.option('--practicums', 'practicums_per_semester', default=6, show_default=True,
+              help='Practicums per semester of a faculty.')
+@click.option('--semesters', default=8, show_default=True)
+@click.option('--classes', default=3, show_default=True, help='Class groups per semester.')
+@click.option('--sessions', 'sessions_per_class', default=1, show_default=True,
+              help='Weekly sessions of every (practicum, class) pair.')
+@click.option('--conflicts', default=0, show_default=True, help='Extra sessions that double book a class group.')
+@click.option('--prefix', default='syn', show_default=True, help='Prefix of generated usernames and codes.')
+@click.option('--password', default='123456', show_default=True, help='Password of every generated lecturer.')
+@click.option('--hash-method', default='scrypt', show_default=True,
+              help="Werkzeug hash method, e.g. 'pbkdf2:sha256:1000' for quick throwaway data.")
+@click.option('--workers', type=int, help='Password hashing processes (default: CPU count).')
+@click.option('--seed', default=0, show_default=True)
+@with_appcontext
+def generate_dataset_command(**options):
+    """Fill the database with a synthetic multi-faculty dataset."""
+    spec = synthetic.DatasetSpec(**options)
+    click.echo(f'Membuat {spec.schedules} sesi untuk {spec.faculties} fakultas...')
+    try:
+        summary = synthetic.generate(spec, log=click.echo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    reset_occupancy()
+    click.echo(f'labs={summary.labs} lecturers={summary.lecturers} practicums={summary.practicums} '
+               f'schedules={summary.schedules} unplaced={summary.unplaced} conflicts={summary.conflicts}')
+    click.echo(' '.join(f'{name}={seconds:.2f}s' for name, seconds in summary.timings.items()))
+
+
+@jobs.task('dataset', 'Data sintetis', roles=('admin',))
+def dataset_job(context, faculties=4, labs_per_faculty=10, lecturers_per_faculty=30,
+                practicums_per_semester=6, semesters=8, classes=3, sessions_per_class=1,
+                conflicts=0, prefix='syn', password='123456', hash_method='scrypt', seed=0):
+    # Named parameters, so jobs.submit rejects unknown options up front
+    spec = synthetic.DatasetSpec(
+        faculties=faculties, labs_per_faculty=labs_per_faculty, lecturers_per_faculty=lecturers_per_faculty,
+        practicums_per_semester=practicums_per_semester, semesters=semesters, classes=classes,
+        sessions_per_class=sessions_per_class, conflicts=conflicts, prefix=prefix, password=password,
+        hash_method=hash_method, seed=seed)
+    context.progress(0, spec.schedules, f'Membuat {spec.schedules} sesi untuk {spec.faculties} fakultas')
+    summary = synthetic.generate(spec, log=lambda message: context.progress(0, message=message))
+    reset_occupancy()
+    context.progress(summary.schedules, message=f'{summary.schedules} jadwal dibuat')
+    return {'labs': summary.labs, 'lecturers': summary.lecturers, 'practicums': summary.practicums,
+            'schedules': summary.schedules, 'unplaced': summary.unplaced, 'conflicts': summary.conflicts,
+            'timings': summary.timings}
@@ -0,0 +1,62 @@
+"""Weekly day and time-slot layout shared by the scheduling modules.
+
+A week is a grid of ``len(DAYS) * len(TIME_SLOTS)`` cells.  Cell ``c`` of
+day ``d`` and slot ``s`` is ``d * len(TIME_SLOTS) + s``; occupancy of a
+resource (lab, lecturer, class group) over the week fits in one integer
+where bit ``c`` is set when the cell is taken.
+"""
+
+DAYS = ['Senin', 'Selasa', 'Rabu', 'Kamis', 'Jumat', 'Sabtu']
+
+# 100-minute sessions, see "Slot Waktu Praktikum" in README.md
+TIME_SLOTS = [
+    '08:00-09:40',
+    '10:00-11:40',
+    '13:00-14:40',
+    '15:00-16:40',
+    '17:00-18:40',
+]
+
+EVENING_SLOT = len(TIME_SLOTS) - 1
+CELL_COUNT = len(DAYS) * len(TIME_SLOTS)
+ALL_CELLS = (1 << CELL_COUNT) - 1
+
+
+def cell_of(day, slot):
+    return day * len(TIME_SLOTS) + slot
+
+
+def split_cell(cell):
+    return divmod(cell, len(TIME_SLOTS))
+
+
+def day_index(value):
+    """Return the index of a day given as a name ('Senin') or an index
+    ('0'), or None if it is not a teaching day."""
+    if value in DAYS:
+        return DAYS.index(value)
+    try:
+        index = int(value)
+    except (TypeError, ValueError):
+        return None
+    return index if 0 <= index < len(DAYS) else None
+
+
+def slot_index(value):
+    """Return the index of a time slot given as a label ('08:00-09:40') or
+    an index ('0'), or None if it is unknown."""
+    if value in TIME_SLOTS:
+        return TIME_SLOTS.index(value)
+    try:
+        index = int(value)
+    except (TypeError, ValueError):
+        return None
+    return index if 0 <= index < len(TIME_SLOTS) else None
+
+
+def iter_cells(mask):
+    """Yield the cell numbers of the bits set in ``mask``, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
@@ -31,6 +31,11 @@ call venv\Scripts\activate.bat
 echo Menginstall dependencies...
 pip install -r requirements.txt
 
+echo.
+echo Menyiapkan database...
+flask --app app db-upgrade
+flask --app app seed
+
 echo.
 echo Memulai aplikasi...
 echo Aplikasi akan berjalan di: http://localhost:5000
@@ -30,6 +30,11 @@ source venv/bin/activate
 echo "Menginstall dependencies..."
 pip install -r requirements.txt
 
+echo
+echo "Menyiapkan database..."
+flask --app app db-upgrade
+flask --app app seed
+
 echo
 echo "Memulai aplikasi..."
 echo "Aplikasi akan berjalan di: http://localhost:5000"
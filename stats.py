@@ -0,0 +1,103 @@
+"""SQL-side statistics for the dashboard and the schedule list.
+
+Every number is computed with COUNT / GROUP BY / COUNT DISTINCT queries and
+memoized per process.  The memo is cleared whenever a commit touches one of
+``WATCHED_TABLES`` and entries are keyed on ``changes.data_version()``, so
+a change made by another worker process is seen on the next request.
+``TTL`` is only a safety net for data changed outside the application.
+"""
+import threading
+import time
+
+from sqlalchemy import distinct, func, select
+
+from changes import data_version, on_commit
+from models import db, Lab, Practicum, Schedule, Term, User
+
+WATCHED_TABLES = {'schedule', 'lab', 'practicum', 'user', 'term'}
+
+TTL = 60
+MAX_ENTRIES = 512
+
+_cache = {}
+_lock = threading.Lock()
+_generation = 0
+
+
+def clear():
+    global _generation
+    with _lock:
+        _cache.clear()
+        _generation += 1
+
+
+@on_commit
+def _invalidate(tables):
+    if tables & WATCHED_TABLES:
+        clear()
+
+
+def _memoize(key, compute):
+    key = (data_version(), key)
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        generation = _generation
+
+    value = compute()
+
+    with _lock:
+        # Do not store a value computed while a commit invalidated the memo
+        if generation == _generation:
+            if len(_cache) >= MAX_ENTRIES:
+                _cache.clear()
+            _cache[key] = (now + TTL, value)
+    return value
+
+
+def totals():
+    """Row counts of the active term's schedules, practicums, labs and
+    users in one query."""
+    def compute():
+        active = select(Term.id).where(Term.status == 'active').scalar_subquery()
+        row = db.session.execute(select(
+            select(func.count(Schedule.id)).where(Schedule.term_id == active).scalar_subquery(),
+            select(func.count(Practicum.id)).scalar_subquery(),
+            select(func.count(Lab.id)).scalar_subquery(),
+            select(func.count(User.id)).scalar_subquery(),
+        )).one()
+        return {'schedules': row[0], 'courses': row[1], 'labs': row[2], 'users': row[3]}
+    return _memoize(('totals',), compute)
+
+
+def schedule_count(key, conditions):
+    """Number of schedules matching ``conditions``; ``key`` identifies the
+    conditions in the memo."""
+    def compute():
+        return db.session.query(func.count(Schedule.id)).filter(*conditions).scalar()
+    return _memoize(('count', key), compute)
+
+
+def schedule_statistics(key, conditions):
+    """Counts for the statistics panels of the schedule list."""
+    def compute():
+        total, unique_courses, unique_lecturers = db.session.query(
+            func.count(Schedule.id),
+            func.count(distinct(Schedule.course_id)),
+            func.count(distinct(Schedule.lecturer_id))
+        ).filter(*conditions).one()
+        day_counts = dict(db.session.query(Schedule.day, func.count(Schedule.id))
+                          .filter(*conditions).group_by(Schedule.day))
+        lab_counts = db.session.query(Lab.lab_name, func.count(Schedule.id)) \
+            .join(Schedule.laboratory).filter(*conditions) \
+            .group_by(Lab.id).order_by(Lab.lab_name).all()
+        return {
+            'total': total,
+            'unique_courses': unique_courses,
+            'unique_lecturers': unique_lecturers,
+            'day_counts': day_counts,
+            'lab_counts': [tuple(row) for row in lab_counts],
+        }
+    return _memoize(('statistics', key), compute)
@@ -0,0 +1,281 @@
+"""Synthetic university-scale datasets for load and scale testing.
+
+A dataset is a number of faculties that each own their labs, lecturers and
+practicums.  Every semester of a faculty has ``classes`` class groups and
+every group takes each practicum of its semester ``sessions_per_class``
+times a week.  The app identifies a class group by ``(semester,
+class_name)`` only, so class names carry a number per faculty ('A1', 'B1',
+..., 'A2', ...) to keep the groups of different faculties, and of earlier
+datasets, apart.
+
+Sessions are placed greedily with one week bitset (see ``slots``) per
+lecturer and class group and a per-cell lab counter, so the result is free
+of clashes.  ``conflicts`` adds that many extra sessions on top which
+deliberately double book a class group.  Lab and lecturer double bookings
+cannot be generated because the unique indexes on ``schedule`` reject them.
+
+Passwords are hashed in a process pool and all rows are written with bulk
+``INSERT`` statements with preassigned ids in one transaction.
+"""
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+
+from models import db, Lab, Practicum, Schedule, User
+from search import insert_rows
+from slots import ALL_CELLS, CELL_COUNT, iter_cells, split_cell
+from terms import active_term_id
+
+TOPICS = [
+    'Algoritma', 'Basis Data', 'Jaringan Komputer', 'Pemrograman Web', 'Sistem Operasi',
+    'Kecerdasan Buatan', 'Grafika Komputer', 'Elektronika', 'Fisika Dasar', 'Kimia Dasar',
+    'Statistika', 'Mikrobiologi', 'Akuntansi', 'Desain Grafis', 'Pemrograman Mobile',
+]
+FIRST_NAMES = [
+    'Agus', 'Budi', 'Citra', 'Dewi', 'Eko', 'Fitri', 'Gilang', 'Hendra', 'Indah', 'Joko',
+    'Kartika', 'Lestari', 'Made', 'Nur', 'Putri', 'Rahmat', 'Sari', 'Taufik', 'Wahyu', 'Yuli',
+]
+LAST_NAMES = [
+    'Pratama', 'Saputra', 'Wijaya', 'Hidayat', 'Kusuma', 'Nugroho', 'Santoso', 'Lestari',
+    'Siregar', 'Nasution', 'Permana', 'Gunawan', 'Setiawan', 'Rahayu', 'Utami',
+]
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    faculties: int = 4
+    labs_per_faculty: int = 10
+    lecturers_per_faculty: int = 30
+    practicums_per_semester: int = 6
+    semesters: int = 8
+    classes: int = 3
+    sessions_per_class: int = 1
+    capacity_range: tuple = (20, 40)
+    conflicts: int = 0
+    prefix: str = 'syn'
+    password: str = '123456'
+    hash_method: str = 'scrypt'
+    workers: int = None
+    seed: int = 0
+
+    @property
+    def schedules(self):
+        return (self.faculties * self.semesters * self.classes
+                * self.practicums_per_semester * self.sessions_per_class)
+
+
+@dataclass
+class DatasetSummary:
+    labs: int = 0
+    lecturers: int = 0
+    practicums: int = 0
+    schedules: int = 0
+    unplaced: int = 0
+    conflicts: int = 0
+    timings: dict = field(default_factory=dict)
+
+
+def class_label(index):
+    """'A', 'B', ..., 'Z', 'AA', 'AB', ... for a 0-based class index."""
+    label = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        label = chr(ord('A') + rest) + label
+    return label
+
+
+def hash_passwords(passwords, method='scrypt', workers=None):
+    """Hash ``passwords`` in a process pool, keeping their order."""
+    hasher = partial(generate_password_hash, method=method)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < 2:
+        return [hasher(password) for password in passwords]
+    # Background jobs call this from a threaded server, whose forked children
+    # could inherit locks held by other threads; fork from a clean process
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver') if 'forkserver' in start_methods else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(pool.map(hasher, passwords, chunksize=chunksize))
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _group_numbers(count):
+    """Pick ``count`` class name suffixes that no existing schedule uses,
+    so a second dataset does not merge into the class groups of the first."""
+    taken = {name for (name,) in db.session.query(Schedule.class_name).distinct()}
+    numbers = []
+    number = 1
+    while len(numbers) < count:
+        if f'{class_label(0)}{number}' not in taken:
+            numbers.append(number)
+        number += 1
+    return numbers
+
+
+def _check(spec):
+    if not 1 <= spec.faculties <= 999:
+        raise ValueError('faculties must be between 1 and 999')
+    if not 1 <= spec.semesters <= 8:
+        raise ValueError('semesters must be between 1 and 8')
+    if spec.classes < 1 or len(class_label(spec.classes - 1)) + len(str(spec.faculties)) > 4:
+        raise ValueError('too many classes for the 5 character class_name column')
+    if spec.practicums_per_semester * spec.sessions_per_class > CELL_COUNT:
+        raise ValueError(f'a class group cannot take more than {CELL_COUNT} sessions a week')
+    if spec.labs_per_faculty < 1 or spec.lecturers_per_faculty < 1:
+        raise ValueError('every faculty needs at least one lab and one lecturer')
+    if User.query.filter(User.username.like(f'{spec.prefix}%')).first() is not None:
+        raise ValueError(f"prefix '{spec.prefix}' is already used, pick another one")
+
+
+def _place_faculty(rng, sessions, lab_ids, lecturer_ids, rows, summary):
+    """Place the sessions of one faculty, appending schedule rows."""
+    lab_used = [0] * CELL_COUNT
+    open_cells = ALL_CELLS
+    lecturer_busy = dict.fromkeys(lecturer_ids, 0)
+    group_busy = {}
+    placed = []
+
+    rng.shuffle(sessions)
+    for practicum_id, semester, class_name, lecturer_id in sessions:
+        group = (semester, class_name)
+        free = open_cells & ~lecturer_busy[lecturer_id] & ~group_busy.get(group, 0)
+        if not free:
+            summary.unplaced += 1
+            continue
+        cell = rng.choice(list(iter_cells(free)))
+        lab_id = lab_ids[lab_used[cell]]
+        lab_used[cell] += 1
+        if lab_used[cell] == len(lab_ids):
+            open_cells &= ~(1 << cell)
+        lecturer_busy[lecturer_id] |= 1 << cell
+        group_busy[group] = group_busy.get(group, 0) | (1 << cell)
+        day, slot = split_cell(cell)
+        rows.append({'course_id': practicum_id, 'lecturer_id': lecturer_id, 'lab_id': lab_id,
+                     'day': day, 'slot': slot, 'class_name': class_name})
+        placed.append((cell, semester, class_name))
+
+    return placed, lab_used, lecturer_busy
+
+
+def generate(spec, log=print):
+    """Write the dataset described by ``spec`` and return a summary.
+
+    The schedules go to the active term.  Raises ValueError when ``spec``
+    cannot be generated; nothing is written in that case.
+    """
+    _check(spec)
+    rng = random.Random(spec.seed)
+    summary = DatasetSummary()
+    started = time.perf_counter()
+
+    lab_id = _next_id(Lab)
+    user_id = _next_id(User)
+    practicum_id = _next_id(Practicum)
+
+    labs, users, practicums, schedules = [], [], [], []
+    faculty_plans = []
+    for faculty, group_number in enumerate(_group_numbers(spec.faculties), start=1):
+        tag = f'{spec.prefix}{faculty:03d}'
+        lab_ids = []
+        for n in range(1, spec.labs_per_faculty + 1):
+            labs.append({'id': lab_id, 'lab_name': f'Lab {tag.upper()}-{n:02d}',
+                         'capacity': rng.randint(*spec.capacity_range)})
+            lab_ids.append(lab_id)
+            lab_id += 1
+
+        lecturer_ids = []
+        for n in range(1, spec.lecturers_per_faculty + 1):
+            users.append({'id': user_id, 'username': f'{tag}_dosen{n:04d}', 'role': 'lecturer',
+                          'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}, M.Kom'})
+            lecturer_ids.append(user_id)
+            user_id += 1
+
+        # Every (practicum, class) pair keeps one lecturer, spread evenly
+        sessions = []
+        practicum_ids = {}
+        load = 0
+        for semester in range(1, spec.semesters + 1):
+            for n in range(1, spec.practicums_per_semester + 1):
+                practicums.append({
+                    'id': practicum_id, 'code': f'{tag.upper()}-{semester}{n:02d}',
+                    'practicum_name': f'Praktikum {rng.choice(TOPICS)} {semester}{n:02d}',
+                    'semester': semester, 'sks': rng.randint(1, 3)})
+                practicum_ids.setdefault(semester, []).append(practicum_id)
+                for class_index in range(spec.classes):
+                    lecturer = lecturer_ids[load % len(lecturer_ids)]
+                    load += 1
+                    class_name = f'{class_label(class_index)}{group_number}'
+                    sessions.extend([(practicum_id, semester, class_name, lecturer)]
+                                    * spec.sessions_per_class)
+                practicum_id += 1
+        faculty_plans.append((faculty, sessions, lab_ids, lecturer_ids, practicum_ids))
+
+    for faculty, sessions, lab_ids, lecturer_ids, practicum_ids in faculty_plans:
+        placed, lab_used, lecturer_busy = _place_faculty(
+            rng, sessions, lab_ids, lecturer_ids, schedules, summary)
+        summary.conflicts += _add_conflicts(
+            rng, spec.conflicts // spec.faculties + (faculty <= spec.conflicts % spec.faculties),
+            placed, lab_ids, lab_used, lecturer_busy, practicum_ids, schedules)
+    summary.timings['plan'] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    passwords = hash_passwords([spec.password] * len(users), spec.hash_method, spec.workers)
+    for user, password in zip(users, passwords):
+        user['password'] = password
+    summary.timings['hash'] = time.perf_counter() - mark
+    log(f'{len(users)} password di-hash dalam {summary.timings["hash"]:.2f} detik')
+
+    mark = time.perf_counter()
+    term_id = active_term_id()
+    for row in schedules:
+        row['term_id'] = term_id
+    insert_rows(Lab, labs)
+    insert_rows(User, users)
+    insert_rows(Practicum, practicums)
+    insert_rows(Schedule, schedules)
+    db.session.commit()
+    summary.timings['insert'] = time.perf_counter() - mark
+    summary.timings['total'] = time.perf_counter() - started
+
+    summary.labs = len(labs)
+    summary.lecturers = len(users)
+    summary.practicums = len(practicums)
+    summary.schedules = len(schedules)
+    return summary
+
+
+def _add_conflicts(rng, count, placed, lab_ids, lab_used, lecturer_busy, practicum_ids, rows):
+    """Add up to ``count`` sessions that double book a class group.
+
+    ``practicum_ids`` maps a semester to the practicums of the faculty.
+    """
+    added = 0
+    rng.shuffle(placed)
+    for cell, semester, class_name in placed:
+        if added == count:
+            break
+        if lab_used[cell] == len(lab_ids):
+            continue
+        lecturer_id = next((lid for lid, busy in lecturer_busy.items() if not busy >> cell & 1), None)
+        if lecturer_id is None:
+            continue
+        lab_id = lab_ids[lab_used[cell]]
+        lab_used[cell] += 1
+        lecturer_busy[lecturer_id] |= 1 << cell
+        day, slot = split_cell(cell)
+        rows.append({'course_id': rng.choice(practicum_ids[semester]), 'lecturer_id': lecturer_id,
+                     'lab_id': lab_id, 'day': day, 'slot': slot, 'class_name': class_name})
+        added += 1
+    return added
@@ -0,0 +1,89 @@
+"""Template rendering for large pages: a persistent bytecode cache, a
+fragment cache and streamed responses.
+
+Compiled templates are kept in the instance folder (``JINJA_CACHE_DIR``),
+so a new worker process loads them instead of compiling every template
+again.  Jinja checks the source checksum, so an edited template is
+compiled anew.
+
+``cached_fragment`` is a template global for call blocks.  The body is
+rendered once per key and served from a per-process LRU afterwards::
+
+    {% call cached_fragment('schedule_row', schedule.id, version) %}...{% endcall %}
+
+Keys must contain the version of everything the body shows: the journal
+version of a schedule row (``journal.row_versions``) together with
+``changes.reference_version()`` for the names shown next to it, or
+``changes.data_version()`` for panels summing up many rows.  Old versions
+are never hit again and fall out of the LRU.
+
+``stream_page`` sends a page while it renders, so the header and the
+filters reach the browser before the rows are rendered.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app, render_template, session, stream_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+MAX_FRAGMENTS = 4096
+# Bytes collected before a chunk is sent; a chunk per template event
+# would cost a write for every few characters
+STREAM_CHUNK = 8192
+
+_lock = threading.Lock()
+_fragments = OrderedDict()
+
+
+def clear():
+    with _lock:
+        _fragments.clear()
+
+
+def cached_fragment(*key, caller):
+    with _lock:
+        html = _fragments.get(key)
+        if html is not None:
+            _fragments.move_to_end(key)
+            return html
+    html = Markup(caller())
+    with _lock:
+        _fragments[key] = html
+        while len(_fragments) > MAX_FRAGMENTS:
+            _fragments.popitem(last=False)
+    return html
+
+
+def _chunks(events):
+    buffered, size = [], 0
+    for event in events:
+        buffered.append(event)
+        size += len(event)
+        if size >= STREAM_CHUNK:
+            yield ''.join(buffered)
+            buffered, size = [], 0
+    if buffered:
+        yield ''.join(buffered)
+
+
+def stream_page(template_name, **context):
+    """Render ``template_name`` as a streamed response.
+
+    Pages with pending flash messages are rendered at once: showing the
+    messages takes them out of the session, and the session cookie has
+    already been sent when a streamed body renders.
+    """
+    if '_flashes' in session:
+        return render_template(template_name, **context)
+    return current_app.response_class(_chunks(stream_template(template_name, **context)),
+                                      mimetype='text/html')
+
+
+def init_app(app):
+    cache_dir = app.config.get('JINJA_CACHE_DIR') or os.path.join(app.instance_path, 'jinja-cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    # Set before the first template is loaded, so the environment is not built yet
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(cache_dir)}
+    app.add_template_global(cached_fragment)
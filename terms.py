@@ -0,0 +1,107 @@
+"""Academic terms: which one schedule queries default to, and archival.
+
+Every schedule belongs to a term.  Pages and the API show the active term
+unless a request names another one with ``term_id``.  Once a term is over
+it is closed, and ``archive`` moves its schedules out of the live table
+into ``schedule_archive``.  The archive keeps the names of the practicum,
+lecturer and lab as they were, and exports read it like the live table.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import delete, func, insert, select
+
+from migrations import default_term_name
+from models import db, Lab, Practicum, Schedule, ScheduleArchive, Term, User
+
+STATUSES = ('planned', 'active', 'closed', 'archived')
+
+
+def active_term():
+    return db.session.scalar(select(Term).where(Term.status == 'active'))
+
+
+def active_term_id():
+    return db.session.scalar(select(Term.id).where(Term.status == 'active'))
+
+
+def selected_term(args):
+    """The term named by ``term_id`` in ``args``, else the active one."""
+    term_id = args.get('term_id', type=int)
+    if term_id:
+        return db.session.get(Term, term_id)
+    return active_term()
+
+
+def selected_term_id(args):
+    return args.get('term_id', type=int) or active_term_id()
+
+
+def open_terms():
+    """Terms that take new schedules, the active one first."""
+    return db.session.scalars(
+        select(Term).where(Term.status.in_(('planned', 'active')))
+        .order_by(Term.status != 'active', Term.id)
+    ).all()
+
+
+def ensure_active_term(weeks=16):
+    """Create an active term named after today when there is no term yet."""
+    if db.session.scalar(select(func.count(Term.id))):
+        return
+    db.session.add(Term(name=default_term_name(date.today()), weeks=weeks, status='active'))
+    db.session.commit()
+
+
+def activate(term):
+    """Make ``term`` the active term; the previous one is closed."""
+    previous = active_term()
+    if previous is not None and previous.id != term.id:
+        previous.status = 'closed'
+        # The partial unique index allows one active term at any moment
+        db.session.flush()
+    term.status = 'active'
+    db.session.commit()
+
+
+def close(term):
+    term.status = 'closed'
+    db.session.commit()
+
+
+def archive(term):
+    """Move the schedules of the closed ``term`` to ``schedule_archive``
+    and mark it archived.  Run inside ``write_transaction``; returns the
+    number of schedules moved."""
+    columns = (
+        ScheduleArchive.term_id, ScheduleArchive.id, ScheduleArchive.course_id, ScheduleArchive.code,
+        ScheduleArchive.practicum_name, ScheduleArchive.semester, ScheduleArchive.lecturer_id,
+        ScheduleArchive.lecturer_username, ScheduleArchive.lecturer_name, ScheduleArchive.lab_id,
+        ScheduleArchive.lab_name, ScheduleArchive.day, ScheduleArchive.slot, ScheduleArchive.class_name,
+    )
+    # Outer joins, so a session whose lab or lecturer is gone is archived too
+    rows = (
+        select(Schedule.term_id, Schedule.id, Schedule.course_id, func.coalesce(Practicum.code, '-'),
+               func.coalesce(Practicum.practicum_name, '-'), func.coalesce(Practicum.semester, 0),
+               Schedule.lecturer_id, func.coalesce(User.username, '-'), func.coalesce(User.full_name, '-'),
+               Schedule.lab_id, func.coalesce(Lab.lab_name, '-'), Schedule.day, Schedule.slot,
+               Schedule.class_name)
+        .outerjoin(Practicum, Practicum.id == Schedule.course_id)
+        .outerjoin(User, User.id == Schedule.lecturer_id)
+        .outerjoin(Lab, Lab.id == Schedule.lab_id)
+        .where(Schedule.term_id == term.id)
+    )
+    db.session.execute(insert(ScheduleArchive).from_select([column.key for column in columns], rows))
+    moved = db.session.execute(delete(Schedule).where(Schedule.term_id == term.id)).rowcount
+    term.status = 'archived'
+    term.archived_at = datetime.utcnow()
+    return moved
+
+
+def schedule_counts():
+    """Number of live and archived schedules per term id."""
+    counts = dict(db.session.execute(
+        select(Schedule.term_id, func.count(Schedule.id)).group_by(Schedule.term_id)).all())
+    for term_id, count in db.session.execute(
+            select(ScheduleArchive.term_id, func.count()).group_by(ScheduleArchive.term_id)):
+        counts[term_id] = counts.get(term_id, 0) + count
+    return counts
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import terms
+from app import create_app
+from models import db, Lab, Practicum, Schedule, User
+from scheduling import reset_occupancy
+from seed import setup_database
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An application on an empty, fully migrated database; the test runs
+    inside its application context."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'DATA_VERSION_FILE': str(tmp_path / 'data.version'),
+        'JOB_DIRECTORY': str(tmp_path / 'jobs'),
+        'JINJA_CACHE_DIR': str(tmp_path / 'jinja-cache'),
+    })
+    with app.app_context():
+        setup_database()
+        reset_occupancy()
+        yield app
+        db.session.remove()
+        reset_occupancy()
+
+
+class Factory:
+    """Rows for a test, committed one by one."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _save(self, row):
+        db.session.add(row)
+        db.session.commit()
+        return row
+
+    def _next(self):
+        self.count += 1
+        return self.count
+
+    def lab(self, capacity=30):
+        return self._save(Lab(lab_name=f'Lab {self._next()}', capacity=capacity))
+
+    def user(self, role, password='-'):
+        number = self._next()
+        if password != '-':
+            password = generate_password_hash(password, method='pbkdf2:sha256:1000')
+        return self._save(User(username=f'{role}{number}', password=password, role=role,
+                               full_name=f'{role.title()} {number}'))
+
+    def lecturer(self):
+        return self.user('lecturer')
+
+    def practicum(self, semester=1):
+        number = self._next()
+        return self._save(Practicum(code=f'P{number}', practicum_name=f'Praktikum {number}',
+                                    semester=semester, sks=1))
+
+    def schedule(self, practicum, lecturer, lab, day, slot, class_name='A'):
+        return self._save(Schedule(term_id=terms.active_term_id(), course_id=practicum.id,
+                                   lecturer_id=lecturer.id, lab_id=lab.id, day=day, slot=slot,
+                                   class_name=class_name))
+
+
+@pytest.fixture
+def make(app):
+    return Factory()
+
+
+@pytest.fixture
+def client(app, make):
+    """A test client logged in as an admin."""
+    admin = make.user('admin', 'secret')
+    client = app.test_client()
+    client.post('/login', data={'username': admin.username, 'password': 'secret'})
+    return client
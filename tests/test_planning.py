@@ -0,0 +1,174 @@
+import html
+import json
+import re
+
+import pytest
+
+from models import db, Schedule, ScheduleChange
+from occupancy import Entry
+from repair import Disruption
+from scheduling import find_conflicts
+from slots import DAYS, TIME_SLOTS, cell_of
+from timetable import Placement, SessionRequest
+from views.planning import (apply_plan, apply_repair, decode_plan, decode_repair, encode_plan, encode_repair,
+                            generate_timetable, repair_timetable)
+
+
+def cells(rows):
+    """Current (lab_id, day, slot) of ``rows``, read back from the database."""
+    db.session.expire_all()
+    return [(row.lab_id, row.day, row.slot) for row in (db.session.get(Schedule, row.id) for row in rows)]
+
+
+def full_lab(make):
+    """One lab with every cell taken, each session by its own lecturer."""
+    lab = make.lab()
+    rows = []
+    for day in range(len(DAYS)):
+        for slot in range(len(TIME_SLOTS)):
+            semester = len(rows) % 8 + 1
+            rows.append(make.schedule(make.practicum(semester), make.lecturer(), lab, day, slot))
+    return lab, rows
+
+
+def posted_plan(page):
+    """The plan of the apply form on a generate page, or None."""
+    found = re.search(r'name="plan" value="([^"]*)"', page)
+    return html.unescape(found.group(1)) if found else None
+
+
+# Timetable generator
+
+def test_generate_complete_plan_is_applied(make, client):
+    lab, lecturer = make.lab(), make.lecturer()
+    practicum = make.practicum()
+    page = client.post('/schedules/generate', data={f'lecturer_{practicum.id}_A': lecturer.id}).text
+    plan = posted_plan(page)
+    assert plan is not None
+
+    response = client.post('/schedules/generate/apply', data={'plan': plan})
+    assert response.status_code == 302 and response.location.endswith('/schedules')
+    rows = Schedule.query.all()
+    assert [(row.course_id, row.class_name, row.lecturer_id, row.lab_id) for row in rows] == [
+        (practicum.id, 'A', lecturer.id, lab.id)]
+
+
+def test_generate_incomplete_plan_is_refused(make, client):
+    make.lab()
+    lecturer = make.lecturer()
+    # One lecturer for 33 sessions, with 30 cells in a week
+    practicums = [make.practicum(semester) for semester in range(1, 12)]
+    data = {f'lecturer_{practicum.id}_{class_name}': lecturer.id
+            for practicum in practicums for class_name in 'ABC'}
+    page = client.post('/schedules/generate', data=data).text
+    assert 'Tidak terjadwal' in page
+    assert posted_plan(page) is None
+
+    result = generate_timetable({key: [lecturer.id] for key in (
+        (practicum.id, class_name) for practicum in practicums for class_name in 'ABC')})
+    assert len(result.unplaced) == 3
+    page = client.post('/schedules/generate/apply', data={'plan': encode_plan(result)},
+                       follow_redirects=True).text
+    assert 'belum lengkap' in page
+    assert Schedule.query.count() == 0
+
+
+def test_apply_plan_keeps_sessions_of_incomplete_pairs(make):
+    lab, lecturer = make.lab(), make.lecturer()
+    partial, whole = make.practicum(1), make.practicum(2)
+    make.schedule(partial, lecturer, lab, 0, 0)
+    make.schedule(partial, lecturer, lab, 0, 1)
+    make.schedule(whole, lecturer, lab, 0, 2)
+
+    requests = [SessionRequest(partial.id, 1, 'A', lecturer.id), SessionRequest(partial.id, 1, 'A', lecturer.id),
+                SessionRequest(whole.id, 2, 'A', lecturer.id)]
+    placements = [Placement(requests[0], lab.id, 1, 0), Placement(requests[2], lab.id, 1, 1)]
+    assert apply_plan(placements, unplaced=[requests[1]]) == []
+
+    rows = Schedule.query.order_by(Schedule.course_id, Schedule.day, Schedule.slot)
+    assert [(row.course_id, row.day, row.slot) for row in rows] == [
+        (partial.id, 0, 0), (partial.id, 0, 1), (whole.id, 1, 1)]
+
+
+@pytest.mark.parametrize('field, value', [
+    ('lab', 999), ('lecturer', 'admin'), ('lecturer', 999), ('class', 'Z'), ('unplaced', 999),
+])
+def test_decode_plan_rejects_a_tampered_plan(make, field, value):
+    lab, lecturer, admin = make.lab(), make.lecturer(), make.user('admin')
+    practicum = make.practicum()
+    placement = [practicum.id, 'A', lecturer.id, lab.id, 0, 0]
+    unplaced = [practicum.id, 'B', lecturer.id]
+    plan = {'placements': [placement], 'unplaced': [unplaced]}
+    assert len(decode_plan(json.dumps(plan))[0]) == 1
+
+    value = admin.id if value == 'admin' else value
+    if field == 'lab':
+        placement[3] = value
+    elif field == 'lecturer':
+        placement[2] = value
+    elif field == 'class':
+        placement[1] = value
+    else:
+        unplaced[2] = value
+    with pytest.raises(ValueError):
+        decode_plan(json.dumps(plan))
+
+
+def test_apply_route_rejects_a_tampered_plan(make, client):
+    lab, lecturer = make.lab(), make.lecturer()
+    practicum = make.practicum()
+    plan = {'placements': [[practicum.id, 'A', lecturer.id, lab.id + 1, 0, 0]], 'unplaced': []}
+    page = client.post('/schedules/generate/apply', data={'plan': json.dumps(plan)}, follow_redirects=True).text
+    assert 'tidak valid' in page
+    assert Schedule.query.count() == 0
+
+
+# Schedule repair
+
+def test_apply_repair_swaps_sessions_of_a_full_lab(make):
+    lab, rows = full_lab(make)
+    absent = rows[0]
+    result = repair_timetable(Disruption(lecturers={absent.lecturer_id: 1 << cell_of(0, 0)}))
+    assert result.complete and result.knock_on == 1
+
+    before = dict(zip((row.id for row in rows), cells(rows)))
+    assert apply_repair(decode_repair(encode_repair(result.moves))) == []
+
+    after = dict(zip((row.id for row in rows), cells(rows)))
+    moved = {move.session.id: (move.lab_id, move.day, move.slot) for move in result.moves}
+    assert after == {**before, **moved}
+    assert after[absent.id] != (lab.id, 0, 0)
+
+
+def test_apply_repair_rotates_a_cycle(make):
+    lab, rows = full_lab(make)
+    a, b, c = rows[:3]
+    moves = [(a.id, (lab.id, 0, 0), (lab.id, 0, 1)),
+             (b.id, (lab.id, 0, 1), (lab.id, 0, 2)),
+             (c.id, (lab.id, 0, 2), (lab.id, 0, 0))]
+    assert apply_repair(moves) == []
+    assert cells([a, b, c]) == [(lab.id, 0, 1), (lab.id, 0, 2), (lab.id, 0, 0)]
+    assert len(set(cells(rows))) == len(rows)
+    # Only the final cells reach the journal, and from there the occupancy index
+    updates = ScheduleChange.query.filter_by(op='update').order_by(ScheduleChange.id).all()
+    assert [(change.schedule_id, change.slot) for change in updates] == [(a.id, 1), (b.id, 2), (c.id, 0)]
+    probe = Entry(None, lab.id, None, None, None, 0, 0, a.term_id)
+    assert find_conflicts(probe) == [('lab', c.id)]
+
+
+def test_apply_repair_reports_a_conflict_and_writes_nothing(make):
+    lab, rows = full_lab(make)
+    a, b, c = rows[:3]
+    # b's target is held by c, which does not move
+    moves = [(a.id, (lab.id, 0, 0), (lab.id, 0, 1)),
+             (b.id, (lab.id, 0, 1), (lab.id, 0, 2))]
+    assert apply_repair(moves) == [('lab', c.id)]
+    assert cells([a, b, c]) == [(lab.id, 0, 0), (lab.id, 0, 1), (lab.id, 0, 2)]
+
+
+def test_apply_repair_refuses_a_stale_plan(make):
+    lab, rows = full_lab(make)
+    a, b = rows[:2]
+    moves = [(a.id, (lab.id, 0, 1), (lab.id, 0, 0)),
+             (b.id, (lab.id, 0, 1), (lab.id, 0, 0))]
+    assert apply_repair(moves) == [('stale', a.id)]
@@ -0,0 +1,38 @@
+import pytest
+
+import views.schedules
+from scheduling import CONFLICT_MESSAGES
+from slots import DAYS, TIME_SLOTS
+
+
+@pytest.fixture
+def racing(monkeypatch):
+    """Let the conflict check miss, as when another process commits first,
+    so the unique indexes refuse the write."""
+    monkeypatch.setattr(views.schedules, 'find_conflicts', lambda entry: [])
+
+
+def form(practicum, lecturer, lab, day=0, slot=0, class_name='B'):
+    return {'course_id': practicum.id, 'lecturer_id': lecturer.id, 'lab_id': lab.id,
+            'day': DAYS[day], 'slot': TIME_SLOTS[slot], 'class_name': class_name}
+
+
+@pytest.mark.parametrize('kind', ['lab', 'lecturer'])
+def test_add_schedule_names_the_resource_behind_an_index_violation(make, client, racing, kind):
+    lab, lecturer, practicum = make.lab(), make.lecturer(), make.practicum()
+    make.schedule(practicum, lecturer, lab, 0, 0)
+    data = form(make.practicum(2), make.lecturer(), lab) if kind == 'lab' else form(
+        make.practicum(2), lecturer, make.lab())
+    page = client.post('/schedules/add', data=data, follow_redirects=True).text
+    assert CONFLICT_MESSAGES[kind] in page
+
+
+@pytest.mark.parametrize('kind', ['lab', 'lecturer'])
+def test_edit_schedule_names_the_resource_behind_an_index_violation(make, client, racing, kind):
+    lab, lecturer, practicum = make.lab(), make.lecturer(), make.practicum()
+    make.schedule(practicum, lecturer, lab, 0, 0)
+    other_lab, other_lecturer, other = make.lab(), make.lecturer(), make.practicum(2)
+    edited = make.schedule(other, other_lecturer, other_lab, 1, 0)
+    data = form(other, other_lecturer, lab) if kind == 'lab' else form(other, lecturer, other_lab)
+    page = client.post(f'/schedules/edit/{edited.id}', data=data, follow_redirects=True).text
+    assert CONFLICT_MESSAGES[kind] in page
@@ -0,0 +1,331 @@
+"""Constraint solver that builds a weekly practicum timetable.
+
+Every session request (one practicum, one class group, one lecturer) must be
+placed into a free (lab, day, slot) cell.  Hard constraints are that a lab,
+a lecturer and a class group (semester + class name) are never booked twice
+in the same cell, and that the lab is large enough for the group.  Soft
+constraints are weighted penalties, see ``SoftWeights``.
+
+Occupancy is held as one integer bitset per resource (see ``slots``), so a
+feasibility check is a handful of bitwise operations regardless of how many
+sessions are already placed.  The search is a most-constrained-first greedy
+placement, followed by single-ejection repair for requests that did not fit
+and a local improvement pass over the soft constraints.
+
+The module has no database access; ``views/planning.py`` turns rows into
+requests and placements back into ``Schedule`` rows (``apply_plan``).
+"""
+from dataclasses import dataclass, field
+
+from slots import ALL_CELLS, CELL_COUNT, EVENING_SLOT, TIME_SLOTS, cell_of, iter_cells, split_cell
+
+
+@dataclass(frozen=True)
+class SessionRequest:
+    course_id: int
+    semester: int
+    class_name: str
+    lecturer_id: int
+    min_capacity: int = 0
+
+    @property
+    def group(self):
+        return (self.semester, self.class_name)
+
+
+@dataclass(frozen=True)
+class Placement:
+    request: SessionRequest
+    lab_id: int
+    day: int
+    slot: int
+
+    @property
+    def cell(self):
+        return cell_of(self.day, self.slot)
+
+
+@dataclass(frozen=True)
+class Booking:
+    """An existing session the solver must work around."""
+    lab_id: int
+    lecturer_id: int
+    semester: int
+    class_name: str
+    day: int
+    slot: int
+
+
+@dataclass
+class SoftWeights:
+    # Semester 1 students should not have practicum in the evening slot
+    evening_first_semester: int = 10
+    # Per other session the lecturer already teaches on the same day
+    lecturer_same_day: int = 3
+    # Per other session the class group already has on the same day
+    group_same_day: int = 1
+
+
+@dataclass
+class TimetableResult:
+    placements: list
+    unplaced: list = field(default_factory=list)
+    penalty: int = 0
+
+    @property
+    def complete(self):
+        return not self.unplaced
+
+
+class _State:
+    """Bitset occupancy plus owners of the cells placed by the solver."""
+
+    def __init__(self, labs, weights):
+        self.weights = weights
+        # Smallest lab first, so the best-fitting lab wins ties
+        self.labs = sorted(labs, key=lambda lab: (lab[1], lab[0]))
+        self.lab_busy = {lab_id: 0 for lab_id, _ in self.labs}
+        self.lecturer_busy = {}
+        self.group_busy = {}
+        self.lecturer_days = {}
+        self.group_days = {}
+        # (kind, resource, cell) -> Placement, only for movable sessions
+        self.owners = {}
+
+    def book(self, lab_id, lecturer_id, group, day, slot):
+        bit = 1 << cell_of(day, slot)
+        self.lab_busy[lab_id] = self.lab_busy.get(lab_id, 0) | bit
+        self.lecturer_busy[lecturer_id] = self.lecturer_busy.get(lecturer_id, 0) | bit
+        self.group_busy[group] = self.group_busy.get(group, 0) | bit
+        self.lecturer_days.setdefault(lecturer_id, [0] * 7)[day] += 1
+        self.group_days.setdefault(group, [0] * 7)[day] += 1
+
+    def unbook(self, lab_id, lecturer_id, group, day, slot):
+        bit = ~(1 << cell_of(day, slot))
+        self.lab_busy[lab_id] &= bit
+        self.lecturer_busy[lecturer_id] &= bit
+        self.group_busy[group] &= bit
+        self.lecturer_days[lecturer_id][day] -= 1
+        self.group_days[group][day] -= 1
+
+    def place(self, placement):
+        request = placement.request
+        self.book(placement.lab_id, request.lecturer_id, request.group,
+                  placement.day, placement.slot)
+        cell = placement.cell
+        self.owners[('lab', placement.lab_id, cell)] = placement
+        self.owners[('lecturer', request.lecturer_id, cell)] = placement
+        self.owners[('group', request.group, cell)] = placement
+
+    def remove(self, placement):
+        request = placement.request
+        self.unbook(placement.lab_id, request.lecturer_id, request.group,
+                    placement.day, placement.slot)
+        cell = placement.cell
+        del self.owners[('lab', placement.lab_id, cell)]
+        del self.owners[('lecturer', request.lecturer_id, cell)]
+        del self.owners[('group', request.group, cell)]
+
+    def cost(self, request, day, slot):
+        weights = self.weights
+        cost = 0
+        if request.semester == 1 and slot == EVENING_SLOT:
+            cost += weights.evening_first_semester
+        lecturer_days = self.lecturer_days.get(request.lecturer_id)
+        if lecturer_days:
+            cost += weights.lecturer_same_day * lecturer_days[day]
+        group_days = self.group_days.get(request.group)
+        if group_days:
+            cost += weights.group_same_day * group_days[day]
+        return cost
+
+    def best_placement(self, request, forbidden=0):
+        """Return the cheapest feasible placement for ``request`` or None."""
+        free = (ALL_CELLS
+                & ~self.lecturer_busy.get(request.lecturer_id, 0)
+                & ~self.group_busy.get(request.group, 0)
+                & ~forbidden)
+        if not free:
+            return None
+
+        # Assign each free cell the smallest eligible lab that is free there
+        cell_lab = {}
+        unassigned = free
+        for lab_id, capacity in self.labs:
+            if capacity < request.min_capacity:
+                continue
+            available = unassigned & ~self.lab_busy[lab_id]
+            for cell in iter_cells(available):
+                cell_lab[cell] = lab_id
+            unassigned &= ~available
+            if not unassigned:
+                break
+
+        best = None
+        best_cost = None
+        for cell, lab_id in cell_lab.items():
+            day, slot = split_cell(cell)
+            cost = self.cost(request, day, slot)
+            if best_cost is None or (cost, cell) < best_cost:
+                best_cost = (cost, cell)
+                best = Placement(request, lab_id, day, slot)
+        return best
+
+    def blockers(self, request, lab_id, cell):
+        """Return the placements occupying what ``request`` needs at
+        (lab, cell), or None when a fixed booking is in the way."""
+        found = set()
+        checks = (
+            ('lab', lab_id, self.lab_busy[lab_id]),
+            ('lecturer', request.lecturer_id, self.lecturer_busy.get(request.lecturer_id, 0)),
+            ('group', request.group, self.group_busy.get(request.group, 0)),
+        )
+        for kind, resource, busy in checks:
+            if not busy >> cell & 1:
+                continue
+            owner = self.owners.get((kind, resource, cell))
+            if owner is None:
+                return None
+            found.add(owner)
+        return found
+
+    def repair(self, request, placements):
+        """Place ``request`` by moving exactly one already placed session.
+
+        Returns True when ``placements`` was updated.
+        """
+        for lab_id, capacity in self.labs:
+            if capacity < request.min_capacity:
+                continue
+            for cell in range(CELL_COUNT):
+                blockers = self.blockers(request, lab_id, cell)
+                if blockers is None or len(blockers) != 1:
+                    continue
+                (moved,) = blockers
+                day, slot = split_cell(cell)
+                target = Placement(request, lab_id, day, slot)
+                self.remove(moved)
+                self.place(target)
+                new_home = self.best_placement(moved.request)
+                if new_home is not None:
+                    self.place(new_home)
+                    placements.remove(moved)
+                    placements.append(new_home)
+                    placements.append(target)
+                    return True
+                self.remove(target)
+                self.place(moved)
+        return False
+
+
+def _difficulty_order(requests, labs):
+    lecturer_load = {}
+    group_load = {}
+    for request in requests:
+        lecturer_load[request.lecturer_id] = lecturer_load.get(request.lecturer_id, 0) + 1
+        group_load[request.group] = group_load.get(request.group, 0) + 1
+
+    def eligible_labs(request):
+        return sum(1 for _, capacity in labs if capacity >= request.min_capacity)
+
+    return sorted(
+        requests,
+        key=lambda r: (eligible_labs(r),
+                       -(lecturer_load[r.lecturer_id] + group_load[r.group]),
+                       r.semester, r.class_name, r.course_id),
+    )
+
+
+def total_penalty(placements, weights):
+    """Soft-constraint penalty of a complete set of placements."""
+    penalty = 0
+    lecturer_days = {}
+    group_days = {}
+    for placement in placements:
+        request = placement.request
+        if request.semester == 1 and placement.slot == EVENING_SLOT:
+            penalty += weights.evening_first_semester
+        key = (request.lecturer_id, placement.day)
+        penalty += weights.lecturer_same_day * lecturer_days.get(key, 0)
+        lecturer_days[key] = lecturer_days.get(key, 0) + 1
+        key = (request.group, placement.day)
+        penalty += weights.group_same_day * group_days.get(key, 0)
+        group_days[key] = group_days.get(key, 0) + 1
+    return penalty
+
+
+def solve(requests, labs, fixed=(), weights=None, improve_passes=2):
+    """Place every request into a conflict-free (lab, day, slot) cell.
+
+    ``labs`` is an iterable of ``(lab_id, capacity)`` pairs and ``fixed``
+    holds the ``Booking`` rows that are kept as they are.  Requests that
+    cannot be placed are returned in ``TimetableResult.unplaced``.
+    """
+    weights = weights or SoftWeights()
+    labs = list(labs)
+    state = _State(labs, weights)
+    for booking in fixed:
+        state.book(booking.lab_id, booking.lecturer_id,
+                   (booking.semester, booking.class_name), booking.day, booking.slot)
+
+    placements = []
+    unplaced = []
+    for request in _difficulty_order(requests, labs):
+        placement = state.best_placement(request)
+        if placement is not None:
+            state.place(placement)
+            placements.append(placement)
+        elif not state.repair(request, placements):
+            unplaced.append(request)
+
+    for _ in range(improve_passes):
+        moved = False
+        for index, placement in enumerate(placements):
+            state.remove(placement)
+            current = state.cost(placement.request, placement.day, placement.slot)
+            better = state.best_placement(placement.request)
+            if better is not None and state.cost(better.request, better.day, better.slot) < current:
+                state.place(better)
+                placements[index] = better
+                moved = True
+            else:
+                state.place(placement)
+        if not moved:
+            break
+
+    placements.sort(key=lambda p: (p.day, p.slot, p.lab_id))
+    return TimetableResult(placements, unplaced, total_penalty(placements, weights))
+
+
+def find_clashes(placements, fixed=()):
+    """Return ``(placement, reason)`` pairs for placements that break a hard
+    constraint against ``fixed`` bookings or earlier placements."""
+    lab_busy = {}
+    lecturer_busy = {}
+    group_busy = {}
+    clashes = []
+
+    def claim(busy, key, bit):
+        taken = busy.get(key, 0) & bit
+        busy[key] = busy.get(key, 0) | bit
+        return taken
+
+    for booking in fixed:
+        bit = 1 << cell_of(booking.day, booking.slot)
+        claim(lab_busy, booking.lab_id, bit)
+        claim(lecturer_busy, booking.lecturer_id, bit)
+        claim(group_busy, (booking.semester, booking.class_name), bit)
+
+    for placement in placements:
+        request = placement.request
+        if not (0 <= placement.slot < len(TIME_SLOTS)):
+            clashes.append((placement, 'slot'))
+            continue
+        bit = 1 << placement.cell
+        if claim(lab_busy, placement.lab_id, bit):
+            clashes.append((placement, 'lab'))
+        if claim(lecturer_busy, request.lecturer_id, bit):
+            clashes.append((placement, 'lecturer'))
+        if claim(group_busy, request.group, bit):
+            clashes.append((placement, 'group'))
+    return clashes
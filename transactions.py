@@ -0,0 +1,107 @@
+"""SQLite connection setup and write transactions that are safe across
+worker processes.
+
+Every connection gets a ``busy_timeout``, so a writer waits for the lock
+instead of failing at once with "database is locked".  With
+``PRODUCTION = True`` (environment variable ``PRODUCTION=1``) the database
+also runs in WAL mode, where readers never block the writer and the other
+way round, and the connection pool is sized for a threaded server.
+
+pysqlite normally opens transactions on its own, as DEFERRED and only
+before the first write.  A check-then-write that starts with a read can
+then lose the race for the lock to another process between the check and
+the write.  The driver is therefore put in autocommit mode and the
+transaction is begun here: ``BEGIN`` by default, and ``BEGIN IMMEDIATE``
+inside ``write_transaction``, which takes the write lock before the first
+statement.  Checks made inside it see the latest committed data, and no
+other process can write until it commits.  The time spent waiting for
+the lock is the ``lock`` span of the instrumentation, and every retry
+counts as ``lock_retries``.
+"""
+import random
+import sqlite3
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+import instrumentation
+from models import db
+
+RETRY_ATTEMPTS = 5
+RETRY_BACKOFF = 0.05
+
+_busy_timeout_ms = 5000
+_wal = False
+
+
+def init_app(app):
+    """Read the settings; must run before ``db.init_app`` so the pool
+    options reach the engine."""
+    global _busy_timeout_ms, _wal
+    _busy_timeout_ms = app.config.get('SQLITE_BUSY_TIMEOUT_MS', _busy_timeout_ms)
+    _wal = app.config.get('PRODUCTION', False)
+    if _wal:
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('pool_size', app.config.get('DB_POOL_SIZE', 10))
+        options.setdefault('max_overflow', 2 * app.config.get('DB_POOL_SIZE', 10))
+        # Waiting for a pooled connection is a sign of overload; fail fast
+        options.setdefault('pool_timeout', 10)
+
+
+@event.listens_for(Engine, 'connect')
+def _configure(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    # Transactions are begun by _begin below
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA busy_timeout = {int(_busy_timeout_ms)}')
+    if _wal:
+        cursor.execute('PRAGMA journal_mode = WAL')
+        # Durable at every checkpoint, which is enough for WAL
+        cursor.execute('PRAGMA synchronous = NORMAL')
+    cursor.close()
+
+
+@event.listens_for(Engine, 'begin')
+def _begin(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    immediate = conn.get_execution_options().get('sqlite_immediate', False)
+    # Straight on the driver connection, so BEGIN does not count as a query
+    conn.connection.driver_connection.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+
+def is_locked(error):
+    return isinstance(error.orig, sqlite3.OperationalError) and 'locked' in str(error.orig)
+
+
+def write_transaction(work, attempts=RETRY_ATTEMPTS):
+    """Run ``work()`` in a ``BEGIN IMMEDIATE`` transaction of ``db.session``
+    and commit it; return what ``work`` returned.
+
+    Whatever the session did before is rolled back first.  When the lock
+    cannot be had within the busy timeout the whole transaction is tried
+    again, up to ``attempts`` times with a growing random backoff.  Other
+    errors, such as an ``IntegrityError``, roll back and propagate.
+    """
+    for attempt in range(attempts):
+        db.session.rollback()
+        try:
+            with instrumentation.span('lock'):
+                db.session.connection(execution_options={'sqlite_immediate': True})
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if not is_locked(e) or attempt == attempts - 1:
+                raise
+        except Exception:
+            db.session.rollback()
+            raise
+        instrumentation.count('lock_retries')
+        with instrumentation.span('lock'):
+            time.sleep(RETRY_BACKOFF * (2 ** attempt) * random.random())
@@ -0,0 +1,6 @@
+"""HTML views, one blueprint per area of the application.
+
+Each module defines ``bp``; ``app.create_app`` imports and registers them
+when an application is built, so importing ``app`` alone stays cheap.
+Blueprint CLI commands keep their top-level names (``cli_group=None``).
+"""
@@ -0,0 +1,36 @@
+"""Login and logout."""
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from werkzeug.security import check_password_hash
+
+import auth
+import instrumentation
+from models import User
+
+bp = Blueprint('auth', __name__, cli_group=None)
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        user = User.query.filter_by(username=username).first()
+        
+        with instrumentation.span('hash'):
+            valid = user is not None and check_password_hash(user.password, password)
+        
+        if valid:
+            auth.login(user)
+            flash('Login berhasil!', 'success')
+            return redirect(url_for('main.dashboard'))
+        else:
+            flash('Username atau password salah', 'danger')
+    
+    return render_template('login.html')
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    flash('Anda telah logout', 'info')
+    return redirect(url_for('auth.login'))
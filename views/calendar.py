@@ -0,0 +1,167 @@
+"""Dated calendar: the sessions of a day, holidays, cancelled sessions and
+make-up sessions (see ``occurrences``)."""
+from datetime import date, timedelta
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from sqlalchemy import select
+
+import occurrences
+from auth import current_user, login_required, role_required
+from models import db, CalendarException, Lab, Schedule, User
+from scheduling import CONFLICT_MESSAGES
+from slots import DAYS, TIME_SLOTS, slot_index
+from templating import stream_page
+from transactions import write_transaction
+
+bp = Blueprint('calendar', __name__, cli_group=None)
+
+DAY_NAMES = DAYS + ['Minggu']
+MAX_EXCEPTIONS_LISTED = 200
+NOTE_LENGTH = 200
+
+def parse_date(value, default=None):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return default
+
+def schedule_conditions(user, args):
+    """Lecturers see their own sessions; admin and staff may pick a lecturer."""
+    if user.role == 'lecturer':
+        return [Schedule.lecturer_id == user.id]
+    lecturer_id = args.get('lecturer_id', type=int)
+    return [Schedule.lecturer_id == lecturer_id] if lecturer_id else []
+
+def _note():
+    return request.form.get('note', '').strip()[:NOTE_LENGTH] or None
+
+def _back(day):
+    return redirect(url_for('calendar.calendar_day', date=day.isoformat(),
+                            lab_id=request.form.get('lab_filter') or None,
+                            lecturer_id=request.form.get('lecturer_filter') or None))
+
+@bp.route('/calendar')
+@login_required
+def calendar_day():
+    user = current_user()
+    day = parse_date(request.args.get('date'), date.today())
+    lab_id = request.args.get('lab_id', type=int)
+    conditions = schedule_conditions(user, request.args)
+    next_day = day + timedelta(days=1)
+    exceptions = occurrences.Exceptions.load(day, next_day)
+
+    # Cancelled sessions of the day, to restore them or to schedule a make-up
+    cancelled = []
+    cancellations = db.session.execute(
+        select(CalendarException.id, CalendarException.schedule_id, CalendarException.note)
+        .where(CalendarException.date == day, CalendarException.kind == 'cancel')
+    ).all()
+    if cancellations:
+        rows = {row.id: row for row in occurrences.iter_schedule_rows(
+            [Schedule.id.in_([cancellation.schedule_id for cancellation in cancellations]), *conditions])}
+        cancelled = [(cancellation, rows[cancellation.schedule_id]) for cancellation in cancellations
+                     if cancellation.schedule_id in rows
+                     and (lab_id is None or rows[cancellation.schedule_id].lab_id == lab_id)]
+
+    labs = Lab.query.order_by(Lab.lab_name).all()
+    lecturers = []
+    if user.role in ['admin', 'staff']:
+        lecturers = User.query.filter_by(role='lecturer').order_by(User.full_name).all()
+    return stream_page('calendar_day.html', user=user, day=day, day_name=DAY_NAMES[day.weekday()],
+                       previous_day=day - timedelta(days=1), next_day=next_day,
+                       sessions=occurrences.between(day, next_day, conditions, lab_id, exceptions),
+                       holiday=exceptions.holidays.get(day, False), cancelled=cancelled,
+                       labs=labs, lecturers=lecturers, time_slots=TIME_SLOTS,
+                       filters={'lab_id': lab_id, 'lecturer_id': request.args.get('lecturer_id', type=int)})
+
+@bp.route('/calendar/cancel', methods=['POST'])
+@role_required('admin', 'staff')
+def cancel_session():
+    day = parse_date(request.form.get('date'))
+    schedule = db.session.get(Schedule, request.form.get('schedule_id', type=int) or 0)
+    if day is None or schedule is None:
+        flash('Jadwal atau tanggal tidak valid!', 'danger')
+        return redirect(url_for('calendar.calendar_day'))
+    first, end = occurrences.term_span(occurrences.term_start(schedule.term), schedule.term.weeks)
+    if day.weekday() != schedule.day or not first <= day < end:
+        flash('Jadwal tersebut tidak berlangsung pada tanggal itu!', 'danger')
+        return _back(day)
+    exists = db.session.scalar(select(CalendarException.id).where(
+        CalendarException.schedule_id == schedule.id, CalendarException.date == day,
+        CalendarException.kind == 'cancel'))
+    if exists is None:
+        db.session.add(CalendarException(kind='cancel', date=day, schedule_id=schedule.id, note=_note(),
+                                         created_by=current_user().id))
+        db.session.commit()
+    flash('Sesi berhasil dibatalkan!', 'success')
+    return _back(day)
+
+@bp.route('/calendar/makeup', methods=['POST'])
+@role_required('admin', 'staff')
+def makeup_session():
+    day = parse_date(request.form.get('date'))
+    schedule = db.session.get(Schedule, request.form.get('schedule_id', type=int) or 0)
+    slot = slot_index(request.form.get('slot'))
+    lab = db.session.get(Lab, request.form.get('lab_id', type=int) or 0)
+    if day is None or schedule is None or slot is None or lab is None:
+        flash('Tanggal, slot waktu atau laboratorium tidak valid!', 'danger')
+        return redirect(url_for('calendar.calendar_day'))
+    if day.weekday() >= len(DAYS):
+        flash('Sesi pengganti hanya dapat dijadwalkan Senin sampai Sabtu!', 'danger')
+        return _back(day)
+
+    def book():
+        # Checked and written while holding the write lock, like add_schedule
+        found = occurrences.clashes(day, slot, lab.id, schedule.lecturer_id, schedule.practicum.semester,
+                                    schedule.class_name)
+        if not found:
+            db.session.add(CalendarException(kind='makeup', date=day, schedule_id=schedule.id, slot=slot,
+                                             lab_id=lab.id, note=_note(), created_by=current_user().id))
+        return found
+
+    found = write_transaction(book)
+    if found:
+        flash(CONFLICT_MESSAGES[found[0]], 'danger')
+        return _back(day)
+    flash('Sesi pengganti berhasil dijadwalkan!', 'success')
+    return _back(day)
+
+@bp.route('/calendar/exceptions', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def calendar_exceptions():
+    if request.method == 'POST':
+        day = parse_date(request.form.get('date'))
+        if day is None:
+            flash('Tanggal tidak valid!', 'danger')
+        elif db.session.scalar(select(CalendarException.id).where(
+                CalendarException.date == day, CalendarException.kind == 'holiday')) is not None:
+            flash('Tanggal tersebut sudah tercatat sebagai hari libur!', 'danger')
+        else:
+            db.session.add(CalendarException(kind='holiday', date=day, note=_note(), created_by=current_user().id))
+            db.session.commit()
+            flash('Hari libur berhasil ditambahkan!', 'success')
+        return redirect(url_for('calendar.calendar_exceptions'))
+
+    since = parse_date(request.args.get('since'), date.today())
+    rows = db.session.execute(
+        select(CalendarException, Schedule, Lab.lab_name)
+        .outerjoin(Schedule, Schedule.id == CalendarException.schedule_id)
+        .outerjoin(Lab, Lab.id == CalendarException.lab_id)
+        .where(CalendarException.date >= since)
+        .order_by(CalendarException.date, CalendarException.id)
+        .limit(MAX_EXCEPTIONS_LISTED)
+    ).all()
+    return render_template('calendar_exceptions.html', rows=rows, since=since, day_names=DAY_NAMES,
+                           time_slots=TIME_SLOTS, limit=MAX_EXCEPTIONS_LISTED)
+
+@bp.route('/calendar/exceptions/<int:id>/delete', methods=['POST'])
+@role_required('admin', 'staff')
+def delete_exception(id):
+    exception = CalendarException.query.get_or_404(id)
+    day = exception.date
+    db.session.delete(exception)
+    db.session.commit()
+    flash('Pengecualian kalender berhasil dihapus!', 'success')
+    if request.form.get('next') == 'exceptions':
+        return redirect(url_for('calendar.calendar_exceptions'))
+    return _back(day)
@@ -0,0 +1,72 @@
+"""Practicum management (admin and staff)."""
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+from auth import role_required
+from models import db, Practicum
+from scheduling import reset_occupancy
+
+bp = Blueprint('courses', __name__, cli_group=None)
+
+
+@bp.route('/courses')
+@role_required('admin', 'staff')
+def courses():
+    practicums = Practicum.query.all()
+    return render_template('courses.html', courses=practicums)
+
+@bp.route('/courses/add', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def add_course():
+    if request.method == 'POST':
+        code = request.form['code']
+        practicum_name = request.form['course_name']
+        semester = request.form['semester']
+        sks = request.form['sks']
+        
+        # Cek kode unik
+        if Practicum.query.filter_by(code=code).first():
+            flash('Kode mata praktikum sudah ada!', 'danger')
+            return redirect(url_for('courses.add_course'))
+        
+        new_practicum = Practicum(code=code, practicum_name=practicum_name, semester=semester, sks=sks)
+        db.session.add(new_practicum)
+        db.session.commit()
+        
+        flash('Mata praktikum berhasil ditambahkan!', 'success')
+        return redirect(url_for('courses.courses'))
+    
+    return render_template('add_course.html')
+
+@bp.route('/courses/edit/<int:id>', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def edit_course(id):
+    practicum = Practicum.query.get_or_404(id)
+    
+    if request.method == 'POST':
+        new_code = request.form['code']
+        # Cek unik jika kode berubah
+        if new_code != practicum.code and Practicum.query.filter_by(code=new_code).first():
+            flash('Kode mata praktikum sudah digunakan!', 'danger')
+            return redirect(url_for('courses.edit_course', id=id))
+
+        practicum.code = new_code
+        practicum.practicum_name = request.form['course_name']
+        practicum.semester = request.form['semester']
+        practicum.sks = request.form['sks']
+        db.session.commit()
+        reset_occupancy()
+        
+        flash('Mata praktikum berhasil diperbarui!', 'success')
+        return redirect(url_for('courses.courses'))
+    
+    return render_template('edit_course.html', course=practicum)
+
+@bp.route('/courses/delete/<int:id>')
+@role_required('admin', 'staff')
+def delete_course(id):
+    practicum = Practicum.query.get_or_404(id)
+    db.session.delete(practicum)
+    db.session.commit()
+    reset_occupancy()
+    flash('Mata praktikum berhasil dihapus!', 'success')
+    return redirect(url_for('courses.courses'))
@@ -0,0 +1,49 @@
+"""Pages of the background jobs (see ``jobs``)."""
+from datetime import datetime, timedelta
+
+import click
+from flask import Blueprint, abort, flash, redirect, render_template, url_for
+
+import jobs
+from auth import current_user, login_required
+from models import db, Job
+
+bp = Blueprint('jobs', __name__, cli_group=None)
+
+
+def visible_job_or_404(id):
+    job = db.session.get(Job, id)
+    if not jobs.visible(job, current_user()):
+        abort(404)
+    return job
+
+@bp.route('/jobs')
+@login_required
+def job_list():
+    return render_template('jobs.html', jobs=[jobs.describe(job) for job in jobs.recent(current_user())])
+
+@bp.route('/jobs/<int:id>')
+@login_required
+def job_detail(id):
+    return render_template('job_detail.html', job=jobs.describe(visible_job_or_404(id)))
+
+@bp.route('/jobs/<int:id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(id):
+    if jobs.cancel(visible_job_or_404(id)):
+        flash('Pekerjaan dibatalkan.', 'success')
+    else:
+        flash('Pekerjaan sudah selesai dan tidak dapat dibatalkan.', 'warning')
+    return redirect(url_for('jobs.job_detail', id=id))
+
+@bp.route('/jobs/<int:id>/download')
+@login_required
+def download_job_result(id):
+    return jobs.send_result(visible_job_or_404(id))
+
+@bp.cli.command('prune-jobs')
+@click.option('--days', default=7, show_default=True, help='Keep the jobs of the last DAYS days.')
+def prune_jobs_command(days):
+    """Delete finished background jobs and their result files."""
+    deleted = jobs.prune(datetime.utcnow() - timedelta(days=days))
+    click.echo(f'{deleted} pekerjaan dihapus')
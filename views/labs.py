@@ -0,0 +1,56 @@
+"""Laboratory management (admin and staff)."""
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+from auth import role_required
+from models import db, Lab
+from scheduling import reset_occupancy
+
+bp = Blueprint('labs', __name__, cli_group=None)
+
+
+@bp.route('/labs')
+@role_required('admin', 'staff')
+def labs():
+    labs = Lab.query.all()
+    return render_template('labs.html', labs=labs)
+
+@bp.route('/labs/add', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def add_lab():
+    if request.method == 'POST':
+        lab_name = request.form['lab_name']
+        capacity = request.form['capacity']
+        
+        new_lab = Lab(lab_name=lab_name, capacity=capacity)
+        db.session.add(new_lab)
+        db.session.commit()
+        
+        flash('Laboratorium berhasil ditambahkan!', 'success')
+        return redirect(url_for('labs.labs'))
+    
+    return render_template('add_lab.html')
+
+@bp.route('/labs/edit/<int:id>', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def edit_lab(id):
+    lab = Lab.query.get_or_404(id)
+    
+    if request.method == 'POST':
+        lab.lab_name = request.form['lab_name']
+        lab.capacity = request.form['capacity']
+        db.session.commit()
+        
+        flash('Laboratorium berhasil diperbarui!', 'success')
+        return redirect(url_for('labs.labs'))
+    
+    return render_template('edit_lab.html', lab=lab)
+
+@bp.route('/labs/delete/<int:id>')
+@role_required('admin', 'staff')
+def delete_lab(id):
+    lab = Lab.query.get_or_404(id)
+    db.session.delete(lab)
+    db.session.commit()
+    reset_occupancy()
+    flash('Laboratorium berhasil dihapus!', 'success')
+    return redirect(url_for('labs.labs'))
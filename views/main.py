@@ -0,0 +1,39 @@
+"""Landing page, dashboard and metrics."""
+from flask import Blueprint, Response, abort, redirect, render_template, url_for
+from sqlalchemy.orm import joinedload
+
+import instrumentation
+import stats
+import terms
+from auth import current_user, login_required, role_required
+from models import Schedule
+from page_cache import cached_page
+
+bp = Blueprint('main', __name__, cli_group=None)
+
+
+@bp.route('/')
+def index():
+    if current_user() is not None:
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('auth.login'))
+
+@bp.route('/dashboard')
+@login_required
+@cached_page
+def dashboard():
+    user = current_user()
+    recent_schedules = Schedule.query.options(
+        joinedload(Schedule.practicum),
+        joinedload(Schedule.lecturer),
+        joinedload(Schedule.laboratory)
+    ).filter(Schedule.term_id == terms.active_term_id()).order_by(Schedule.id).limit(5).all()
+    
+    return render_template('dashboard.html', user=user, totals=stats.totals(), recent_schedules=recent_schedules)
+
+@bp.route('/metrics')
+@role_required('admin')
+def metrics():
+    if not instrumentation.enabled():
+        abort(404)
+    return Response(instrumentation.render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,442 @@
+"""Timetable generation and repair (admin and staff)."""
+import json
+import time
+
+import click
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+import terms
+from auth import role_required
+from models import db, Lab, Practicum, Schedule, ScheduleChange, User
+from occupancy import Entry as OccupancyEntry
+from repair import Disruption as RepairDisruption, Session as RepairSession, repair
+from scheduling import CLASS_NAMES, occupancy_snapshot, reset_occupancy
+from slots import CELL_COUNT, DAYS, TIME_SLOTS, cell_of, day_index, slot_index
+from timetable import Booking, Placement, SessionRequest, find_clashes, solve
+from transactions import write_transaction
+
+bp = Blueprint('planning', __name__, cli_group=None)
+
+# Timetable generator
+
+def current_assignments():
+    """Map (course_id, class_name) to the lecturers of its weekly sessions
+    in the active term."""
+    assignments = {}
+    for course_id, class_name, lecturer_id in db.session.query(
+            Schedule.course_id, Schedule.class_name, Schedule.lecturer_id
+    ).filter(Schedule.term_id == terms.active_term_id()).order_by(Schedule.id):
+        assignments.setdefault((course_id, class_name), []).append(lecturer_id)
+    return assignments
+
+def fixed_bookings(excluded_pairs):
+    """Schedules of the active term outside ``excluded_pairs`` as solver
+    bookings."""
+    rows = db.session.query(
+        Schedule.course_id, Schedule.class_name, Schedule.lecturer_id,
+        Schedule.lab_id, Schedule.day, Schedule.slot, Practicum.semester
+    ).join(Practicum).filter(Schedule.term_id == terms.active_term_id())
+    bookings = []
+    for course_id, class_name, lecturer_id, lab_id, day, slot, semester in rows:
+        if (course_id, class_name) in excluded_pairs:
+            continue
+        bookings.append(Booking(lab_id, lecturer_id, semester, class_name, day, slot))
+    return bookings
+
+def generate_timetable(assignments, min_capacity=0):
+    """Run the solver for ``assignments``, mapping (course_id, class_name) to
+    one lecturer id per weekly session.
+
+    Existing schedules of the assigned pairs are re-planned, every other
+    schedule is kept as a fixed booking.
+    """
+    semesters = dict(db.session.query(Practicum.id, Practicum.semester))
+    requests = [
+        SessionRequest(course_id, semesters[course_id], class_name, lecturer_id, min_capacity)
+        for (course_id, class_name), lecturer_ids in assignments.items()
+        if course_id in semesters
+        for lecturer_id in lecturer_ids
+    ]
+    labs = db.session.query(Lab.id, Lab.capacity).all()
+    return solve(requests, labs, fixed_bookings(set(assignments)))
+
+def encode_plan(result):
+    return json.dumps({
+        'placements': [
+            [p.request.course_id, p.request.class_name, p.request.lecturer_id, p.lab_id, p.day, p.slot]
+            for p in result.placements
+        ],
+        'unplaced': [[r.course_id, r.class_name, r.lecturer_id] for r in result.unplaced],
+    })
+
+def decode_plan(plan):
+    """Turn a JSON plan back into ``(placements, unplaced)``, or raise
+    ValueError.  Every practicum, class, lecturer and lab must exist, so a
+    tampered plan is refused as a whole."""
+    semesters = dict(db.session.query(Practicum.id, Practicum.semester))
+    lecturer_ids = {user_id for user_id, in db.session.query(User.id).filter(User.role == 'lecturer')}
+    lab_ids = {lab_id for lab_id, in db.session.query(Lab.id)}
+
+    def session_request(course_id, class_name, lecturer_id):
+        if course_id not in semesters or class_name not in CLASS_NAMES or lecturer_id not in lecturer_ids:
+            raise ValueError('invalid request')
+        return SessionRequest(course_id, semesters[course_id], class_name, lecturer_id)
+
+    plan = json.loads(plan)
+    placements = []
+    for course_id, class_name, lecturer_id, lab_id, day, slot in plan['placements']:
+        if lab_id not in lab_ids or not (0 <= day < len(DAYS)) or not (0 <= slot < len(TIME_SLOTS)):
+            raise ValueError('invalid placement')
+        placements.append(Placement(session_request(course_id, class_name, lecturer_id), lab_id, day, slot))
+    unplaced = [session_request(*item) for item in plan['unplaced']]
+    return placements, unplaced
+
+def apply_plan(placements, unplaced=()):
+    """Replace the schedules of the planned pairs in the active term in one
+    transaction, checked against the other schedules while holding the
+    write lock.
+
+    A pair with a session in ``unplaced`` keeps its current schedules and
+    none of its placements are written, so it never loses a session.
+    Returns the list of clashes; nothing is written when it is not empty.
+    The unique indexes may still raise ``IntegrityError``.
+    """
+    incomplete = {(r.course_id, r.class_name) for r in unplaced}
+    placements = [p for p in placements if (p.request.course_id, p.request.class_name) not in incomplete]
+    pairs = {(p.request.course_id, p.request.class_name) for p in placements}
+
+    def write():
+        clashes = find_clashes(placements, fixed_bookings(pairs))
+        if clashes:
+            return clashes
+        term_id = terms.active_term_id()
+        for course_id, class_name in pairs:
+            Schedule.query.filter_by(term_id=term_id, course_id=course_id, class_name=class_name).delete()
+        db.session.add_all([
+            Schedule(
+                term_id=term_id,
+                course_id=p.request.course_id,
+                lecturer_id=p.request.lecturer_id,
+                lab_id=p.lab_id,
+                day=p.day,
+                slot=p.slot,
+                class_name=p.request.class_name
+            )
+            for p in placements
+        ])
+        return []
+
+    clashes = write_transaction(write)
+    if not clashes:
+        reset_occupancy()
+    return clashes
+
+@bp.route('/schedules/generate', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def generate_schedule():
+    practicums = Practicum.query.order_by(Practicum.semester, Practicum.code).all()
+    lecturers = User.query.filter_by(role='lecturer').order_by(User.full_name).all()
+    existing = current_assignments()
+    result = None
+    plan = None
+    min_capacity = 0
+
+    if request.method == 'POST':
+        min_capacity = request.form.get('min_capacity', type=int) or 0
+        fill_only = request.form.get('mode') == 'fill'
+        assignments = {}
+        for practicum in practicums:
+            for class_name in CLASS_NAMES:
+                lecturer_id = request.form.get(f'lecturer_{practicum.id}_{class_name}', type=int)
+                if not lecturer_id:
+                    continue
+                current = existing.get((practicum.id, class_name))
+                if fill_only and current:
+                    continue
+                # Keep the number of weekly sessions; a changed lecturer takes all of them
+                if current and current[0] == lecturer_id:
+                    assignments[(practicum.id, class_name)] = current
+                else:
+                    assignments[(practicum.id, class_name)] = [lecturer_id] * len(current or [None])
+                existing[(practicum.id, class_name)] = assignments[(practicum.id, class_name)]
+
+        if not assignments:
+            flash('Tidak ada kelas yang perlu dijadwalkan.', 'warning')
+        else:
+            result = generate_timetable(assignments, min_capacity)
+            plan = encode_plan(result)
+            if result.complete:
+                flash(f'{len(result.placements)} sesi berhasil dijadwalkan tanpa bentrok. Periksa hasilnya sebelum diterapkan.', 'success')
+            else:
+                flash(f'{len(result.unplaced)} sesi tidak mendapat slot. Tambah laboratorium atau kurangi kelas.', 'warning')
+
+    return render_template('generate_schedule.html',
+                         practicums=practicums,
+                         lecturers=lecturers,
+                         class_names=CLASS_NAMES,
+                         assignments=existing,
+                         min_capacity=min_capacity,
+                         result=result,
+                         plan=plan,
+                         days=DAYS,
+                         time_slots=TIME_SLOTS,
+                         course_map={p.id: p for p in practicums},
+                         lecturer_map={l.id: l for l in lecturers},
+                         lab_map={l.id: l for l in Lab.query.all()})
+
+@bp.route('/schedules/generate/apply', methods=['POST'])
+@role_required('admin', 'staff')
+def apply_generated_schedule():
+    try:
+        placements, unplaced = decode_plan(request.form['plan'])
+    except (KeyError, ValueError, TypeError):
+        flash('Data jadwal hasil generate tidak valid!', 'danger')
+        return redirect(url_for('planning.generate_schedule'))
+    if unplaced:
+        flash('Hasil generate belum lengkap dan tidak dapat diterapkan!', 'danger')
+        return redirect(url_for('planning.generate_schedule'))
+
+    try:
+        clashes = apply_plan(placements)
+    except IntegrityError:
+        clashes = [(None, 'lab')]
+    if clashes:
+        flash('Jadwal berubah sejak hasil generate dibuat dan sekarang bentrok. Silakan generate ulang.', 'danger')
+        return redirect(url_for('planning.generate_schedule'))
+
+    flash(f'{len(placements)} jadwal hasil generate berhasil disimpan!', 'success')
+    return redirect(url_for('schedules.schedules'))
+
+@bp.cli.command('generate-timetable')
+@click.option('--min-capacity', default=0, help='Minimum lab capacity for every class group.')
+@click.option('--apply', 'apply_result', is_flag=True, help='Write the result to the database.')
+def generate_timetable_command(min_capacity, apply_result):
+    """Re-plan every existing (practicum, class) pair with its current lecturer."""
+    result = generate_timetable(current_assignments(), min_capacity)
+    for p in result.placements:
+        click.echo(f'{DAYS[p.day]:<7} {TIME_SLOTS[p.slot]}  lab={p.lab_id:<4} '
+                   f'course={p.request.course_id:<4} kelas={p.request.semester}{p.request.class_name:<3} '
+                   f'dosen={p.request.lecturer_id}')
+    click.echo(f'placed={len(result.placements)} unplaced={len(result.unplaced)} penalty={result.penalty}')
+    if apply_result:
+        if not result.complete:
+            raise click.ClickException('not every session could be placed, nothing written')
+        try:
+            clashes = apply_plan(result.placements)
+        except IntegrityError:
+            clashes = [(None, 'lab')]
+        if clashes:
+            raise click.ClickException(f'{len(clashes)} placements clash with the current schedules, '
+                                       'nothing written')
+        click.echo('applied')
+
+# Schedule repair
+
+def closed_cells(days, slots):
+    """Bitmask of the cells of ``days`` x ``slots``; all slots when none are given."""
+    slots = slots or range(len(TIME_SLOTS))
+    mask = 0
+    for day in days:
+        for slot in slots:
+            mask |= 1 << cell_of(day, slot)
+    return mask
+
+def repair_timetable(disruption, min_capacity=None):
+    """Run the repair for ``disruption`` over the schedules of the active term.
+
+    Without ``min_capacity`` a session may only move to labs at least as
+    large as the one it is in now.
+    """
+    labs = db.session.query(Lab.id, Lab.capacity).all()
+    capacities = dict(labs)
+    rows = db.session.query(
+        Schedule.id, Schedule.course_id, Practicum.semester, Schedule.class_name,
+        Schedule.lecturer_id, Schedule.lab_id, Schedule.day, Schedule.slot
+    ).join(Practicum).filter(Schedule.term_id == terms.active_term_id())
+    sessions = [
+        RepairSession(*row, min_capacity=capacities.get(row.lab_id, 0) if min_capacity is None else min_capacity)
+        for row in rows
+    ]
+    return repair(sessions, labs, disruption)
+
+def encode_repair(moves):
+    return json.dumps([
+        [m.session.id, m.session.lab_id, m.session.day, m.session.slot, m.lab_id, m.day, m.slot]
+        for m in moves
+    ])
+
+def decode_repair(plan):
+    """Turn a JSON repair plan back into ``(schedule_id, old, new)`` tuples,
+    old and new being ``(lab_id, day, slot)``, or raise ValueError."""
+    moves = []
+    for schedule_id, *cells in json.loads(plan):
+        old, new = tuple(cells[:3]), tuple(cells[3:])
+        for lab_id, day, slot in (old, new):
+            if not (0 <= day < len(DAYS)) or not (0 <= slot < len(TIME_SLOTS)):
+                raise ValueError('invalid move')
+        moves.append((int(schedule_id), old, new))
+    return moves
+
+def apply_repair(moves):
+    """Write the moves of a repair plan in one transaction.
+
+    Returns ``(kind, schedule_id)`` problems; nothing is written when the
+    list is not empty.  ``stale`` means the schedule was changed or deleted
+    since the plan was made, the other kinds are those of
+    ``find_conflicts``.  The moves are written in an order where each one
+    lands on a cell that is already free, so the unique indexes hold after
+    every statement.  Moves that wait on each other, a swap or a longer
+    cycle, are first parked in slots outside the timetable; the journal
+    entries of that step are dropped again, so sync clients and the
+    occupancy index only see the final cells.
+    """
+    def write():
+        rows = {s.id: s for s in Schedule.query.options(joinedload(Schedule.practicum))
+                .filter(Schedule.id.in_([schedule_id for schedule_id, _, _ in moves]))}
+        index = occupancy_snapshot()
+        pending = []
+        for schedule_id, old, new in moves:
+            row = rows.get(schedule_id)
+            if row is None or (row.lab_id, row.day, row.slot) != old:
+                return [('stale', schedule_id)]
+            lab_id, day, slot = new
+            pending.append((row, OccupancyEntry(row.id, lab_id, row.lecturer_id, row.practicum.semester,
+                                                row.class_name, day, slot, row.term_id)))
+        # The moves vacate each other's cells; write the ones whose target is free first
+        ordered = []
+        while pending:
+            ready = [item for item in pending if not index.conflicts(item[1])]
+            if not ready:
+                break
+            for row, entry in ready:
+                index.add(entry)
+            ordered.extend(ready)
+            pending = [item for item in pending if item not in ready]
+        # What is left waits on itself: check it without its own old cells
+        for row, entry in pending:
+            index.remove(row.id)
+        for row, entry in pending:
+            found = index.conflicts(entry)
+            if found:
+                return found
+            index.add(entry)
+        for row, entry in ordered:
+            row.lab_id, row.day, row.slot = entry.lab_id, entry.day, entry.slot
+            db.session.flush()
+        for parking, (row, entry) in enumerate(pending, 1):
+            row.slot = -parking
+        db.session.flush()
+        for row, entry in pending:
+            row.lab_id, row.day, row.slot = entry.lab_id, entry.day, entry.slot
+            db.session.flush()
+        if pending:
+            db.session.execute(delete(ScheduleChange).where(
+                ScheduleChange.schedule_id.in_([row.id for row, _ in pending]), ScheduleChange.slot < 0))
+        return []
+
+    return write_transaction(write)
+
+@bp.route('/schedules/repair', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def repair_schedule():
+    labs = Lab.query.order_by(Lab.lab_name).all()
+    lecturers = User.query.filter_by(role='lecturer').order_by(User.full_name).all()
+    result = None
+    plan = None
+    form = {'lab_id': None, 'lecturer_id': None, 'cells': set(), 'min_capacity': None}
+
+    if request.method == 'POST':
+        form['lab_id'] = request.form.get('lab_id', type=int)
+        form['lecturer_id'] = request.form.get('lecturer_id', type=int)
+        form['min_capacity'] = request.form.get('min_capacity', type=int)
+        form['cells'] = {cell for cell in request.form.getlist('cell', type=int) if 0 <= cell < CELL_COUNT}
+        mask = sum(1 << cell for cell in form['cells'])
+        if not mask or not (form['lab_id'] or form['lecturer_id']):
+            flash('Pilih laboratorium atau dosen beserta hari dan slot waktu yang tidak tersedia!', 'danger')
+        else:
+            disruption = RepairDisruption(
+                labs={form['lab_id']: mask} if form['lab_id'] else {},
+                lecturers={form['lecturer_id']: mask} if form['lecturer_id'] else {}
+            )
+            result = repair_timetable(disruption, form['min_capacity'])
+            plan = encode_repair(result.moves)
+            if not result.moves and result.complete:
+                flash('Tidak ada jadwal yang terdampak.', 'info')
+            elif result.complete:
+                flash(f'{len(result.moves)} jadwal perlu dipindah, {result.knock_on} di antaranya untuk memberi tempat. '
+                      'Periksa perubahannya sebelum diterapkan.', 'success')
+            else:
+                flash(f'{len(result.unplaced)} jadwal tidak mendapat slot pengganti.', 'warning')
+
+    return render_template('repair_schedule.html',
+                         labs=labs,
+                         lecturers=lecturers,
+                         form=form,
+                         result=result,
+                         plan=plan,
+                         days=DAYS,
+                         time_slots=TIME_SLOTS,
+                         cell_of=cell_of,
+                         course_map={p.id: p for p in Practicum.query.all()},
+                         lecturer_map={l.id: l for l in lecturers},
+                         lab_map={l.id: l for l in labs})
+
+@bp.route('/schedules/repair/apply', methods=['POST'])
+@role_required('admin', 'staff')
+def apply_schedule_repair():
+    try:
+        moves = decode_repair(request.form['plan'])
+    except (KeyError, ValueError, TypeError):
+        flash('Data perbaikan jadwal tidak valid!', 'danger')
+        return redirect(url_for('planning.repair_schedule'))
+
+    try:
+        problems = apply_repair(moves)
+    except IntegrityError:
+        problems = [('lab', None)]
+    if problems:
+        flash('Jadwal berubah sejak perbaikan dibuat dan sekarang bentrok. Silakan hitung ulang.', 'danger')
+        return redirect(url_for('planning.repair_schedule'))
+
+    flash(f'{len(moves)} jadwal berhasil dipindah!', 'success')
+    return redirect(url_for('schedules.schedules'))
+
+@bp.cli.command('repair-schedule')
+@click.option('--lab', 'lab_ids', type=int, multiple=True, help='Closed lab id; may be repeated.')
+@click.option('--lecturer', 'lecturer_ids', type=int, multiple=True, help='Unavailable lecturer id; may be repeated.')
+@click.option('--days', required=True, help="Comma separated days, e.g. 'Senin,Selasa' or '0,1'.")
+@click.option('--slots', default='', help="Comma separated slots (default: all), e.g. '08:00-09:40' or '0'.")
+@click.option('--min-capacity', type=int, help='Minimum lab capacity (default: that of the current lab).')
+@click.option('--apply', 'apply_result', is_flag=True, help='Write the moves to the database.')
+def repair_schedule_command(lab_ids, lecturer_ids, days, slots, min_capacity, apply_result):
+    """Move the sessions a closed lab or an absent lecturer displaces."""
+    day_list = [day_index(value.strip()) for value in days.split(',')]
+    slot_list = [slot_index(value.strip()) for value in slots.split(',') if value.strip()]
+    if None in day_list or None in slot_list:
+        raise click.BadParameter('unknown day or slot')
+    if not lab_ids and not lecturer_ids:
+        raise click.UsageError('give at least one --lab or --lecturer')
+    mask = closed_cells(day_list, slot_list)
+    disruption = RepairDisruption(labs=dict.fromkeys(lab_ids, mask), lecturers=dict.fromkeys(lecturer_ids, mask))
+
+    started = time.perf_counter()
+    result = repair_timetable(disruption, min_capacity)
+    elapsed = time.perf_counter() - started
+    for m in result.moves:
+        s = m.session
+        click.echo(f'{"*" if m.displaced else "+"} jadwal={s.id:<6} kelas={s.semester}{s.class_name:<3} '
+                   f'lab={s.lab_id}->{m.lab_id} {DAYS[s.day]} {TIME_SLOTS[s.slot]} -> {DAYS[m.day]} {TIME_SLOTS[m.slot]}')
+    for s in result.unplaced:
+        click.echo(f'! jadwal={s.id:<6} kelas={s.semester}{s.class_name:<3} tidak mendapat slot')
+    click.echo(f'moved={len(result.moves)} knock_on={result.knock_on} unplaced={len(result.unplaced)} '
+               f'time={elapsed:.2f}s')
+    if apply_result:
+        if not result.complete:
+            raise click.ClickException('not every session could be moved, nothing written')
+        problems = apply_repair(decode_repair(encode_repair(result.moves)))
+        if problems:
+            raise click.ClickException(f'schedules changed meanwhile: {problems[:5]}')
+        click.echo('applied')
@@ -0,0 +1,471 @@
+"""Schedule list, timetable grid, schedule forms, import and export."""
+from datetime import date, datetime, timedelta
+
+import click
+from flask import (Blueprint, Response, abort, current_app, flash, redirect, render_template, request,
+                   stream_with_context, url_for)
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from werkzeug.datastructures import MultiDict
+
+import auth
+import exports
+import jobs
+import journal
+import occurrences
+import stats
+import terms
+from auth import current_user, login_required, role_required
+from changes import data_version, reference_version
+from grid import timetable_grid as build_timetable_grid
+from models import db, Lab, Practicum, Schedule, ScheduleArchive, Term, TimeSlot, User
+from occupancy import Entry as OccupancyEntry, OccupancyIndex, audit as audit_occupancy
+from page_cache import cached_page
+from schedule_import import (COLUMNS as IMPORT_COLUMNS, FORMATS as IMPORT_FORMATS,
+                             ImportFormatError, import_rows, iter_rows)
+from scheduling import (CLASS_NAMES, CONFLICT_MESSAGES, find_conflicts, index_conflict,
+                        occupancy_entries, reset_occupancy, schedule_filters)
+from search import insert_rows
+from slots import DAYS, TIME_SLOTS, day_index, slot_index
+from templating import stream_page
+from transactions import write_transaction
+
+bp = Blueprint('schedules', __name__, cli_group=None)
+
+SCHEDULES_PAGE_SIZE = 50
+
+def encode_cursor(schedule):
+    return f'{schedule.day}.{schedule.slot}.{schedule.id}'
+
+def decode_cursor(cursor):
+    """Return the (day, slot, id) key of a cursor, or None."""
+    try:
+        return tuple(int(part) for part in cursor.split('.', 2))
+    except (AttributeError, ValueError):
+        return None
+
+@bp.route('/schedules')
+@login_required
+@cached_page
+def schedules():
+    user = current_user()
+    conditions = schedule_filters(user, request.args)
+    
+    # Keyset pagination on (day, time slot, id): every page costs the same
+    sort_key = (Schedule.day, Schedule.slot, Schedule.id)
+    query = Schedule.query.options(
+        joinedload(Schedule.practicum),
+        joinedload(Schedule.lecturer),
+        joinedload(Schedule.laboratory)
+    ).filter(*conditions)
+    
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before'))
+    if before:
+        query = query.filter(tuple_(*sort_key) < tuple_(*before))
+        query = query.order_by(*(column.desc() for column in sort_key))
+    else:
+        if after:
+            query = query.filter(tuple_(*sort_key) > tuple_(*after))
+        query = query.order_by(*sort_key)
+    
+    schedules = query.limit(SCHEDULES_PAGE_SIZE + 1).all()
+    has_more = len(schedules) > SCHEDULES_PAGE_SIZE
+    schedules = schedules[:SCHEDULES_PAGE_SIZE]
+    if before:
+        schedules.reverse()
+    
+    filters = {key: value for key, value in request.args.items()
+               if key in ('term_id', 'lab_id', 'day', 'semester', 'class_name') and value}
+    next_url = prev_url = None
+    if schedules:
+        if has_more or before:
+            next_url = url_for('schedules.schedules', after=encode_cursor(schedules[-1]), **filters)
+        if (has_more and before) or after:
+            prev_url = url_for('schedules.schedules', before=encode_cursor(schedules[0]), **filters)
+    
+    stats_key = (user.id if user.role == 'lecturer' else None, tuple(sorted(filters.items())))
+    if user.role in ['admin', 'staff']:
+        schedule_stats = stats.schedule_statistics(stats_key, conditions)
+    else:
+        schedule_stats = {'total': stats.schedule_count(stats_key, conditions)}
+    
+    calendar_url = None
+    if user.role == 'lecturer':
+        calendar_url = url_for('schedules.calendar_feed', token=calendar_serializer().dumps(user.id), _external=True)
+    
+    # Fragment versions: a row changes with its journal entry or the names
+    # shown next to it; rows whose entries were pruned use the data version
+    row_versions = dict.fromkeys((schedule.id for schedule in schedules), data_version())
+    row_versions.update(journal.row_versions(row_versions))
+    
+    term_list = Term.query.filter(Term.status != 'archived').order_by(Term.id.desc()).all()
+    return stream_page('schedules.html', schedules=schedules, user=user, labs=Lab.query.all(),
+                       stats=schedule_stats, days=DAYS, next_url=next_url, prev_url=prev_url,
+                       filters=filters, calendar_url=calendar_url, term_list=term_list,
+                       term=terms.selected_term(request.args), row_versions=row_versions,
+                       reference_version=reference_version(), panel_key=(stats_key, data_version()))
+
+def schedule_entry_from_form(schedule_id=None):
+    """Build an occupancy entry from the schedule form, or None when the
+    selected term, course, day or slot does not exist or the term no longer
+    takes schedules."""
+    term = db.session.get(Term, request.form.get('term_id', type=int) or terms.active_term_id())
+    practicum = db.session.get(Practicum, int(request.form['course_id']))
+    day = day_index(request.form['day'])
+    slot = slot_index(request.form['slot'])
+    if term is None or not term.is_open or practicum is None or day is None or slot is None:
+        return None
+    return OccupancyEntry(
+        schedule_id,
+        int(request.form['lab_id']),
+        int(request.form['lecturer_id']),
+        practicum.semester,
+        request.form['class_name'],
+        day,
+        slot,
+        term.id
+    )
+
+GRID_FILTERS = ('term_id', 'semester', 'class_name', 'lecturer_id')
+
+@bp.route('/schedules/grid')
+@login_required
+@cached_page
+def timetable_grid():
+    user = current_user()
+    filters = {key: request.args[key] for key in GRID_FILTERS if request.args.get(key)}
+    conditions = schedule_filters(user, MultiDict(filters))
+    grid_key = (user.id if user.role == 'lecturer' else None, tuple(sorted(filters.items())))
+    include_empty_labs = not filters and user.role != 'lecturer'
+    grid = build_timetable_grid(grid_key, conditions, include_empty_labs=include_empty_labs)
+    
+    lecturers = []
+    if user.role in ['admin', 'staff']:
+        lecturers = User.query.filter_by(role='lecturer').order_by(User.full_name).all()
+    return stream_page('timetable_grid.html', grid=grid, user=user, days=DAYS, time_slots=TIME_SLOTS,
+                       class_names=CLASS_NAMES, lecturers=lecturers,
+                       panel_key=(grid_key, include_empty_labs, data_version()))
+
+@bp.route('/schedules/add', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def add_schedule():
+    if request.method == 'POST':
+        entry = schedule_entry_from_form()
+        if entry is None:
+            flash('Semester akademik, mata praktikum, hari atau slot waktu tidak valid!', 'danger')
+            return redirect(url_for('schedules.add_schedule'))
+        
+        new_schedule = Schedule(
+            term_id=entry.term_id,
+            course_id=int(request.form['course_id']),
+            lecturer_id=entry.lecturer_id,
+            lab_id=entry.lab_id,
+            day=entry.day,
+            slot=entry.slot,
+            class_name=entry.class_name
+        )
+
+        def book():
+            # Cek konflik lab, dosen dan kelas while holding the write lock
+            conflicts = find_conflicts(entry)
+            if not conflicts:
+                db.session.add(new_schedule)
+            return conflicts
+
+        try:
+            conflicts = write_transaction(book)
+        except IntegrityError as error:
+            # Unique indexes are the last line of defence
+            flash(CONFLICT_MESSAGES[index_conflict(entry, error)], 'danger')
+            return redirect(url_for('schedules.add_schedule'))
+        if conflicts:
+            flash(CONFLICT_MESSAGES[conflicts[0][0]], 'danger')
+            return redirect(url_for('schedules.add_schedule'))
+        
+        flash('Jadwal berhasil ditambahkan!', 'success')
+        return redirect(url_for('schedules.schedules'))
+    
+    courses = Practicum.query.all()
+    lecturers = User.query.filter_by(role='lecturer').all()
+    labs = Lab.query.all()
+    
+    return render_template('add_schedule.html', 
+                         courses=courses, 
+                         lecturers=lecturers, 
+                         labs=labs,
+                         terms=terms.open_terms(),
+                         days=DAYS,
+                         time_slots=TimeSlot.query.order_by(TimeSlot.id).all())
+
+@bp.route('/schedules/edit/<int:id>', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def edit_schedule(id):
+    schedule = Schedule.query.get_or_404(id)
+    
+    if request.method == 'POST':
+        entry = schedule_entry_from_form(schedule.id)
+        if entry is None:
+            flash('Semester akademik, mata praktikum, hari atau slot waktu tidak valid!', 'danger')
+            return redirect(url_for('schedules.edit_schedule', id=id))
+        
+        def move():
+            # Cek konflik (kecuali dengan jadwal yang sedang diedit)
+            current = db.session.get(Schedule, id)
+            if current is None:
+                return [('missing', id)]
+            conflicts = find_conflicts(entry)
+            if not conflicts:
+                current.term_id = entry.term_id
+                current.course_id = int(request.form['course_id'])
+                current.lecturer_id = entry.lecturer_id
+                current.lab_id = entry.lab_id
+                current.day = entry.day
+                current.slot = entry.slot
+                current.class_name = entry.class_name
+            return conflicts
+
+        try:
+            conflicts = write_transaction(move)
+        except IntegrityError as error:
+            flash(CONFLICT_MESSAGES[index_conflict(entry, error)], 'danger')
+            return redirect(url_for('schedules.edit_schedule', id=id))
+        if conflicts and conflicts[0][0] == 'missing':
+            flash('Jadwal sudah dihapus oleh pengguna lain', 'danger')
+            return redirect(url_for('schedules.schedules'))
+        if conflicts:
+            flash(CONFLICT_MESSAGES[conflicts[0][0]], 'danger')
+            return redirect(url_for('schedules.edit_schedule', id=id))
+        
+        flash('Jadwal berhasil diperbarui!', 'success')
+        return redirect(url_for('schedules.schedules'))
+    
+    courses = Practicum.query.all()
+    lecturers = User.query.filter_by(role='lecturer').all()
+    labs = Lab.query.all()
+    
+    return render_template('edit_schedule.html', 
+                         schedule=schedule,
+                         courses=courses, 
+                         lecturers=lecturers, 
+                         labs=labs,
+                         terms=terms.open_terms(),
+                         days=DAYS,
+                         time_slots=TimeSlot.query.order_by(TimeSlot.id).all())
+
+@bp.route('/schedules/delete/<int:id>')
+@role_required('admin', 'staff')
+def delete_schedule(id):
+    schedule = Schedule.query.get_or_404(id)
+    db.session.delete(schedule)
+    db.session.commit()
+    flash('Jadwal berhasil dihapus!', 'success')
+    return redirect(url_for('schedules.schedules'))
+
+@bp.route('/schedules/conflicts')
+@role_required('admin', 'staff')
+def schedule_conflicts():
+    conflicts = audit_occupancy(occupancy_entries())
+    ids = {schedule_id for conflict in conflicts for schedule_id in conflict.schedule_ids}
+    schedule_map = {s.id: s for s in Schedule.query.filter(Schedule.id.in_(ids))} if ids else {}
+    return render_template('schedule_conflicts.html', conflicts=conflicts, schedule_map=schedule_map)
+
+@bp.cli.command('audit-conflicts')
+def audit_conflicts_command():
+    """Report every lab, lecturer and class-group clash in the schedule table."""
+    conflicts = audit_occupancy(occupancy_entries())
+    for conflict in conflicts:
+        click.echo(f'{conflict.kind:<9} {" ".join(str(part) for part in conflict.key[1:])}: '
+                   f'jadwal {", ".join(str(i) for i in conflict.schedule_ids)}')
+    click.echo(f'{len(conflicts)} konflik ditemukan')
+    if conflicts:
+        raise SystemExit(1)
+
+# Import
+
+class ImportRejected(Exception):
+    """Raised inside the import transaction to roll back a rejected file."""
+
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
+def import_schedule_file(stream, filename, context=None):
+    """Import a schedule file in one transaction.
+
+    The transaction holds the write lock from the first lookup to the
+    commit, so no schedule can be added between the clash checks and the
+    insert.  Lookups are preloaded with one query per table; rows are
+    inserted in batches into the active term as they are validated and
+    everything is rolled back when any row is rejected.  A job ``context``
+    is told about every row read.
+    """
+    def insert_chunk(rows):
+        insert_rows(Schedule, rows)
+
+    def work():
+        courses = {code: (course_id, semester) for course_id, code, semester
+                   in db.session.query(Practicum.id, Practicum.code, Practicum.semester)}
+        lecturers = dict(db.session.query(User.username, User.id).filter_by(role='lecturer'))
+        labs = dict(db.session.query(Lab.lab_name, Lab.id))
+        index = OccupancyIndex(occupancy_entries())
+        # From the start again when write_transaction retries
+        stream.seek(0)
+        rows = iter_rows(stream, filename)
+        if context is not None:
+            rows = context.track(rows, 'baris diperiksa')
+        result = import_rows(rows, courses, lecturers, labs,
+                             CLASS_NAMES, index, insert_chunk, terms.active_term_id())
+        if not result.ok:
+            raise ImportRejected(result)
+        return result
+
+    try:
+        result = write_transaction(work)
+    except ImportRejected as rejected:
+        return rejected.result
+    reset_occupancy()
+    return result
+
+@jobs.task('import', 'Import jadwal')
+def import_job(context, upload, filename):
+    # jobs deletes the upload once the job has finished
+    with open(jobs.upload_path(upload), 'rb') as stream:
+        result = import_schedule_file(stream, filename, context)
+    return {'ok': result.ok, 'inserted': result.inserted, 'error_count': result.error_count,
+            'errors': result.errors}
+
+@bp.route('/schedules/import', methods=['GET', 'POST'])
+@role_required('admin', 'staff')
+def import_schedules():
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Pilih file yang akan diimport!', 'danger')
+            return redirect(url_for('schedules.import_schedules'))
+        if not upload.filename.lower().endswith(IMPORT_FORMATS):
+            flash(f'Format file harus salah satu dari {", ".join(IMPORT_FORMATS)}', 'danger')
+            return redirect(url_for('schedules.import_schedules'))
+        # Validating and inserting a large file takes a while; do it in the background
+        saved = jobs.save_upload(upload)
+        job = jobs.submit('import', {'upload': saved, 'filename': upload.filename}, current_user().id,
+                          upload=saved)
+        flash('File sedang diimport. Halaman ini menampilkan kemajuannya.', 'info')
+        return redirect(url_for('jobs.job_detail', id=job.id))
+
+    return render_template('import_schedules.html', columns=IMPORT_COLUMNS, formats=IMPORT_FORMATS)
+
+@bp.cli.command('import-schedules')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_schedules_command(path):
+    """Import schedules from a CSV, XLSX or JSONL file."""
+    with open(path, 'rb') as stream:
+        try:
+            result = import_schedule_file(stream, path)
+        except ImportFormatError as e:
+            raise click.ClickException(str(e))
+    for line, message in result.errors:
+        click.echo(f'baris {line}: {message}', err=True)
+    if not result.ok:
+        raise click.ClickException(f'{result.error_count} baris tidak valid, tidak ada jadwal yang disimpan')
+    click.echo(f'{result.inserted} jadwal berhasil diimport')
+
+# Export
+
+EXPORT_NAMES = {'csv': 'jadwal.csv', 'xlsx': 'jadwal.xlsx', 'ics': 'jadwal.ics'}
+
+def term_range(args, term=None):
+    """Start date and length in weeks of the term for calendar exports;
+    ``start`` and ``weeks`` in ``args`` override those of ``term``."""
+    try:
+        start = date.fromisoformat(args.get('start'))
+    except (TypeError, ValueError):
+        start = occurrences.term_start(term)
+    weeks = args.get('weeks', type=int) or (term.weeks if term else current_app.config['TERM_WEEKS'])
+    return start, max(1, min(weeks, 52))
+
+def calendar_serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='calendar-feed')
+
+def streamed(chunks, mimetype, filename):
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+def export_mimetype(fmt):
+    return 'text/calendar; charset=utf-8' if fmt == 'ics' else exports.FORMATS[fmt][0]
+
+def export_chunks(fmt, user, args, context=None):
+    """Byte chunks of the export ``fmt`` of the schedules ``user`` may
+    see, filtered by ``args``.  A job ``context`` is told about every row."""
+    term = terms.selected_term(args)
+    if term is not None and term.status == 'archived':
+        model, conditions = ScheduleArchive, schedule_filters(user, args, ScheduleArchive)
+        rows = exports.iter_archive_rows(conditions)
+    else:
+        model, conditions = Schedule, schedule_filters(user, args)
+        rows = exports.iter_rows(conditions)
+    if context is not None:
+        total = db.session.query(db.func.count(model.id)).filter(*conditions).scalar()
+        rows = context.track(rows, 'jadwal ditulis', total)
+    if fmt == 'ics':
+        start, weeks = term_range(args, term)
+        exceptions = occurrences.Exceptions.load(*occurrences.term_span(start, weeks))
+        return exports.ics_stream(rows, start, weeks, exceptions=exceptions)
+    return exports.FORMATS[fmt][1](rows)
+
+@bp.route('/schedules/export/<fmt>')
+@login_required
+def export_schedules(fmt):
+    if fmt not in EXPORT_NAMES:
+        abort(404)
+    return streamed(export_chunks(fmt, current_user(), request.args), export_mimetype(fmt), EXPORT_NAMES[fmt])
+
+@jobs.task('export', 'Ekspor jadwal', roles=('admin', 'staff', 'lecturer'))
+def export_job(context, fmt, args):
+    if fmt not in EXPORT_NAMES:
+        raise ValueError(f"Format ekspor '{fmt}' tidak dikenal")
+    # Filters apply with the rights of whoever submitted the job
+    user = auth.load_principal(context.user_id)
+    with open(context.result_path(fmt), 'wb') as output:
+        for chunk in export_chunks(fmt, user, MultiDict(args), context):
+            output.write(chunk)
+    return {'rows': context.done, 'filename': EXPORT_NAMES[fmt], 'mimetype': export_mimetype(fmt)}
+
+@bp.route('/schedules/export/<fmt>/background', methods=['POST'])
+@login_required
+def export_schedules_job(fmt):
+    if fmt not in EXPORT_NAMES:
+        abort(404)
+    args = {key: value for key, value in request.form.items() if value}
+    job = jobs.submit('export', {'fmt': fmt, 'args': args}, current_user().id)
+    return redirect(url_for('jobs.job_detail', id=job.id))
+
+@bp.route('/calendar/<token>.ics')
+def calendar_feed(token):
+    """Subscribable calendar of one lecturer; the signed token replaces the
+    login because calendar apps cannot keep a session."""
+    try:
+        user_id = calendar_serializer().loads(token)
+    except BadSignature:
+        abort(404)
+    lecturer = auth.load_principal(user_id)
+    if lecturer is None or lecturer.role != 'lecturer':
+        abort(404)
+    term = terms.active_term()
+    start, weeks = term_range(request.args, term)
+    rows = exports.iter_rows([Schedule.term_id == terms.active_term_id(), Schedule.lecturer_id == lecturer.id])
+    exceptions = occurrences.Exceptions.load(*occurrences.term_span(start, weeks))
+    return Response(stream_with_context(exports.ics_stream(rows, start, weeks, f'Jadwal {lecturer.full_name}',
+                                                           exceptions)),
+                    mimetype='text/calendar; charset=utf-8')
+
+# Change journal
+
+@bp.cli.command('prune-changes')
+@click.option('--days', default=30, show_default=True, help='Keep the changes of the last DAYS days.')
+def prune_changes_command(days):
+    """Delete old entries of the schedule change journal."""
+    deleted = journal.prune(datetime.utcnow() - timedelta(days=days))
+    click.echo(f'{deleted} catatan perubahan dihapus')
@@ -0,0 +1,32 @@
+"""Search page and the command that rebuilds the search index (see ``search``)."""
+import click
+from flask import Blueprint, render_template, request
+
+import search as search_index
+import terms
+from auth import current_user, login_required
+
+bp = Blueprint('search', __name__, cli_group=None)
+
+KIND_LABELS = {
+    'schedule': 'Jadwal',
+    'practicum': 'Mata Praktikum',
+    'lab': 'Laboratorium',
+    'lecturer': 'Dosen',
+}
+
+@bp.route('/search')
+@login_required
+def search():
+    user = current_user()
+    query = request.args.get('q', '').strip()
+    results = search_index.search(user, query, terms.selected_term_id(request.args),
+                                  limit=search_index.MAX_LIMIT)
+    return render_template('search.html', query=query, kind_labels=KIND_LABELS,
+                           results=[search_index.describe(result, user) for result in results],
+                           too_short=bool(query) and not search_index.query_words(query))
+
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Write the full-text search index again from the tables."""
+    click.echo(f'{search_index.rebuild()} dokumen diindeks')
@@ -0,0 +1,124 @@
+"""Academic terms and the history of archived terms."""
+import time
+from datetime import date
+
+import click
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+import terms
+from auth import role_required
+from models import db, ScheduleArchive, Term
+from scheduling import reset_occupancy
+from slots import DAYS, TIME_SLOTS
+from transactions import write_transaction
+
+bp = Blueprint('terms', __name__, cli_group=None)
+
+TERM_HISTORY_PAGE_SIZE = 100
+
+def archive_term(term):
+    """Archive the closed ``term``; returns the number of schedules moved."""
+    moved = write_transaction(lambda: terms.archive(term))
+    reset_occupancy()
+    return moved
+
+@bp.route('/terms', methods=['GET', 'POST'])
+@role_required('admin')
+def term_list():
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip()
+        start = request.form.get('start_date')
+        weeks = request.form.get('weeks', type=int) or current_app.config['TERM_WEEKS']
+        try:
+            start_date = date.fromisoformat(start) if start else None
+        except ValueError:
+            flash('Tanggal mulai tidak valid!', 'danger')
+            return redirect(url_for('terms.term_list'))
+        if not name:
+            flash('Nama semester akademik wajib diisi!', 'danger')
+        elif Term.query.filter_by(name=name).first() is not None:
+            flash('Nama semester akademik sudah dipakai!', 'danger')
+        else:
+            db.session.add(Term(name=name, start_date=start_date, weeks=max(1, min(weeks, 52)), status='planned'))
+            db.session.commit()
+            flash('Semester akademik berhasil ditambahkan!', 'success')
+        return redirect(url_for('terms.term_list'))
+
+    return render_template('terms.html', terms=Term.query.order_by(Term.id.desc()).all(),
+                         counts=terms.schedule_counts(), weeks=current_app.config['TERM_WEEKS'])
+
+@bp.route('/terms/<int:id>/activate', methods=['POST'])
+@role_required('admin')
+def activate_term(id):
+    term = Term.query.get_or_404(id)
+    if not term.is_open:
+        flash('Semester akademik yang sudah ditutup tidak dapat diaktifkan lagi!', 'danger')
+    else:
+        terms.activate(term)
+        reset_occupancy()
+        flash(f'{term.name} sekarang menjadi semester aktif.', 'success')
+    return redirect(url_for('terms.term_list'))
+
+@bp.route('/terms/<int:id>/close', methods=['POST'])
+@role_required('admin')
+def close_term(id):
+    term = Term.query.get_or_404(id)
+    if not term.is_open:
+        flash('Semester akademik sudah ditutup!', 'warning')
+    else:
+        terms.close(term)
+        flash(f'{term.name} ditutup. Jadwalnya tidak dapat diubah lagi dan siap diarsipkan.', 'success')
+    return redirect(url_for('terms.term_list'))
+
+@bp.route('/terms/<int:id>/archive', methods=['POST'])
+@role_required('admin')
+def archive_term_route(id):
+    term = Term.query.get_or_404(id)
+    if term.status != 'closed':
+        flash('Hanya semester akademik yang sudah ditutup yang dapat diarsipkan!', 'danger')
+    else:
+        moved = archive_term(term)
+        flash(f'{moved} jadwal {term.name} dipindah ke arsip.', 'success')
+    return redirect(url_for('terms.term_list'))
+
+@bp.route('/terms/<int:id>/history')
+@role_required('admin', 'staff')
+def term_history(id):
+    """Read-only list of the schedules of an archived term, paged by id."""
+    term = Term.query.get_or_404(id)
+    if term.status != 'archived':
+        return redirect(url_for('schedules.schedules', term_id=term.id))
+    after = request.args.get('after', 0, type=int)
+    rows = ScheduleArchive.query.filter(
+        ScheduleArchive.term_id == term.id, ScheduleArchive.id > after
+    ).order_by(ScheduleArchive.id).limit(TERM_HISTORY_PAGE_SIZE + 1).all()
+    next_url = None
+    if len(rows) > TERM_HISTORY_PAGE_SIZE:
+        rows = rows[:TERM_HISTORY_PAGE_SIZE]
+        next_url = url_for('terms.term_history', id=term.id, after=rows[-1].id)
+    return render_template('term_history.html', term=term, rows=rows, next_url=next_url,
+                         first_page=not after, days=DAYS, time_slots=TIME_SLOTS,
+                         total=terms.schedule_counts().get(term.id, 0))
+
+@bp.cli.command('archive-term')
+@click.argument('term_id', type=int)
+@click.option('--vacuum', is_flag=True, help='Give the freed pages back to the file system afterwards.')
+def archive_term_command(term_id, vacuum):
+    """Move the schedules of a closed term to the read-only archive."""
+    term = db.session.get(Term, term_id)
+    if term is None:
+        raise click.ClickException(f'term {term_id} not found')
+    if term.status != 'closed':
+        raise click.ClickException(f"term {term.name} is {term.status}, only a closed term can be archived")
+    started = time.perf_counter()
+    moved = archive_term(term)
+    click.echo(f'{moved} jadwal {term.name} diarsipkan dalam {time.perf_counter() - started:.2f} detik')
+    if vacuum:
+        db.session.remove()
+        connection = db.engine.raw_connection()
+        try:
+            # VACUUM cannot run inside a transaction; the driver is in autocommit mode
+            connection.driver_connection.execute('VACUUM')
+        finally:
+            connection.close()
+        click.echo('database di-vacuum')
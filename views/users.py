@@ -0,0 +1,73 @@
+"""User management (admin only)."""
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from werkzeug.security import generate_password_hash
+
+import auth
+from auth import role_required
+from models import db, User
+from scheduling import reset_occupancy
+
+bp = Blueprint('users', __name__, cli_group=None)
+
+
+@bp.route('/users')
+@role_required('admin')
+def users():
+    users = User.query.all()
+    return render_template('users.html', users=users)
+
+@bp.route('/users/add', methods=['GET', 'POST'])
+@role_required('admin')
+def add_user():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        role = request.form['role']
+        full_name = request.form['full_name']
+        
+        # Cek apakah username sudah ada
+        if User.query.filter_by(username=username).first():
+            flash('Username sudah ada!', 'danger')
+            return redirect(url_for('users.add_user'))
+        
+        # Buat user baru
+        hashed_password = generate_password_hash(password)
+        new_user = User(username=username, password=hashed_password, role=role, full_name=full_name)
+        db.session.add(new_user)
+        db.session.commit()
+        
+        flash('User berhasil ditambahkan!', 'success')
+        return redirect(url_for('users.users'))
+    
+    return render_template('add_user.html')
+
+@bp.route('/users/edit/<int:id>', methods=['GET', 'POST'])
+@role_required('admin')
+def edit_user(id):
+    user = User.query.get_or_404(id)
+    
+    if request.method == 'POST':
+        user.username = request.form['username']
+        user.role = request.form['role']
+        user.full_name = request.form['full_name']
+        
+        if request.form['password']:
+            user.password = generate_password_hash(request.form['password'])
+        
+        db.session.commit()
+        auth.forget(id)
+        flash('User berhasil diperbarui!', 'success')
+        return redirect(url_for('users.users'))
+    
+    return render_template('edit_user.html', user=user)
+
+@bp.route('/users/delete/<int:id>')
+@role_required('admin')
+def delete_user(id):
+    user = User.query.get_or_404(id)
+    db.session.delete(user)
+    db.session.commit()
+    auth.forget(id)
+    reset_occupancy()
+    flash('User berhasil dihapus!', 'success')
+    return redirect(url_for('users.users'))